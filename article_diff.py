@@ -0,0 +1,246 @@
+"""
+Сравнение двух редакций кодекса по статьям
+
+Две разобранные редакции (articles_table.json или articles_for_embeddings.json)
+сравниваются по номерам статей и хэшам их текста. Каждая статья попадает в
+одну из категорий:
+- added    - номер есть только в новой редакции
+- removed  - номер есть только в старой редакции
+- modified - текст статьи изменился
+- moved    - текст тот же, но статья перешла в другой título/capítulo
+
+Набор изменений определяет группы (libro, titulo, capitulo), которые нужно
+заново разбить на чанки; только их чанки кодируются и заменяются в FAISS
+индексе, поэтому поправка к кодексу стоит O(измененных статей), а не полной
+пересборки.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+from article_table import ArticleTable
+from embedding_cache import normalize_text
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+MOVED = "moved"
+CATEGORIES = [ADDED, REMOVED, MODIFIED, MOVED]
+
+Group = Tuple[str, str, str]
+
+
+def content_hash(text: str) -> str:
+    """
+    Хэш текста статьи без учета различий в пробельных символах.
+
+    Args:
+        text (str): Текст статьи
+
+    Returns:
+        str: Шестнадцатеричный хэш
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:16]
+
+
+def _group(row: Dict) -> Group:
+    return row["libro"], row["titulo"], row["capitulo"]
+
+
+class ChangeSet:
+    """
+    Набор изменений между двумя редакциями: номера статей по категориям и группы,
+    которые они затрагивают.
+    """
+
+    def __init__(self, changes: Dict[str, List[str]], groups: List[Group]):
+        """
+        Args:
+            changes (Dict[str, List[str]]): Номера статей по категориям (CATEGORIES)
+            groups (List[Group]): Затронутые группы (libro, titulo, capitulo)
+        """
+        self.changes = {category: list(changes.get(category, [])) for category in CATEGORIES}
+        self.groups = [tuple(group) for group in groups]
+
+    def affected_groups(self) -> Set[Group]:
+        """Группы, чанки которых нужно построить заново."""
+        return set(self.groups)
+
+    def is_empty(self) -> bool:
+        return not any(self.changes.values())
+
+    def summary(self) -> str:
+        """Строка со сводкой для вывода в консоль."""
+        counts = ", ".join(f"{category}: {len(self.changes[category])}" for category in CATEGORIES)
+        return f"Изменения статей - {counts}; затронуто групп: {len(self.groups)}"
+
+    def save(self, path: str) -> None:
+        """
+        Сохраняет набор изменений в JSON.
+
+        Args:
+            path (str): Путь к файлу
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"changes": self.changes, "groups": [list(group) for group in self.groups]},
+                      f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "ChangeSet":
+        """
+        Загружает набор изменений из JSON.
+
+        Args:
+            path (str): Путь к файлу
+
+        Returns:
+            ChangeSet: Набор изменений
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["changes"], data["groups"])
+
+
+def diff_article_tables(old: ArticleTable, new: ArticleTable) -> ChangeSet:
+    """
+    Сравнивает две редакции по номерам статей и хэшам текста.
+
+    Args:
+        old (ArticleTable): Статьи старой редакции
+        new (ArticleTable): Статьи новой редакции
+
+    Returns:
+        ChangeSet: Набор изменений
+    """
+    changes: Dict[str, List[str]] = {category: [] for category in CATEGORIES}
+    groups: Dict[Group, None] = {}
+
+    for row in new:
+        number = row["article_number"]
+        old_row = old.get(number)
+        if old_row is None:
+            changes[ADDED].append(number)
+            groups[_group(row)] = None
+            continue
+        same_text = content_hash(old_row["text"]) == content_hash(row["text"])
+        same_group = _group(old_row) == _group(row)
+        if same_text and same_group:
+            continue
+        changes[MOVED if same_text else MODIFIED].append(number)
+        groups[_group(old_row)] = None
+        groups[_group(row)] = None
+
+    for row in old:
+        if new.get(row["article_number"]) is None:
+            changes[REMOVED].append(row["article_number"])
+            groups[_group(row)] = None
+
+    return ChangeSet(changes, list(groups))
+
+
+def update_chunks(
+    old_chunks: List[Dict],
+    new_table: ArticleTable,
+    change_set: ChangeSet,
+    tokenizer=None,
+    max_tokens: Optional[int] = None
+) -> Tuple[List[Dict], List[Dict], List[int]]:
+    """
+    Заново разбивает на чанки только затронутые группы.
+
+    Args:
+        old_chunks (List[Dict]): Чанки старой редакции
+        new_table (ArticleTable): Статьи новой редакции
+        change_set (ChangeSet): Набор изменений
+        tokenizer: Токенизатор для разбиения по токенам (как в main.py)
+        max_tokens (Optional[int]): Бюджет токенов чанка
+
+    Returns:
+        Tuple[List[Dict], List[Dict], List[int]]: Все чанки новой редакции в порядке
+        документа, новые чанки затронутых групп и идентификаторы удаляемых чанков
+    """
+    from chunking import chunk_id, create_final_chunks
+    from group import group_articles_by_capitulo
+
+    affected = change_set.affected_groups()
+    removed_ids = [chunk_id(chunk) for chunk in old_chunks if _group(chunk) in affected]
+
+    grouped = group_articles_by_capitulo([row for row in new_table if _group(row) in affected])
+    new_chunks = create_final_chunks(grouped, tokenizer, max_tokens)
+
+    chunks_by_group: Dict[Group, List[Dict]] = {}
+    for chunk in new_chunks:
+        chunks_by_group.setdefault(_group(chunk), []).append(chunk)
+    for chunk in old_chunks:
+        if _group(chunk) not in affected:
+            chunks_by_group.setdefault(_group(chunk), []).append(chunk)
+
+    # Порядок групп - как в новой редакции
+    all_chunks = []
+    for group in dict.fromkeys(_group(row) for row in new_table):
+        all_chunks.extend(chunks_by_group.get(group, []))
+    return all_chunks, new_chunks, removed_ids
+
+
+def apply_change_set(
+    change_set: ChangeSet,
+    new_table: ArticleTable,
+    chunks_file: str = "output/penal_code_chunks.json",
+    index_path: str = "output/penal_code.index",
+    model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    cache_dir: Optional[str] = "output/embedding_cache",
+    token_model: Optional[str] = None
+) -> None:
+    """
+    Применяет набор изменений к чанкам, эмбеддингам и FAISS индексу.
+
+    Args:
+        change_set (ChangeSet): Набор изменений
+        new_table (ArticleTable): Статьи новой редакции
+        chunks_file (str): Файл чанков (перезаписывается)
+        index_path (str): FAISS индекс с идентификаторами чанков (обновляется на месте)
+        model_name (str): Модель эмбеддингов
+        cache_dir (Optional[str]): Каталог кэша эмбеддингов
+        token_model (Optional[str]): Модель, по токенизатору которой режутся чанки
+    """
+    from article_index import ArticleIndex, article_index_path
+    from chunking import chunk_id, load_token_budget
+    from generator import create_embeddings, update_faiss_index
+
+    with open(chunks_file, "r", encoding="utf-8") as f:
+        old_chunks = json.load(f)
+
+    tokenizer, max_tokens = load_token_budget(token_model) if token_model else (None, None)
+    all_chunks, new_chunks, removed_ids = update_chunks(old_chunks, new_table, change_set, tokenizer, max_tokens)
+    print(f"Чанки: удаляется {len(removed_ids)}, создается {len(new_chunks)}, всего {len(all_chunks)}")
+
+    embeddings = create_embeddings(new_chunks, model_name=model_name, cache_dir=cache_dir) if new_chunks else None
+    update_faiss_index(index_path, removed_ids, embeddings, [chunk_id(chunk) for chunk in new_chunks])
+
+    with open(chunks_file, "w", encoding="utf-8") as f:
+        json.dump(all_chunks, f, ensure_ascii=False, indent=2)
+    ArticleIndex.from_chunks(all_chunks).save(article_index_path(chunks_file))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сравнение редакций кодекса по статьям")
+    parser.add_argument("old", help="Статьи старой редакции (articles_table.json или articles_for_embeddings.json)")
+    parser.add_argument("new", help="Статьи новой редакции")
+    parser.add_argument("--output", default="output/article_changes.json", help="Куда сохранить набор изменений")
+    parser.add_argument("--apply", action="store_true",
+                        help="Обновить чанки, эмбеддинги и FAISS индекс по набору изменений")
+    parser.add_argument("--token-model", help="Резать чанки по бюджету токенов этой модели (как в main.py)")
+    args = parser.parse_args()
+
+    old_table = ArticleTable.load_any(args.old)
+    new_table = ArticleTable.load_any(args.new)
+    change_set = diff_article_tables(old_table, new_table)
+    print(change_set.summary())
+    change_set.save(args.output)
+    print(f"Набор изменений сохранен в {args.output}")
+
+    if args.apply and not change_set.is_empty():
+        apply_change_set(change_set, new_table, token_model=args.token_model)
@@ -0,0 +1,213 @@
+"""
+Индекс "номер статьи -> чанки" для мгновенного поиска статей
+
+Индекс строится по полю article_numbers чанков и сохраняется рядом с файлом
+чанков, чтобы поиск вида "artículo 138" был поиском по словарю, а не
+просмотром всех чанков. Поддерживаются статьи с суффиксами ("57 bis") и
+диапазоны ("138-140", "138 a 140").
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Латинские суффиксы вставленных статей в порядке следования
+ARTICLE_SUFFIXES = [
+    "bis", "ter", "quater", "quinquies", "sexies",
+    "septies", "octies", "nonies", "decies",
+]
+
+# В тексте кодекса "quáter" пишется с ударением; в ключах индекса - без него
+ARTICLE_SUFFIX_GROUP = "|".join(suffix.replace("quater", "qu[aá]ter") for suffix in ARTICLE_SUFFIXES)
+ARTICLE_NUMBER_PATTERN = re.compile(rf"(\d+)\s*({ARTICLE_SUFFIX_GROUP})?\b", re.IGNORECASE)
+ARTICLE_RANGE_PATTERN = re.compile(
+    rf"(\d+)(?:\s*(?:{ARTICLE_SUFFIX_GROUP}))?\s*(?:-|–|\ba\b|\bal\b|\bпо\b)\s*(\d+)",
+    re.IGNORECASE
+)
+
+
+def normalize_article_number(raw: str) -> str:
+    """
+    Приводит номер статьи к каноническому виду: "57BIS." -> "57 bis", "616 quáter" -> "616 quater".
+
+    Args:
+        raw (str): Номер статьи в произвольной записи
+
+    Returns:
+        str: Нормализованный номер или пустая строка, если номер не найден
+    """
+    match = ARTICLE_NUMBER_PATTERN.search(raw)
+    if not match:
+        return ""
+    number, suffix = match.group(1).lstrip("0") or "0", match.group(2)
+    return f"{number} {suffix.lower().replace('á', 'a')}" if suffix else number
+
+
+def parse_article_range(reference: str) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает ссылку на диапазон статей.
+
+    Диапазон не разворачивается в список номеров: границы приходят от
+    пользователя ("artículo 1-20000000"), поэтому номера внутри них выбираются
+    из индекса (ArticleIndex.lookup).
+
+    Args:
+        reference (str): Например "138-140", "138 a 140"
+
+    Returns:
+        Optional[Tuple[int, int]]: Границы диапазона включительно или None,
+            если ссылка не диапазон
+    """
+    range_match = ARTICLE_RANGE_PATTERN.search(reference)
+    if range_match:
+        start, end = int(range_match.group(1)), int(range_match.group(2))
+        if start <= end:
+            return start, end
+    return None
+
+
+def chunks_fingerprint(chunks: List[Dict]) -> str:
+    """
+    Отпечаток содержимого чанков: идентификаторы, тексты и номера статей по порядку.
+
+    Args:
+        chunks (List[Dict]): Чанки
+
+    Returns:
+        str: Шестнадцатеричный хэш (16 символов)
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for chunk in chunks:
+        key = [chunk.get("chunk_id"), chunk["text"], chunk.get("article_numbers", [])]
+        digest.update(json.dumps(key, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ArticleIndex:
+    """
+    Хэш-индекс номеров статей: нормализованный номер -> позиции чанков.
+    """
+
+    def __init__(self, mapping: Dict[str, List[int]], chunk_count: int, fingerprint: str = ""):
+        """
+        Args:
+            mapping (Dict[str, List[int]]): Номер статьи -> позиции чанков
+            chunk_count (int): Количество чанков, по которым построен индекс
+            fingerprint (str): Отпечаток чанков (chunks_fingerprint), по которым построен индекс
+        """
+        self.mapping = mapping
+        self.chunk_count = chunk_count
+        self.fingerprint = fingerprint
+
+        # Базовый номер -> все его варианты с суффиксами ("57" -> ["57", "57 bis"])
+        self.variants: Dict[str, List[str]] = {}
+        for key in mapping:
+            self.variants.setdefault(key.split()[0], []).append(key)
+        # Базовые номера по возрастанию для выбора диапазона через bisect
+        self.base_numbers = sorted(int(base) for base in self.variants)
+
+    @classmethod
+    def from_chunks(cls, chunks: List[Dict]) -> "ArticleIndex":
+        """
+        Строит индекс по списку чанков.
+
+        Args:
+            chunks (List[Dict]): Чанки с полем article_numbers
+
+        Returns:
+            ArticleIndex: Построенный индекс
+        """
+        mapping: Dict[str, List[int]] = {}
+        for position, chunk in enumerate(chunks):
+            for raw_number in chunk.get("article_numbers", []):
+                number = normalize_article_number(str(raw_number))
+                if not number:
+                    continue
+                positions = mapping.setdefault(number, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+        return cls(mapping, len(chunks), chunks_fingerprint(chunks))
+
+    def save(self, path: str) -> None:
+        """Сохраняет индекс в JSON файл."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"chunk_count": self.chunk_count, "fingerprint": self.fingerprint,
+                       "articles": self.mapping}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "ArticleIndex":
+        """Загружает индекс из JSON файла."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["articles"], data["chunk_count"], data.get("fingerprint", ""))
+
+    def lookup(self, reference: str) -> List[int]:
+        """
+        Находит позиции чанков для ссылки на статью или диапазон статей.
+
+        Статья с суффиксом, которой нет в индексе, не подменяется базовой
+        ("57 bis" не находит статью 57). Для диапазона учитываются все
+        варианты с суффиксами внутри диапазона.
+
+        Args:
+            reference (str): Ссылка на статью ("138", "57 bis", "138-140")
+
+        Returns:
+            List[int]: Позиции чанков в порядке документа без повторов
+        """
+        keys: List[str] = []
+        article_range = parse_article_range(reference)
+        if article_range:
+            # Перебираются только номера из индекса, а не все числа диапазона
+            first = bisect.bisect_left(self.base_numbers, article_range[0])
+            last = bisect.bisect_right(self.base_numbers, article_range[1])
+            for base in self.base_numbers[first:last]:
+                keys.extend(self.variants[str(base)])
+        else:
+            number = normalize_article_number(reference)
+            if number in self.mapping:
+                keys.append(number)
+
+        positions = set()
+        for key in keys:
+            positions.update(self.mapping[key])
+        return sorted(positions)
+
+
+def article_index_path(chunks_file: str) -> str:
+    """
+    Путь к файлу индекса статей рядом с файлом чанков.
+
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+
+    Returns:
+        str: Например "output/penal_code_chunks.articles.json"
+    """
+    root, _ = os.path.splitext(chunks_file)
+    return f"{root}.articles.json"
+
+
+def load_or_build_article_index(chunks: List[Dict], chunks_file: str) -> ArticleIndex:
+    """
+    Загружает сохраненный индекс статей или строит его заново, если файл
+    отсутствует или построен по другому набору чанков. Набор сравнивается по
+    отпечатку содержимого: чанки могут измениться без изменения их числа.
+
+    Args:
+        chunks (List[Dict]): Загруженные чанки
+        chunks_file (str): Путь к файлу, из которого загружены чанки
+
+    Returns:
+        ArticleIndex: Индекс статей
+    """
+    path = article_index_path(chunks_file)
+    if os.path.exists(path):
+        index = ArticleIndex.load(path)
+        if index.chunk_count == len(chunks) and index.fingerprint == chunks_fingerprint(chunks):
+            return index
+    return ArticleIndex.from_chunks(chunks)
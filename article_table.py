@@ -0,0 +1,170 @@
+"""
+Каноническая таблица статей кодекса
+
+Прежний разбор выделяет статьи и из текста título, и из каждого capítulo
+внутри него, поэтому плоский список содержит почти каждую статью дважды, и она
+дважды группируется, режется на чанки и кодируется. Таблица хранит ровно одну
+строку на номер статьи - с самым глубоким структурным путем (capítulo, если
+статья в нем есть), в порядке документа. Все этапы после разбора (группировка,
+чанки, эмбеддинги) читают статьи только из нее.
+"""
+
+import json
+from typing import Dict, Iterator, List, Optional
+
+from document_model import ARTICLE, NO_PARENT, SpanDocument
+
+ARTICLE_TABLE_FILE = "articles_table.json"
+
+
+class ArticleTable:
+    """
+    Статьи без повторов: по строке на номер статьи в порядке документа.
+
+    Строки имеют тот же вид, что элементы articles_for_embeddings.json
+    (libro, titulo, capitulo, article_number, text); текст статьи - уже строка,
+    а не смещения в SpanDocument.
+    """
+
+    def __init__(self, rows: List[Dict]):
+        """
+        Args:
+            rows (List[Dict]): Строки таблицы (номера статей не повторяются)
+        """
+        self.rows = rows
+        self.positions = {}
+        for position, row in enumerate(rows):
+            if row["article_number"] in self.positions:
+                raise ValueError(f"Статья {row['article_number']} повторяется в таблице")
+            self.positions[row["article_number"]] = position
+
+    @classmethod
+    def from_document(cls, document: SpanDocument) -> "ArticleTable":
+        """
+        Выбирает для каждого номера статьи самый глубокий узел документа.
+
+        Два узла с одним номером на одной глубине (одинаковый номер в двух
+        capítulos) - ошибка разбора: выбор одного из них потерял бы текст другого.
+
+        Args:
+            document (SpanDocument): Разобранный документ
+
+        Returns:
+            ArticleTable: Таблица статей
+
+        Raises:
+            ValueError: Если номер статьи повторяется на одной глубине
+        """
+        chosen: Dict[str, tuple] = {}
+        for node in range(len(document)):
+            if document.kinds[node] != ARTICLE:
+                continue
+            depth = 0
+            parent = document.parents[node]
+            while parent != NO_PARENT:
+                depth += 1
+                parent = document.parents[parent]
+            number = document.labels[node]
+            rank = (-depth, document.starts[node])
+            if number in chosen and chosen[number][0][0] == -depth:
+                raise ValueError(f"Статья {number} встречается дважды на одном уровне структуры")
+            # Чем глубже узел, тем лучше
+            if number not in chosen or rank < chosen[number][0]:
+                chosen[number] = (rank, node)
+
+        rows = []
+        for _, node in sorted(chosen.values(), key=lambda item: item[0][1]):
+            libro, titulo, capitulo = document.path(node)
+            rows.append({
+                "libro": libro,
+                "titulo": titulo,
+                "capitulo": capitulo,
+                "article_number": document.labels[node],
+                "text": document.span_text(node),
+            })
+        return cls(rows)
+
+    @classmethod
+    def from_flat_list(cls, articles: List[Dict]) -> "ArticleTable":
+        """
+        Строит таблицу из плоского списка статей с повторами (articles_for_embeddings.json).
+
+        Из повторов остается строка с самым глубоким путем; повтор на той же
+        глубине - ошибка, как и в from_document.
+
+        Args:
+            articles (List[Dict]): Плоский список статей
+
+        Returns:
+            ArticleTable: Таблица статей
+
+        Raises:
+            ValueError: Если номер статьи повторяется на одной глубине
+        """
+        chosen: Dict[str, tuple] = {}
+        for position, row in enumerate(articles):
+            depth = sum(1 for level in (row["libro"], row["titulo"], row["capitulo"]) if level)
+            rank = (-depth, position)
+            number = row["article_number"]
+            if number in chosen and chosen[number][0][0] == -depth:
+                raise ValueError(f"Статья {number} встречается дважды на одном уровне структуры")
+            if number not in chosen or rank < chosen[number][0]:
+                chosen[number] = (rank, row)
+        return cls([row for _, row in sorted(chosen.values(), key=lambda item: item[0][1])])
+
+    @classmethod
+    def load_any(cls, path: str) -> "ArticleTable":
+        """
+        Загружает таблицу статей или плоский список статей с повторами.
+
+        Args:
+            path (str): articles_table.json или articles_for_embeddings.json
+
+        Returns:
+            ArticleTable: Таблица статей
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_flat_list(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.rows)
+
+    def get(self, article_number: str) -> Optional[Dict]:
+        """
+        Строка статьи по номеру.
+
+        Args:
+            article_number (str): Номер статьи
+
+        Returns:
+            Optional[Dict]: Строка таблицы или None
+        """
+        position = self.positions.get(article_number)
+        return self.rows[position] if position is not None else None
+
+    def save(self, path: str = ARTICLE_TABLE_FILE) -> None:
+        """
+        Сохраняет таблицу в JSON.
+
+        Args:
+            path (str): Путь к файлу
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.rows, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str = ARTICLE_TABLE_FILE) -> "ArticleTable":
+        """
+        Загружает таблицу из JSON.
+
+        Args:
+            path (str): Путь к файлу
+
+        Returns:
+            ArticleTable: Таблица статей
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
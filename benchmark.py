@@ -0,0 +1,522 @@
+"""
+Бенчмарки для этапов обработки и поиска по Уголовному кодексу
+
+Каждый бенчмарк запускается отдельной подкомандой, например:
+    python benchmark.py lexical --scale 10
+"""
+
+import argparse
+import os
+import time
+from typing import Callable
+
+from lexical_index import LexicalIndex
+from search import _text_match_results, extract_key_terms, load_chunks
+
+# Типичные запросы пользователей для текстового поиска
+SAMPLE_QUERIES = [
+    "plazo de prescripción del delito de homicidio",
+    "pena por robo con violencia",
+    "artículo 138 homicidio",
+    "estafa y responsabilidad civil",
+    "atenuante y agravante de la pena",
+    "asesinato con alevosía",
+    "hurto de 400 euros",
+    "violencia en el ámbito familiar",
+]
+
+
+def _timeit(func: Callable, repeat: int) -> float:
+    """Возвращает среднее время одного вызова func в миллисекундах."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_lexical(chunks_file: str, scale: int, repeat: int) -> None:
+    """
+    Сравнивает линейный просмотр чанков с поиском по инвертированному индексу.
+
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+        scale (int): Во сколько раз размножить корпус (имитация больших кодексов)
+        repeat (int): Сколько раз повторить набор запросов
+    """
+    chunks = load_chunks(chunks_file) * scale
+    print(f"Корпус: {len(chunks)} чанков, запросов: {len(SAMPLE_QUERIES)}")
+
+    start = time.perf_counter()
+    index = LexicalIndex([chunk["text"] for chunk in chunks])
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Построение инвертированного индекса: {build_ms:.1f} мс ({len(index.vocabulary)} токенов)")
+
+    def run_scan():
+        for query in SAMPLE_QUERIES:
+            _text_match_results(query, chunks)
+
+    def run_index():
+        for query in SAMPLE_QUERIES:
+            index.search(extract_key_terms(query.lower()), top_k=3)
+
+    scan_ms = _timeit(run_scan, repeat) / len(SAMPLE_QUERIES)
+    index_ms = _timeit(run_index, repeat) / len(SAMPLE_QUERIES)
+    print(f"Линейный просмотр:      {scan_ms:.3f} мс/запрос")
+    print(f"Инвертированный индекс: {index_ms:.3f} мс/запрос")
+    print(f"Ускорение: x{scan_ms / index_ms:.1f}")
+
+
+def bench_encode(chunks_file: str, model_name: str, batch_size: int, token_budget: int) -> None:
+    """
+    Сравнивает пропускную способность кодирования (чанков/сек) фиксированными батчами
+    в порядке файла и батчами, сгруппированными по длине.
+
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+        model_name (str): Модель эмбеддингов
+        batch_size (int): Размер батча текущего цикла
+        token_budget (int): Бюджет токенов на батч для группировки по длине
+    """
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    from generator import _encode_texts_bucketed
+
+    texts = [chunk["text"] for chunk in load_chunks(chunks_file)]
+    model = SentenceTransformer(model_name, device="cpu")
+    print(f"Модель: {model_name}, чанков: {len(texts)}")
+
+    # Прогрев, чтобы не учитывать инициализацию ядер torch
+    model.encode(texts[:batch_size], convert_to_numpy=True, show_progress_bar=False)
+
+    # Текущий цикл create_embeddings: срезы по batch_size в порядке файла
+    start = time.perf_counter()
+    fixed = np.vstack([
+        model.encode(texts[i:i + batch_size], convert_to_numpy=True, show_progress_bar=False)
+        for i in range(0, len(texts), batch_size)
+    ])
+    fixed_rate = len(texts) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    bucketed = _encode_texts_bucketed(model, texts, token_budget, show_progress=False)
+    bucketed_rate = len(texts) / (time.perf_counter() - start)
+
+    max_diff = float(np.abs(fixed - bucketed).max())
+    print(f"Фиксированные батчи по {batch_size}: {fixed_rate:.1f} чанков/сек")
+    print(f"Батчи по длине (бюджет {token_budget} токенов): {bucketed_rate:.1f} чанков/сек")
+    print(f"Ускорение: x{bucketed_rate / fixed_rate:.2f}, макс. расхождение векторов: {max_diff:.2e}")
+
+
+def bench_encode_parallel(chunks_file: str, model_name: str, max_workers: int, torch_threads: int) -> None:
+    """
+    Измеряет, как время построения эмбеддингов масштабируется с числом процессов.
+
+    Время включает запуск процессов и загрузку модели в каждом из них.
+
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+        model_name (str): Модель эмбеддингов
+        max_workers (int): Максимальное число процессов (удваивается от 1)
+        torch_threads (int): Потоков torch в каждом процессе
+    """
+    from generator import _encode_texts_parallel
+
+    texts = [chunk["text"] for chunk in load_chunks(chunks_file)]
+    print(f"Модель: {model_name}, чанков: {len(texts)}, потоков torch на процесс: {torch_threads}")
+
+    workers = 1
+    base_rate = None
+    while workers <= max_workers:
+        start = time.perf_counter()
+        _encode_texts_parallel(model_name, texts, workers, torch_threads, 16, 16 * 128, show_progress=False)
+        rate = len(texts) / (time.perf_counter() - start)
+        base_rate = base_rate or rate
+        print(f"Процессов: {workers:2d} - {rate:.1f} чанков/сек (x{rate / base_rate:.2f})")
+        workers *= 2
+
+
+def bench_startup(chunks_file: str, index_path: str, artifacts_dir: str) -> None:
+    """
+    Сравнивает время холодного старта данных поиска: разбор JSON и построение
+    индексов против открытия memory-mapped артефактов (без загрузки модели).
+
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+        index_path (str): Путь к FAISS индексу
+        artifacts_dir (str): Каталог артефактов serving_artifacts.py
+    """
+    import faiss
+    from article_index import load_or_build_article_index
+    from serving_artifacts import ServingArtifacts
+
+    start = time.perf_counter()
+    chunks = load_chunks(chunks_file)
+    faiss.read_index(index_path)
+    LexicalIndex([chunk["text"] for chunk in chunks])
+    load_or_build_article_index(chunks, chunks_file)
+    json_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    ServingArtifacts(artifacts_dir)
+    mmap_ms = (time.perf_counter() - start) * 1000
+
+    print(f"JSON + построение индексов: {json_ms:.1f} мс")
+    print(f"Memory-mapped артефакты:    {mmap_ms:.1f} мс")
+
+
+def bench_extract(pdf_path: str, max_workers: int) -> None:
+    """
+    Измеряет скорость извлечения страниц PDF (страниц/сек) при росте числа процессов.
+
+    Args:
+        pdf_path (str): Путь к PDF
+        max_workers (int): Максимальное число процессов (удваивается от 1)
+    """
+    from pdf_extractor import iter_page_texts
+
+    workers = 1
+    base_rate = None
+    while workers <= max_workers:
+        start = time.perf_counter()
+        pages = sum(1 for _ in iter_page_texts(pdf_path, workers))
+        rate = pages / (time.perf_counter() - start)
+        base_rate = base_rate or rate
+        print(f"Процессов: {workers:2d} - {rate:.1f} страниц/сек (x{rate / base_rate:.2f})")
+        workers *= 2
+
+
+def bench_parse(pdf_path: str, repeat: int) -> None:
+    """
+    Сравнивает прежний разбор структуры из best_attempt.py (вложенные
+    re.finditer по срезам текста и регулярное выражение статей) с
+    однопроходным разбором structure_parser.py: отдельно построение документа
+    на смещениях и вместе с представлением structured_document.json.
+
+    Args:
+        pdf_path (str): Путь к PDF, текст которого извлекается и очищается потоком
+        repeat (int): Сколько раз повторить разбор
+    """
+    import contextlib
+    import io
+    import best_attempt
+    from clean_text import clean_pdf_lines
+    from page_cache import PAGE_CACHE_DIR, PageTextCache
+    from structure_parser import build_document, parse_structure
+
+    cache = PageTextCache(PAGE_CACHE_DIR)
+    text = "\n".join(clean_pdf_lines(pdf_path, cache=cache))
+    cache.save()
+    print(f"Текст: {len(text)} символов")
+
+    def run_legacy():
+        # Старый разбор печатает каждый найденный раздел; статьи - прежним регулярным выражением
+        with contextlib.redirect_stdout(io.StringIO()):
+            sections = best_attempt.find_main_sections(pdf_path, text)
+            sections_text = best_attempt.extract_sections_text(pdf_path, sections, text)
+            return best_attempt.extract_articles(best_attempt.find_subsections(sections_text),
+                                                 extract=best_attempt.extract_articles_from_text)
+
+    legacy_ms = _timeit(run_legacy, repeat)
+    document_ms = _timeit(lambda: build_document(text), repeat)
+    structure_ms = _timeit(lambda: parse_structure(text), repeat)
+    same = run_legacy() == parse_structure(text)
+    print(f"Вложенные re.finditer:                  {legacy_ms:.1f} мс")
+    print(f"Однопроходный разбор (документ):        {document_ms:.1f} мс")
+    print(f"Однопроходный разбор + to_structure():  {structure_ms:.1f} мс")
+    print(f"Ускорение: x{legacy_ms / document_ms:.1f} (с представлением x{legacy_ms / structure_ms:.1f}), "
+          f"результаты совпадают: {'да' if same else 'нет'}")
+
+
+def bench_articles(text_file: str, expected_file: str, repeat: int) -> None:
+    """
+    Сравнивает выделение статей прежним регулярным выражением и split_articles
+    на текстах всех título и capítulo, затем проверяет, что best_attempt.py
+    строит плоский список статей, совпадающий с эталоном.
+
+    Эталон - отпечатки статей (best_attempt.article_digests) в tests/data, а не
+    articles_for_embeddings.json: тот перезаписывается самим best_attempt.py, и
+    сравнение с ним ничего бы не проверяло.
+
+    Args:
+        text_file (str): Очищенный текст кодекса
+        expected_file (str): Эталонные отпечатки статей (tests/data/articles_golden.json)
+        repeat (int): Сколько раз повторить выделение статей
+    """
+    import contextlib
+    import io
+    import json
+    import best_attempt
+    from structure_parser import split_articles
+
+    with open(text_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sections = best_attempt.find_main_sections(text_file, text)
+        structure = best_attempt.find_subsections(best_attempt.extract_sections_text(text_file, sections, text))
+
+    texts = []
+    for section_name, section_data in structure.items():
+        if section_name == 'TÍTULO PRELIMINAR':
+            texts.append(section_data['text'])
+            continue
+        for titulo_data in section_data.values():
+            texts.append(titulo_data['text'])
+            texts.extend(capitulo['text'] for capitulo in titulo_data['capitulos'].values())
+    print(f"Текстов разделов: {len(texts)}, символов: {sum(len(t) for t in texts)}")
+
+    regex_ms = _timeit(lambda: [best_attempt.extract_articles_from_text(t) for t in texts], repeat)
+    split_ms = _timeit(lambda: [split_articles(t) for t in texts], repeat)
+    same = all(best_attempt.extract_articles_from_text(t) == split_articles(t) for t in texts)
+    print(f"Регулярное выражение с lookahead: {regex_ms:.1f} мс")
+    print(f"Срезы между заголовками:          {split_ms:.1f} мс")
+    print(f"Ускорение: x{regex_ms / split_ms:.1f}, статьи совпадают: {'да' if same else 'нет'}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        flat_list = best_attempt.create_flat_structure(best_attempt.extract_articles(structure))
+    with open(expected_file, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    regression_ok = best_attempt.article_digests(flat_list) == expected
+    print(f"Совпадение с {expected_file}: {'да' if regression_ok else 'нет'} ({len(flat_list)} статей)")
+    if not (same and regression_ok):
+        raise SystemExit(1)
+
+
+async def _post_questions(host: str, port: int, questions: list) -> None:
+    """Отправляет вопросы по одному соединению keep-alive и дожидается ответов."""
+    import asyncio
+    import json
+
+    reader, writer = await asyncio.open_connection(host, port)
+    for question in questions:
+        body = json.dumps({"question": question}).encode("utf-8")
+        writer.write(f"POST /legal_question HTTP/1.1\r\nHost: {host}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+    writer.close()
+
+
+def bench_serve(chunks_file: str, index_path: str, model_name: str, clients: int, requests: int,
+                max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Пропускная способность HTTP сервиса при параллельных клиентах: без
+    микробатчинга (батч из одного запроса) и с ним.
+
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+        index_path (str): Путь к FAISS индексу
+        model_name (str): Модель эмбеддингов
+        clients (int): Число параллельных клиентов
+        requests (int): Число вопросов на клиента
+        max_batch_size (int): Максимальный батч во втором прогоне
+        max_wait_ms (float): Ожидание батча во втором прогоне, мс
+    """
+    import asyncio
+    import socket
+
+    from legal_bot import LegalAssistant
+    from search import SearchEngine
+    from server import LegalQuestionService
+
+    engine = SearchEngine(chunks_file, index_path, model_name)
+    engine.warm_up()
+
+    async def run(batch_size: int, wait_ms: float) -> float:
+        # Новый ассистент на каждый прогон: вопросы уникальны, кэши не срабатывают
+        service = LegalQuestionService(LegalAssistant(engine=engine, semantic_threshold=None), batch_size, wait_ms)
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(clients)
+        port = sock.getsockname()[1]
+        server_task = asyncio.create_task(service.serve(sock=sock))
+        await asyncio.sleep(0.1)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _post_questions("127.0.0.1", port, [
+                f"{SAMPLE_QUERIES[(client + i) % len(SAMPLE_QUERIES)]} ({client}-{i})" for i in range(requests)
+            ])
+            for client in range(clients)
+        ])
+        elapsed = time.perf_counter() - start
+
+        stats = service.stats()
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+        print(f"Батч до {batch_size:3d}, ожидание {wait_ms:4.1f} мс: {clients * requests / elapsed:7.1f} запросов/сек, "
+              f"средний батч {stats['mean_batch_size']:.1f}")
+        return elapsed
+
+    base = asyncio.run(run(1, 0.0))
+    batched = asyncio.run(run(max_batch_size, max_wait_ms))
+    print(f"Ускорение: x{base / batched:.2f}")
+
+
+def _process_memory(pid: int) -> dict:
+    """RSS, PSS и частная память процесса в МБ (из /proc/<pid>/smaps_rollup)."""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                memory[name] = int(value.split()[0]) / 1024
+    return {"rss": memory["Rss"], "pss": memory["Pss"],
+            "private": memory["Private_Clean"] + memory["Private_Dirty"]}
+
+
+def bench_workers(server_args: list, workers_list: list, clients: int, requests: int) -> None:
+    """
+    Пропускная способность и память pre-fork сервиса при разном числе процессов.
+
+    Сервис запускается отдельным процессом (python server.py --workers N), после
+    нагрузки печатается память главного процесса и каждого обработчика.
+
+    Args:
+        server_args (list): Дополнительные аргументы server.py (модель, артефакты)
+        workers_list (list): Числа процессов-обработчиков для сравнения
+        clients (int): Число параллельных клиентов
+        requests (int): Число вопросов на клиента
+    """
+    import asyncio
+    import socket
+    import subprocess
+    import sys
+    import urllib.request
+
+    base_rate = None
+    for workers in workers_list:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        server = subprocess.Popen(
+            [sys.executable, "server.py", "--port", str(port), "--workers", str(workers), *server_args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = time.time() + 600
+            while True:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+                    break
+                except OSError:
+                    if server.poll() is not None or time.time() > deadline:
+                        raise RuntimeError("Сервис не запустился")
+                    time.sleep(0.5)
+
+            async def load() -> None:
+                await asyncio.gather(*[
+                    _post_questions("127.0.0.1", port, [
+                        f"{SAMPLE_QUERIES[(client + i) % len(SAMPLE_QUERIES)]} ({workers}-{client}-{i})"
+                        for i in range(requests)
+                    ])
+                    for client in range(clients)
+                ])
+
+            start = time.perf_counter()
+            asyncio.run(load())
+            rate = clients * requests / (time.perf_counter() - start)
+            base_rate = base_rate or rate
+
+            with open(f"/proc/{server.pid}/task/{server.pid}/children", "r") as f:
+                children = [int(pid) for pid in f.read().split()]
+            master = _process_memory(server.pid)
+            print(f"Обработчиков: {workers:2d} - {rate:7.1f} запросов/сек (x{rate / base_rate:.2f}); "
+                  f"главный процесс RSS {master['rss']:.0f} МБ")
+            for pid in children:
+                memory = _process_memory(pid)
+                print(f"    обработчик {pid}: RSS {memory['rss']:.0f} МБ, PSS {memory['pss']:.0f} МБ, "
+                      f"частная {memory['private']:.0f} МБ")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки поиска по Уголовному кодексу")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    lexical = subparsers.add_parser("lexical", help="Текстовый поиск: линейный просмотр против BM25 индекса")
+    lexical.add_argument("--chunks", default="output/penal_code_chunks.json")
+    lexical.add_argument("--scale", type=int, default=1)
+    lexical.add_argument("--repeat", type=int, default=20)
+
+    encode = subparsers.add_parser("encode", help="Кодирование: фиксированные батчи против батчей по длине")
+    encode.add_argument("--chunks", default="output/penal_code_chunks.json")
+    encode.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    encode.add_argument("--batch-size", type=int, default=16)
+    encode.add_argument("--token-budget", type=int, default=16 * 128)
+
+    parallel = subparsers.add_parser("encode-parallel", help="Масштабирование кодирования по числу процессов")
+    parallel.add_argument("--chunks", default="output/penal_code_chunks.json")
+    parallel.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parallel.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parallel.add_argument("--torch-threads", type=int, default=1)
+
+    startup = subparsers.add_parser("startup", help="Холодный старт: JSON против memory-mapped артефактов")
+    startup.add_argument("--chunks", default="output/penal_code_chunks.json")
+    startup.add_argument("--index", default="output/penal_code.index")
+    startup.add_argument("--artifacts", default="output/serving")
+
+    extract = subparsers.add_parser("extract", help="Извлечение страниц PDF по числу процессов")
+    extract.add_argument("--pdf", default="codigo_penal.pdf")
+    extract.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    parse = subparsers.add_parser("parse", help="Разбор структуры: вложенные регулярные выражения против одного прохода")
+    parse.add_argument("--pdf", default="codigo_penal.pdf")
+    parse.add_argument("--repeat", type=int, default=5)
+
+    articles = subparsers.add_parser("articles", help="Выделение статей: регулярное выражение против срезов, проверка регрессии")
+    articles.add_argument("--text", default="cleaned_text.txt")
+    articles.add_argument("--expected", default="tests/data/articles_golden.json")
+    articles.add_argument("--repeat", type=int, default=5)
+
+    serve = subparsers.add_parser("serve", help="HTTP сервис: пропускная способность без микробатчинга и с ним")
+    serve.add_argument("--chunks", default="output/penal_code_chunks.json")
+    serve.add_argument("--index", default="output/penal_code.index")
+    serve.add_argument("--model", default="all-MiniLM-L6-v2")
+    serve.add_argument("--clients", type=int, default=32)
+    serve.add_argument("--requests", type=int, default=8)
+    serve.add_argument("--max-batch-size", type=int, default=32)
+    serve.add_argument("--max-wait-ms", type=float, default=5.0)
+
+    workers = subparsers.add_parser("workers", help="Pre-fork сервис: пропускная способность и память по числу процессов")
+    workers.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    workers.add_argument("--clients", type=int, default=32)
+    workers.add_argument("--requests", type=int, default=8)
+    workers.add_argument("--artifacts", default="output/serving")
+    workers.add_argument("--model", default="all-MiniLM-L6-v2")
+
+    args = parser.parse_args()
+
+    if args.command == "lexical":
+        bench_lexical(args.chunks, args.scale, args.repeat)
+    elif args.command == "encode":
+        bench_encode(args.chunks, args.model, args.batch_size, args.token_budget)
+    elif args.command == "encode-parallel":
+        bench_encode_parallel(args.chunks, args.model, args.max_workers, args.torch_threads)
+    elif args.command == "startup":
+        bench_startup(args.chunks, args.index, args.artifacts)
+    elif args.command == "extract":
+        bench_extract(args.pdf, args.max_workers)
+    elif args.command == "parse":
+        bench_parse(args.pdf, args.repeat)
+    elif args.command == "articles":
+        bench_articles(args.text, args.expected, args.repeat)
+    elif args.command == "serve":
+        bench_serve(args.chunks, args.index, args.model, args.clients, args.requests,
+                    args.max_batch_size, args.max_wait_ms)
+    elif args.command == "workers":
+        bench_workers(["--artifacts", args.artifacts, "--model", args.model], args.workers, args.clients, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
+import hashlib
 import re
 import json
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+
+from article_table import ARTICLE_TABLE_FILE, ArticleTable
+from structure_parser import ARTICLE_NUMBER, SECTION_SUFFIX, StructureParser, split_articles
 
 # Путь к очищенному файлу
 cleaned_text_file = 'cleaned_text.txt'
+# Разобранный документ на смещениях (document_model.SpanDocument)
+spans_document_file = 'structured_document.spans.json'
 
-def find_main_sections(input_file: str) -> dict:
+def find_main_sections(input_file: str, text: Optional[str] = None) -> dict:
     """
     Находит основные секции в тексте закона:
     - TÍTULO PRELIMINAR
@@ -15,12 +21,14 @@ def find_main_sections(input_file: str) -> dict:
     
     Args:
         input_file (str): путь к очищенному файлу с текстом
+        text (Optional[str]): уже очищенный текст (тогда файл не читается)
         
     Returns:
         dict: словарь с найденными секциями и их позициями
     """
-    with open(input_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+    if text is None:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
 
     sections = {}
 
@@ -46,19 +54,21 @@ def find_main_sections(input_file: str) -> dict:
     
     return sections
 
-def extract_sections_text(input_file: str, sections: dict) -> dict:
+def extract_sections_text(input_file: str, sections: dict, text: Optional[str] = None) -> dict:
     """
     Извлекает текст каждой секции, используя найденные позиции
     
     Args:
         input_file (str): путь к файлу с текстом
         sections (dict): словарь с позициями секций
+        text (Optional[str]): уже очищенный текст (тогда файл не читается)
     
     Returns:
         dict: словарь с текстами секций
     """
-    with open(input_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+    if text is None:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
     
     sections_text = {}
     sorted_sections = sorted(sections.items(), key=lambda x: x[1])
@@ -104,7 +114,7 @@ def find_subsections(sections_text: dict) -> dict:
         # Для LIBRO ищем TÍTULO и CAPÍTULO
         else:
             # Ищем все TÍTULO
-            titulos = list(re.finditer(r'TÍTULO\s+(?:PRIMERO|[IVX]+)', section_text))
+            titulos = list(re.finditer(rf'TÍTULO\s+(?:PRIMERO|[IVX]+){SECTION_SUFFIX}', section_text))
             
             for i, titulo_match in enumerate(titulos):
                 titulo_name = titulo_match.group()
@@ -127,7 +137,7 @@ def find_subsections(sections_text: dict) -> dict:
                 }
                 
                 # Ищем все CAPÍTULO внутри этого TÍTULO
-                capitulos = list(re.finditer(r'CAPÍTULO\s+(?:PRIMERO|[IVX]+)', titulo_text))
+                capitulos = list(re.finditer(rf'CAPÍTULO\s+(?:PRIMERO|[IVX]+){SECTION_SUFFIX}', titulo_text))
                 
                 for j, capitulo_match in enumerate(capitulos):
                     capitulo_name = capitulo_match.group()
@@ -150,12 +160,14 @@ def find_subsections(sections_text: dict) -> dict:
     
     return structure
 
-def extract_articles(structure: dict) -> dict:
+def extract_articles(structure: dict, extract: Callable[[str], Dict[str, str]] = split_articles) -> dict:
     """
     Извлекает статьи из всех разделов документа
     
     Args:
         structure (dict): иерархическая структура документа
+        extract (Callable[[str], Dict[str, str]]): функция выделения статей из текста;
+            extract_articles_from_text - прежний путь через регулярное выражение
     
     Returns:
         dict: структура с добавленными статьями
@@ -163,13 +175,10 @@ def extract_articles(structure: dict) -> dict:
     print("\nИзвлечение статей...")
     article_count = 0
     
-    # Паттерн для поиска статей
-    article_pattern = r'Artículo\s+(\d+)[^\n]*\n((?:(?!Artículo\s+\d+)[^\n]|\n)*)'
-    
     # Для TÍTULO PRELIMINAR
     if 'TÍTULO PRELIMINAR' in structure:
         text = structure['TÍTULO PRELIMINAR']['text']
-        articles = extract_articles_from_text(text, article_pattern)
+        articles = extract(text)
         structure['TÍTULO PRELIMINAR']['articles'] = articles
         article_count += len(articles)
     
@@ -178,22 +187,26 @@ def extract_articles(structure: dict) -> dict:
         if section_name.startswith('LIBRO'):
             for titulo_name, titulo_data in section_data.items():
                 # Ищем статьи в тексте TÍTULO
-                articles = extract_articles_from_text(titulo_data['text'], article_pattern)
+                articles = extract(titulo_data['text'])
                 titulo_data['articles'] = articles
                 article_count += len(articles)
                 
                 # Ищем статьи в каждом CAPÍTULO
                 for capitulo_name, capitulo_data in titulo_data['capitulos'].items():
-                    articles = extract_articles_from_text(capitulo_data['text'], article_pattern)
+                    articles = extract(capitulo_data['text'])
                     capitulo_data['articles'] = articles
                     article_count += len(articles)
     
     print(f"Всего найдено статей: {article_count}")
     return structure
 
-def extract_articles_from_text(text: str, pattern: str) -> dict:
+# Прежний паттерн статей: отрицательная опережающая проверка на каждом символе тела.
+# Оставлен для сравнения с split_articles (python benchmark.py articles)
+ARTICLE_PATTERN = rf'Artículo\s+({ARTICLE_NUMBER})[^\n]*\n((?:(?!Artículo\s+\d+)[^\n]|\n)*)'
+
+def extract_articles_from_text(text: str, pattern: str = ARTICLE_PATTERN) -> dict:
     """
-    Извлекает статьи из текста
+    Извлекает статьи из текста регулярным выражением
     
     Args:
         text (str): текст для поиска статей
@@ -263,37 +276,91 @@ def create_flat_structure(structure: dict) -> list:
     print(f"\nСоздан плоский список из {len(flat_list)} статей")
     return flat_list
 
+def article_digests(flat_list: list) -> list:
+    """
+    Отпечатки плоского списка статей для проверки регрессии
+    
+    Args:
+        flat_list (list): список статей (create_flat_structure)
+    
+    Returns:
+        list: строки [libro, titulo, capitulo, номер статьи, хэш текста] в том же порядке
+    """
+    return [
+        [article["libro"], article["titulo"], article["capitulo"], article["article_number"],
+         hashlib.sha256(article["text"].encode("utf-8")).hexdigest()[:16]]
+        for article in flat_list
+    ]
+
 def save_to_json(data: dict, output_file: str):
     """Сохраняет данные в JSON файл"""
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
     print(f"Данные сохранены в {output_file}")
 
-def main():
-    print("Запуск обработки текста...")
-    
-    # Шаг 1: Находим основные секции
-    sections = find_main_sections(cleaned_text_file)
-    
-    # Шаг 2: Извлекаем текст каждой секции
-    sections_text = extract_sections_text(cleaned_text_file, sections)
+def main(pdf_path: Optional[str] = None, workers: int = 1, page_cache_dir: Optional[str] = None,
+         json_view: bool = False):
+    """
+    Запускает разбор структуры.
     
-    # Шаг 3: Находим подразделы
-    structure = find_subsections(sections_text)
+    Args:
+        pdf_path (Optional[str]): PDF, текст которого извлекается и очищается потоком
+            без промежуточных extracted_text.txt и cleaned_text.txt; если не задан,
+            читается cleaned_text.txt
+        workers (int): число процессов для извлечения страниц PDF
+        page_cache_dir (Optional[str]): каталог кэша страниц PDF (None - без кэша)
+        json_view (bool): дополнительно сохранить прежние представления:
+            structured_document.json с текстами всех уровней и
+            articles_for_embeddings.json со статьями из título и capítulo
+    """
+    print("Запуск обработки текста...")
     
-    # Шаг 4: Извлекаем статьи
-    structure = extract_articles(structure)
+    if pdf_path:
+        from clean_text import clean_pdf_lines
+        from page_cache import PageTextCache
+        cache = PageTextCache(page_cache_dir) if page_cache_dir else None
+        text = "\n".join(clean_pdf_lines(pdf_path, workers, cache))
+        if cache is not None:
+            cache.save()
+            print(cache.stats())
+    else:
+        with open(cleaned_text_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+    
+    # Шаги 1-4: секции, подразделы и статьи за один проход по тексту
+    parser = StructureParser(text)
+    print("\nНайдены следующие секции:")
+    for section in parser.main_sections():
+        print(f"- {section}")
+    document = parser.build_document()
+    print(f"Найдено заголовков статей: {len(parser.articles)}")
     
-    # Сохраняем полную структуру
-    save_to_json(structure, 'structured_document.json')
+    # Сохраняем документ на смещениях: текст один раз и массивы узлов
+    document.save(spans_document_file)
+    print(f"Документ сохранен в {spans_document_file} ({len(document)} узлов)")
     
-    # Шаг 5: Создаем плоский список для эмбеддингов
-    flat_list = create_flat_structure(structure)
+    # Шаг 5: Каноническая таблица статей - по одной строке на статью
+    table = ArticleTable.from_document(document)
+    table.save(ARTICLE_TABLE_FILE)
+    print(f"\nТаблица статей: {len(table)} статей сохранено в {ARTICLE_TABLE_FILE}")
     
-    # Сохраняем плоский список
-    save_to_json(flat_list, 'articles_for_embeddings.json')
+    # Прежние представления с повторами статей - только по запросу
+    if json_view:
+        save_to_json(document.to_structure(), 'structured_document.json')
+        save_to_json(document.flat_articles(), 'articles_for_embeddings.json')
     
     print("\nОбработка завершена!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Разбор структуры Уголовного кодекса")
+    parser.add_argument("--pdf", help="Разбирать текст прямо из PDF, без промежуточных текстовых файлов")
+    parser.add_argument("--workers", type=int, default=1, help="Число процессов для извлечения страниц")
+    parser.add_argument("--page-cache", default="output/page_cache",
+                        help="Каталог кэша страниц для --pdf (пустая строка - без кэша)")
+    parser.add_argument("--json-view", action="store_true",
+                        help="Сохранить также structured_document.json и articles_for_embeddings.json")
+    args = parser.parse_args()
+    main(pdf_path=args.pdf, workers=args.workers, page_cache_dir=args.page_cache or None,
+         json_view=args.json_view)
\ No newline at end of file
@@ -5,35 +5,70 @@
 разбивает их на чанки оптимального размера для создания эмбеддингов.
 """
 
+import hashlib
 import json
 import re
-from typing import List, Dict
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Any, Iterable, List, Dict, Optional, Tuple, Union
+from article_index import ArticleIndex, article_index_path
 
-def split_text_into_chunks(text: str, chunk_size: int = 2000) -> List[str]:
+def chunk_id(chunk: Dict) -> int:
     """
-    Разбивает текст на чанки оптимального размера.
+    Стабильный идентификатор чанка для ID-индекса FAISS.
+    
+    Вычисляется из положения чанка в структуре кодекса (libro, titulo, capitulo,
+    первая статья чанка, chunk_index), поэтому не зависит от позиции чанка в
+    общем списке и сохраняется между пересборками.
+    
+    Args:
+        chunk (Dict): Чанк с метаданными
+        
+    Returns:
+        int: Неотрицательное 63-битное целое (в FAISS -1 означает "нет результата")
+    """
+    if "chunk_id" in chunk:
+        return chunk["chunk_id"]
+    
+    article = chunk["article_numbers"][0] if chunk.get("article_numbers") else ""
+    key = "|".join([chunk["libro"], chunk["titulo"], chunk["capitulo"], str(article), str(chunk["chunk_index"])])
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+ARTICLE_BOUNDARY_PATTERN = re.compile(r"Art[íi]culo \d+\.")
+
+def split_text_into_chunk_spans(text: str, chunk_size: int = 2000) -> List[Tuple[int, int]]:
+    """
+    Разбивает текст на чанки оптимального размера и возвращает их границы.
     
     Args:
         text (str): Исходный текст для разбиения
         chunk_size (int): Максимальный размер чанка в символах
         
     Returns:
-        List[str]: Список чанков
+        List[Tuple[int, int]]: Границы чанков (начало, конец) в тексте
     """
-    chunks = []
+    spans = []
     
     # Пробуем разбить текст по статьям или параграфам
-    pattern = r"Art[íi]culo \d+\."
-    matches = list(re.finditer(pattern, text))
+    matches = list(ARTICLE_BOUNDARY_PATTERN.finditer(text))
     
     if not matches:
         # Если не нашли совпадений с шаблоном, используем базовое разбиение
-        start = 0
-        while start < len(text):
-            end = min(start + chunk_size, len(text))
+        fragments = [(0, len(text))]
+    else:
+        # Если нашли статьи, разбиваем по ним
+        starts = [match.start() for match in matches]
+        fragments = list(zip(starts, starts[1:] + [len(text)]))
+    
+    for fragment_start, fragment_end in fragments:
+        # Если фрагмент слишком большой, разбиваем его дополнительно
+        start = fragment_start
+        while start < fragment_end:
+            end = min(start + chunk_size, fragment_end)
             
             # Если не достигли конца, то ищем последний перенос строки или точку
-            if end < len(text):
+            if end < fragment_end:
                 # Сначала ищем последний перенос строки в пределах chunk_size
                 last_break = text.rfind('\n', start, end)
                 if last_break > start + chunk_size // 2:
@@ -44,84 +79,253 @@ def split_text_into_chunks(text: str, chunk_size: int = 2000) -> List[str]:
                     if last_period > start + chunk_size // 2:
                         end = last_period + 1
             
-            chunks.append(text[start:end])
+            spans.append((start, end))
             start = end
+    
+    return spans
+
+def split_text_into_chunks(text: str, chunk_size: int = 2000) -> List[str]:
+    """
+    Разбивает текст на чанки оптимального размера.
+    
+    Args:
+        text (str): Исходный текст для разбиения
+        chunk_size (int): Максимальный размер чанка в символах
+        
+    Returns:
+        List[str]: Список чанков
+    """
+    return [text[start:end] for start, end in split_text_into_chunk_spans(text, chunk_size)]
+
+def load_token_budget(model_name: str) -> Tuple[Any, int]:
+    """
+    Загружает быстрый токенизатор модели эмбеддингов и вычисляет бюджет токенов на чанк.
+    
+    Args:
+        model_name (str): Название модели SentenceTransformers
+        
+    Returns:
+        Tuple[Any, int]: Токенизатор и максимальное число токенов текста в чанке
+        (max_seq_length модели без служебных токенов [CLS]/[SEP])
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    model = SentenceTransformer(model_name)
+    tokenizer = model.tokenizer
+    special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+    return tokenizer, model.max_seq_length - special_tokens
+
+def tokenize_with_offsets(texts: List[str], tokenizer) -> List[List[int]]:
+    """
+    Токенизирует тексты одним батчем и возвращает позиции начала каждого токена.
+    
+    Args:
+        texts (List[str]): Тексты для токенизации
+        tokenizer: Быстрый токенизатор HuggingFace (с поддержкой offsets)
+        
+    Returns:
+        List[List[int]]: Для каждого текста - список символьных позиций начала токенов
+    """
+    encoded = tokenizer(
+        texts,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return [[start for start, end in offsets] for offsets in encoded["offset_mapping"]]
+
+def _best_break(text: str, start: int, limit: int) -> int:
+    """
+    Выбирает место разреза в text[start:limit]: после последнего переноса строки
+    или точки во второй половине окна, иначе ровно по limit.
+    """
+    middle = start + (limit - start) // 2
+    last_break = text.rfind('\n', start, limit)
+    if last_break > middle:
+        return last_break + 1
+    last_period = text.rfind('.', start, limit)
+    if last_period > middle:
+        return last_period + 1
+    return limit
+
+def split_text_into_token_chunk_spans(text: str, token_starts: List[int], max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Разбивает текст на чанки, каждый из которых помещается в max_tokens токенов модели,
+    и возвращает их границы.
+    
+    Сохраняет те же предпочтения границ, что и split_text_into_chunks: сначала по
+    заголовкам статей, затем по переносам строк и точкам.
+    
+    Args:
+        text (str): Исходный текст для разбиения
+        token_starts (List[int]): Позиции начала токенов (см. tokenize_with_offsets)
+        max_tokens (int): Максимальное число токенов в чанке
+        
+    Returns:
+        List[Tuple[int, int]]: Границы чанков (начало, конец) в тексте
+    """
+    spans = []
+    
+    # Границы фрагментов: заголовки статей, если они есть, иначе весь текст
+    boundaries = [m.start() for m in ARTICLE_BOUNDARY_PATTERN.finditer(text)]
+    if boundaries and not text[:boundaries[0]].strip():
+        boundaries[0] = 0
     else:
-        # Если нашли статьи, разбиваем по ним
-        for i in range(len(matches)):
-            start_idx = matches[i].start()
-            
-            # Определяем конец текущего фрагмента
-            if i < len(matches) - 1:
-                end_idx = matches[i+1].start()
+        boundaries.insert(0, 0)
+    boundaries.append(len(text))
+    
+    for fragment_start, fragment_end in zip(boundaries, boundaries[1:]):
+        start = fragment_start
+        while start < fragment_end:
+            # Первый токен, который уже не помещается в бюджет текущего чанка
+            first_token = bisect_left(token_starts, start)
+            overflow_token = first_token + max_tokens
+            if overflow_token >= len(token_starts) or token_starts[overflow_token] >= fragment_end:
+                end = fragment_end
             else:
-                end_idx = len(text)
+                end = max(_best_break(text, start, token_starts[overflow_token]), start + 1)
             
-            # Если фрагмент слишком большой, разбиваем его дополнительно
-            fragment = text[start_idx:end_idx]
-            if len(fragment) > chunk_size:
-                start = 0
-                while start < len(fragment):
-                    end = min(start + chunk_size, len(fragment))
-                    # Ищем последний перенос строки или точку
-                    if end < len(fragment):
-                        last_break = fragment.rfind('\n', start, end)
-                        if last_break > start + chunk_size // 2:
-                            end = last_break + 1
-                        else:
-                            last_period = fragment.rfind('.', start, end)
-                            if last_period > start + chunk_size // 2:
-                                end = last_period + 1
-                    chunks.append(fragment[start:end])
-                    start = end
-            else:
-                chunks.append(fragment)
+            spans.append((start, end))
+            start = end
     
+    return spans
+
+def split_text_into_token_chunks(text: str, token_starts: List[int], max_tokens: int) -> List[str]:
+    """
+    Разбивает текст на чанки, каждый из которых помещается в max_tokens токенов модели.
+    
+    Args:
+        text (str): Исходный текст для разбиения
+        token_starts (List[int]): Позиции начала токенов (см. tokenize_with_offsets)
+        max_tokens (int): Максимальное число токенов в чанке
+        
+    Returns:
+        List[str]: Список чанков
+    """
+    return [text[start:end] for start, end in split_text_into_token_chunk_spans(text, token_starts, max_tokens)]
+
+def article_offsets(articles: List[str], separator: str = "\n\n") -> Tuple[List[int], List[int]]:
+    """
+    Границы статей группы в ее полном тексте (separator.join(articles)).
+    
+    Args:
+        articles (List[str]): Тексты статей группы по порядку
+        separator (str): Разделитель статей в полном тексте
+        
+    Returns:
+        Tuple[List[int], List[int]]: Начала и концы текстов статей
+    """
+    starts, ends = [], []
+    position = 0
+    for article_text in articles:
+        starts.append(position)
+        position += len(article_text)
+        ends.append(position)
+        position += len(separator)
+    return starts, ends
+
+def articles_in_span(starts: List[int], ends: List[int], start: int, end: int) -> range:
+    """
+    Статьи, текст которых пересекается с диапазоном чанка [start, end).
+    
+    Args:
+        starts (List[int]): Начала статей (см. article_offsets)
+        ends (List[int]): Концы статей
+        start (int): Начало чанка
+        end (int): Конец чанка
+        
+    Returns:
+        range: Номера статей в группе; если чанк попал только на разделитель -
+        статья перед ним
+    """
+    first = max(bisect_right(starts, start) - 1, 0)
+    last = max(bisect_left(starts, end) - 1, first)
+    # Чанк начинается в разделителе после статьи first - она в него не входит
+    if first < last and ends[first] <= start:
+        first += 1
+    return range(first, last + 1)
+
+def token_coverage(texts: List[str], tokenizer, max_tokens: int) -> float:
+    """
+    Доля токенов текста, которая попадает в эмбеддинг (не обрезается моделью).
+    
+    Args:
+        texts (List[str]): Тексты чанков
+        tokenizer: Быстрый токенизатор модели
+        max_tokens (int): Максимальное число токенов текста, которое видит модель
+        
+    Returns:
+        float: Покрытие от 0 до 1
+    """
+    lengths = [len(starts) for starts in tokenize_with_offsets(texts, tokenizer)]
+    total = sum(lengths)
+    if not total:
+        return 1.0
+    return sum(min(length, max_tokens) for length in lengths) / total
+
+# Сколько групп токенизируется одним батчем при потоковой обработке
+TOKENIZE_BATCH_GROUPS = 32
+
+def _group_chunks(group_data: Dict, spans: List[Tuple[int, int]]) -> List[Dict]:
+    """Чанки одной группы статей по границам spans в ее full_text."""
+    full_text = group_data["full_text"]
+    # Статьи чанка определяются по пересечению его границ с границами статей в full_text
+    starts, ends = article_offsets(group_data["articles"])
+    numbers = group_data["article_numbers"]
+    
+    chunks = []
+    for i, (start, end) in enumerate(spans):
+        chunk = {
+            "libro": group_data["libro"],
+            "titulo": group_data["titulo"],
+            "capitulo": group_data["capitulo"],
+            "article_numbers": [numbers[article] for article in articles_in_span(starts, ends, start, end)],
+            "chunk_index": i,
+            "text": full_text[start:end]
+        }
+        chunk["chunk_id"] = chunk_id(chunk)
+        chunks.append(chunk)
     return chunks
 
-def create_final_chunks(grouped_articles: Dict) -> List[Dict]:
+def create_final_chunks(
+    grouped_articles: Union[Dict, Iterable[Dict]],
+    tokenizer=None,
+    max_tokens: Optional[int] = None
+) -> List[Dict]:
     """
     Создает финальные чанки для эмбеддингов на основе сгруппированных статей.
     
+    Группы читаются по одной, поэтому их можно передавать потоком прямо из
+    group.iter_article_groups, не собирая словарь всех групп.
+    
     Args:
-        grouped_articles (Dict): Сгруппированные статьи
+        grouped_articles (Union[Dict, Iterable[Dict]]): Словарь групп
+            (group_articles_by_capitulo) или поток групп (iter_article_groups)
+        tokenizer: Быстрый токенизатор модели эмбеддингов; если передан вместе с
+            max_tokens, размер чанков измеряется в токенах, а не в символах
+        max_tokens (Optional[int]): Максимальное число токенов в чанке
         
     Returns:
         List[Dict]: Список чанков с метаданными
     """
+    groups = iter(grouped_articles.values() if isinstance(grouped_articles, dict) else grouped_articles)
     final_chunks = []
     
-    # Проходим по каждой группе статей
-    for group_key, group_data in grouped_articles.items():
-        # Получаем текст всей группы
-        full_text = group_data["full_text"]
-        
-        # Разбиваем текст на чанки с учетом структуры текста
-        text_chunks = split_text_into_chunks(full_text)
-        
-        # Определяем, какие статьи входят в каждый чанк
-        article_pattern = r'Art[íi]culo (\d+)'
-        
-        # Создаем словарь с метаданными для каждого чанка
-        for i, chunk_text in enumerate(text_chunks):
-            # Находим все номера статей в текущем чанке
-            article_numbers_in_chunk = re.findall(article_pattern, chunk_text)
-            
-            # Если статьи в чанке не найдены, используем общие статьи группы
-            if not article_numbers_in_chunk:
-                article_numbers_in_chunk = group_data["article_numbers"]
-            
-            chunk = {
-                "libro": group_data["libro"],
-                "titulo": group_data["titulo"],
-                "capitulo": group_data["capitulo"],
-                "article_numbers": article_numbers_in_chunk,
-                "chunk_index": i,
-                "text": chunk_text
-            }
-            
-            final_chunks.append(chunk)
-            
+    if tokenizer is None or max_tokens is None:
+        for group_data in groups:
+            final_chunks.extend(_group_chunks(group_data, split_text_into_chunk_spans(group_data["full_text"])))
+        return final_chunks
+    
+    # Группы токенизируются батчами быстрого токенизатора, по TOKENIZE_BATCH_GROUPS за раз
+    while True:
+        batch = list(islice(groups, TOKENIZE_BATCH_GROUPS))
+        if not batch:
+            break
+        batch_token_starts = tokenize_with_offsets([group_data["full_text"] for group_data in batch], tokenizer)
+        for group_data, token_starts in zip(batch, batch_token_starts):
+            spans = split_text_into_token_chunk_spans(group_data["full_text"], token_starts, max_tokens)
+            final_chunks.extend(_group_chunks(group_data, spans))
     return final_chunks
 
 if __name__ == "__main__":
@@ -144,5 +348,8 @@ if __name__ == "__main__":
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(final_chunks, f, indent=2, ensure_ascii=False)
     
+    # Индекс "номер статьи -> чанки" сохраняем рядом с чанками
+    ArticleIndex.from_chunks(final_chunks).save(article_index_path(output_path))
+    
     print("Разбиение на чанки завершено успешно!")
     print(f"Средний размер чанка: {sum(len(chunk['text']) for chunk in final_chunks) / len(final_chunks):.2f} символов")
\ No newline at end of file
@@ -1,30 +1,220 @@
 import re
+from typing import Iterable, Iterator, List, Optional
+
+PAGE_MARKER = re.compile(r'=== Страница \d+ ===')
+
+def iter_page_lines(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Превращает поток текстов страниц в поток строк документа без маркеров страниц.
+
+    Результат совпадает со строками файла extracted_text.txt после удаления
+    маркеров (=== Страница X ===): перед каждой страницей и после нее идет по
+    переводу строки.
+
+    Args:
+        pages (Iterable[str]): Тексты страниц по порядку
+
+    Yields:
+        str: Строки документа (без символа перевода строки)
+    """
+    yield ""
+    first = True
+    for page_text in pages:
+        if not first:
+            yield ""
+        first = False
+        yield from page_text.split("\n")
+    yield ""
+
+def iter_file_lines(input_file: str) -> Iterator[str]:
+    """
+    Читает файл формата extracted_text.txt построчно, пропуская маркеры страниц.
+
+    Args:
+        input_file (str): Путь к файлу с извлеченным текстом
+
+    Yields:
+        str: Строки документа (без символа перевода строки)
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        previous_was_marker = False
+        ends_with_newline = False
+        for line_number, raw_line in enumerate(f):
+            ends_with_newline = raw_line.endswith("\n")
+            line = raw_line[:-1] if ends_with_newline else raw_line
+            # Маркер удаляется вместе с одним из окружающих переводов строки,
+            # поэтому два маркера подряд (как и в исходном re.sub) не удаляются
+            if (PAGE_MARKER.fullmatch(line) and line_number > 0 and ends_with_newline
+                    and not previous_was_marker):
+                previous_was_marker = True
+                continue
+            previous_was_marker = False
+            yield line
+        if ends_with_newline:
+            yield ""
+
+def drop_page_numbers(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Удаляет строки из одних цифр (номера страниц), за которыми идет строка,
+    начинающаяся с буквы или цифры.
+
+    Эквивалент re.sub(r'\\n\\d+\\n(?=\\w)', '\\n', ...) по всему документу: после
+    удаления номера следующая строка не может быть удалена, так как перевод
+    строки перед ней уже поглощен совпадением.
+
+    Args:
+        lines (Iterable[str]): Строки документа
+
+    Yields:
+        str: Строки без номеров страниц
+    """
+    previous_removed = False
+    pending: Optional[str] = None
+    has_previous = False
+    for line in lines:
+        if pending is not None:
+            starts_with_word = bool(line) and (line[0].isalnum() or line[0] == "_")
+            if has_previous and not previous_removed and pending.isdecimal() and starts_with_word:
+                previous_removed = True
+            else:
+                previous_removed = False
+                yield pending
+            has_previous = True
+        pending = line
+    if pending is not None:
+        yield pending
+
+def collapse_blank_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Схлопывает каждую серию пустых (или из одних пробелов) строк в одну пустую строку.
+
+    Эквивалент re.sub(r'\\n\\s*\\n', '\\n\\n', ...) по всему документу.
+
+    Args:
+        lines (Iterable[str]): Строки документа
+
+    Yields:
+        str: Строки с одиночными пустыми строками
+    """
+    in_blank_run = False
+    for line in lines:
+        if line.strip():
+            if in_blank_run:
+                yield ""
+                in_blank_run = False
+            yield line
+        else:
+            in_blank_run = True
+    if in_blank_run:
+        yield ""
+
+def strip_document(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Эквивалент str.strip() для документа, заданного потоком строк.
+
+    Args:
+        lines (Iterable[str]): Строки документа
+
+    Yields:
+        str: Строки без начальных и конечных пробельных символов документа
+    """
+    started = False
+    held_blank: List[str] = []
+    previous: Optional[str] = None
+    for line in lines:
+        if not started:
+            if not line.strip():
+                continue
+            started = True
+            line = line.lstrip()
+        if not line.strip():
+            # Пустые строки выдаются, только если после них есть текст
+            held_blank.append(line)
+            continue
+        if previous is not None:
+            yield previous
+        yield from held_blank
+        held_blank = []
+        previous = line
+    if previous is not None:
+        yield previous.rstrip()
+
+def iter_clean_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Потоковая очистка строк документа: номера страниц, пустые строки, края документа.
+
+    Args:
+        lines (Iterable[str]): Строки документа без маркеров страниц
+        (см. iter_page_lines и iter_file_lines)
+
+    Yields:
+        str: Очищенные строки (память не зависит от размера документа)
+    """
+    return strip_document(collapse_blank_lines(drop_page_numbers(lines)))
+
+def clean_pdf_lines(pdf_path: str, workers: int = 1, cache=None) -> Iterator[str]:
+    """
+    Извлекает и очищает текст PDF потоком строк без промежуточных файлов.
+
+    Args:
+        pdf_path (str): Путь к PDF
+        workers (int): Число процессов для извлечения страниц
+        cache (Optional[PageTextCache]): Кэш извлеченных страниц (page_cache.py)
+
+    Yields:
+        str: Очищенные строки документа
+    """
+    from pdf_extractor import iter_page_texts
+
+    return iter_clean_lines(iter_page_lines(iter_page_texts(pdf_path, workers, cache=cache)))
+
+def write_lines(lines: Iterable[str], output_file: str) -> None:
+    """
+    Записывает строки в файл через перевод строки (без завершающего перевода строки).
+
+    Args:
+        lines (Iterable[str]): Строки
+        output_file (str): Путь к выходному файлу
+    """
+    with open(output_file, 'w', encoding='utf-8') as f:
+        first = True
+        for line in lines:
+            if not first:
+                f.write("\n")
+            f.write(line)
+            first = False
 
 def clean_text_file(input_file, output_file):
     """
     Очищает текстовый файл от маркеров страниц и номеров страниц.
-    
+
+    Файл обрабатывается построчно, без чтения целиком в память.
+
     Args:
         input_file (str): Путь к входному файлу
         output_file (str): Путь к выходному файлу
     """
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Удаляем маркеры страниц (=== Страница X ===)
-    content = re.sub(r'\n=== Страница \d+ ===\n', '\n', content)
-    
-    # Удаляем одиночные номера страниц
-    content = re.sub(r'\n\d+\n(?=\w)', '\n', content)
-    
-    # Убираем множественные пустые строки
-    content = re.sub(r'\n\s*\n', '\n\n', content)
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(content.strip())
+    write_lines(iter_clean_lines(iter_file_lines(input_file)), output_file)
 
 if __name__ == "__main__":
-    input_file = "extracted_text.txt"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Очистка извлеченного текста")
+    parser.add_argument("--pdf", help="Извлекать и очищать текст сразу из PDF, без extracted_text.txt")
+    parser.add_argument("--workers", type=int, default=1, help="Число процессов для извлечения страниц")
+    parser.add_argument("--page-cache", default="output/page_cache",
+                        help="Каталог кэша страниц для --pdf (пустая строка - без кэша)")
+    args = parser.parse_args()
+
     output_file = "cleaned_text.txt"
-    clean_text_file(input_file, output_file)
-    print(f"Текст очищен и сохранен в {output_file}") 
\ No newline at end of file
+    if args.pdf:
+        from page_cache import PageTextCache
+
+        cache = PageTextCache(args.page_cache) if args.page_cache else None
+        write_lines(clean_pdf_lines(args.pdf, args.workers, cache), output_file)
+        if cache is not None:
+            cache.save()
+            print(cache.stats())
+    else:
+        clean_text_file("extracted_text.txt", output_file)
+    print(f"Текст очищен и сохранен в {output_file}")
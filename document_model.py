@@ -0,0 +1,245 @@
+"""
+Компактная модель разобранного документа на смещениях
+
+Весь текст кодекса хранится один раз, а каждый узел структуры (секция,
+título, capítulo, статья) - это запись (вид, название, начало, конец, родитель)
+в параллельных массивах. Тексты узлов не копируются: это срезы общего текста,
+которые строятся только по запросу. Прежние JSON форматы
+(structured_document.json, articles_for_embeddings.json) получаются из модели
+как представления.
+
+Смещения заканчиваются на таблице статей: ArticleTable.from_document
+вырезает из буфера текст каждой статьи один раз, а группировка (group.py) и
+чанки работают уже со строками - им нужен сам текст, а таблица читается и из
+JSON, где смещений нет.
+"""
+
+import json
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SECTION = 0
+TITULO = 1
+CAPITULO = 2
+ARTICLE = 3
+
+NO_PARENT = -1
+
+# Название секции без título/capítulo в плоском списке статей
+PRELIMINAR_SECTION = 'TÍTULO PRELIMINAR'
+
+
+class SpanDocument:
+    """
+    Текст документа и узлы структуры в виде массивов смещений.
+
+    Узлы добавляются в порядке обхода в глубину: родитель всегда раньше детей.
+    Для статьи диапазон [start, end) - тело статьи без крайних пробельных символов,
+    для остальных узлов - текст от заголовка до начала следующего узла того же уровня.
+    """
+
+    __slots__ = ("text", "kinds", "labels", "starts", "ends", "parents", "_children")
+
+    def __init__(self, text: str):
+        """
+        Args:
+            text (str): Очищенный текст документа
+        """
+        self.text = text
+        self.kinds = array("b")
+        self.labels: List[str] = []
+        self.starts = array("q")
+        self.ends = array("q")
+        self.parents = array("q")
+        self._children: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def add(self, kind: int, label: str, start: int, end: int, parent: int = NO_PARENT) -> int:
+        """
+        Добавляет узел.
+
+        Args:
+            kind (int): SECTION, TITULO, CAPITULO или ARTICLE
+            label (str): Название узла ("LIBRO I", "TÍTULO II") или номер статьи
+            start (int): Начало диапазона в тексте
+            end (int): Конец диапазона в тексте
+            parent (int): Номер родительского узла (NO_PARENT для секций)
+
+        Returns:
+            int: Номер нового узла
+        """
+        node = len(self.kinds)
+        self.kinds.append(kind)
+        self.labels.append(label)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.parents.append(parent)
+        self._children.setdefault(parent, []).append(node)
+        return node
+
+    def add_article(self, label: str, body_start: int, body_end: int, parent: int) -> int:
+        """
+        Добавляет статью, сужая диапазон тела до текста без крайних пробельных символов.
+
+        Args:
+            label (str): Номер статьи
+            body_start (int): Начало тела
+            body_end (int): Конец тела
+            parent (int): Номер узла, в котором найдена статья
+
+        Returns:
+            int: Номер нового узла
+        """
+        # Границы сдвигаются по тексту, без копирования тела (как str.strip)
+        text = self.text
+        while body_start < body_end and text[body_start].isspace():
+            body_start += 1
+        while body_end > body_start and text[body_end - 1].isspace():
+            body_end -= 1
+        return self.add(ARTICLE, label, body_start, body_end, parent)
+
+    def span_text(self, node: int) -> str:
+        """Текст узла (срез общего текста)."""
+        return self.text[self.starts[node]:self.ends[node]]
+
+    def children(self, node: int = NO_PARENT, kind: Optional[int] = None) -> List[int]:
+        """
+        Дети узла по порядку (NO_PARENT - секции верхнего уровня).
+
+        Args:
+            node (int): Номер узла
+            kind (Optional[int]): Оставить только детей этого вида
+
+        Returns:
+            List[int]: Номера узлов
+        """
+        nodes = self._children.get(node, [])
+        if kind is None:
+            return list(nodes)
+        return [child for child in nodes if self.kinds[child] == kind]
+
+    def path(self, node: int) -> Tuple[str, str, str]:
+        """
+        Структурный путь узла (libro, titulo, capitulo), как в плоском списке статей.
+
+        Args:
+            node (int): Номер узла
+
+        Returns:
+            Tuple[str, str, str]: Названия секции, título и capítulo ("" если уровня нет)
+        """
+        names = {SECTION: "", TITULO: "", CAPITULO: ""}
+        parent = self.parents[node] if self.kinds[node] == ARTICLE else node
+        while parent != NO_PARENT:
+            names[self.kinds[parent]] = self.labels[parent]
+            parent = self.parents[parent]
+        return names[SECTION], names[TITULO], names[CAPITULO]
+
+    def _articles_view(self, node: int, texts: Dict[Tuple[int, int], str]) -> Dict[str, str]:
+        view = {}
+        for article in self.children(node, ARTICLE):
+            # Статья есть и у título, и у capítulo с тем же диапазоном: срез делается один раз
+            span = (self.starts[article], self.ends[article])
+            text = texts.get(span)
+            if text is None:
+                text = texts[span] = self.text[span[0]:span[1]]
+            view[self.labels[article]] = text
+        return view
+
+    def to_structure(self) -> dict:
+        """
+        Представление в формате structured_document.json.
+
+        Returns:
+            dict: Иерархическая структура с текстами всех уровней
+        """
+        structure = {}
+        texts: Dict[Tuple[int, int], str] = {}
+        for section in self.children():
+            name = self.labels[section]
+            if name == PRELIMINAR_SECTION:
+                structure[name] = {"text": self.span_text(section), "articles": self._articles_view(section, texts)}
+                continue
+            structure[name] = {}
+            for titulo in self.children(section, TITULO):
+                structure[name][self.labels[titulo]] = {
+                    "text": self.span_text(titulo),
+                    "capitulos": {
+                        self.labels[capitulo]: {
+                            "text": self.span_text(capitulo),
+                            "articles": self._articles_view(capitulo, texts),
+                        }
+                        for capitulo in self.children(titulo, CAPITULO)
+                    },
+                    "articles": self._articles_view(titulo, texts),
+                }
+        return structure
+
+    def iter_article_nodes(self) -> Iterator[int]:
+        """
+        Узлы статей в порядке плоского списка: статьи секции, статьи título,
+        затем статьи каждого capítulo.
+        """
+        for section in self.children():
+            yield from self.children(section, ARTICLE)
+            for titulo in self.children(section, TITULO):
+                yield from self.children(titulo, ARTICLE)
+                for capitulo in self.children(titulo, CAPITULO):
+                    yield from self.children(capitulo, ARTICLE)
+
+    def flat_articles(self) -> List[dict]:
+        """
+        Представление в формате articles_for_embeddings.json.
+
+        Returns:
+            List[dict]: Статьи с метаданными libro/titulo/capitulo
+        """
+        flat_list = []
+        for article in self.iter_article_nodes():
+            libro, titulo, capitulo = self.path(article)
+            flat_list.append({
+                "libro": libro,
+                "titulo": titulo,
+                "capitulo": capitulo,
+                "article_number": self.labels[article],
+                "text": self.span_text(article),
+            })
+        return flat_list
+
+    def save(self, path: str) -> None:
+        """
+        Сохраняет текст и массивы узлов в JSON (текст записывается один раз).
+
+        Args:
+            path (str): Путь к файлу
+        """
+        data = {
+            "text": self.text,
+            "kinds": self.kinds.tolist(),
+            "labels": self.labels,
+            "starts": self.starts.tolist(),
+            "ends": self.ends.tolist(),
+            "parents": self.parents.tolist(),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "SpanDocument":
+        """
+        Загружает документ, сохраненный методом save.
+
+        Args:
+            path (str): Путь к файлу
+
+        Returns:
+            SpanDocument: Документ
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        document = cls(data["text"])
+        for node in zip(data["kinds"], data["labels"], data["starts"], data["ends"], data["parents"]):
+            document.add(*node)
+        return document
@@ -0,0 +1,279 @@
+"""
+Контентно-адресуемый кэш эмбеддингов на диске
+
+Ключ записи - хэш от названия модели и нормализованного текста чанка, поэтому
+после правки нескольких статей или изменения разбиения на чанки заново
+кодируются только действительно новые тексты. Векторы хранятся в
+memory-mapped файле float32, рядом лежит JSON таблица ключей.
+
+Кэш переживает падение процесса в любой момент: строки, на которые ссылается
+сохраненная таблица ключей, не перезаписываются до записи новой таблицы
+(новые векторы пишутся в свободные строки, строки вытесненных записей
+освобождаются только после save), а сжатие пишет векторы в новый файл, на
+который таблица ключей переключается атомарной заменой.
+
+Размер файла векторов при заданном max_entries: после save в нем ровно
+max_entries строк (или меньше, пока кэш не заполнен); между сохранениями он
+может вырасти еще на число записей, добавленных с прошлого save, потому что
+строки вытесненных записей до save заняты.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.json"
+# Файлы векторов после сжатия: vectors.<поколение>.f32
+VECTORS_FILE_PATTERN = "vectors.{}.f32"
+
+
+def normalize_text(text: str) -> str:
+    """
+    Нормализует текст для ключа кэша: NFC и схлопывание пробельных символов.
+
+    Args:
+        text (str): Исходный текст чанка
+
+    Returns:
+        str: Нормализованный текст
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов с ограничением по числу записей (вытеснение LRU).
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: Optional[int] = None):
+        """
+        Открывает (или создает) кэш в указанном каталоге.
+
+        Args:
+            cache_dir (str): Каталог кэша
+            model_name (str): Название модели, входит в ключ каждой записи
+            max_entries (Optional[int]): Максимальное число записей (None - без ограничения)
+        """
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.vectors_path = os.path.join(cache_dir, VECTORS_FILE)
+        self.keys_path = os.path.join(cache_dir, KEYS_FILE)
+
+        self.dim: Optional[int] = None
+        self.rows: Dict[str, int] = {}       # ключ -> строка в файле векторов
+        self.last_used: Dict[str, int] = {}  # ключ -> "время" последнего обращения
+        self.free_rows: List[int] = []
+        # Строки вытесненных записей: сохраненная таблица ключей еще ссылается на
+        # них, поэтому они становятся свободными только после save
+        self.released_rows: List[int] = []
+        self.capacity = 0
+        self.clock = 0
+        self.generation = 0
+        self.vectors: Optional[np.memmap] = None
+
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.dim = table["dim"]
+            self.rows = table["rows"]
+            self.last_used = table["last_used"]
+            self.free_rows = table["free_rows"]
+            self.capacity = table["capacity"]
+            self.clock = table["clock"]
+            self.generation = table.get("generation", 0)
+            self.vectors_path = os.path.join(cache_dir, table.get("vectors_file", VECTORS_FILE))
+            if self.capacity:
+                self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                         shape=(self.capacity, self.dim))
+        self._remove_stale_files()
+
+    def key(self, text: str) -> str:
+        """
+        Ключ записи: sha256 от названия модели и нормализованного текста.
+
+        Args:
+            text (str): Текст чанка
+
+        Returns:
+            str: Шестнадцатеричный хэш
+        """
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """
+        Ищет векторы для списка ключей.
+
+        Args:
+            keys (List[str]): Ключи записей
+
+        Returns:
+            Tuple[Dict[int, np.ndarray], List[int]]: Найденные векторы по позиции
+            в keys и позиции ключей, которых нет в кэше
+        """
+        found: Dict[int, np.ndarray] = {}
+        missing: List[int] = []
+        self.clock += 1
+        for position, key in enumerate(keys):
+            row = self.rows.get(key)
+            if row is None:
+                missing.append(position)
+            else:
+                found[position] = np.array(self.vectors[row])
+                self.last_used[key] = self.clock
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """
+        Добавляет векторы в кэш, при необходимости вытесняя давно не использованные записи.
+
+        Args:
+            keys (List[str]): Ключи записей
+            vectors (np.ndarray): Векторы формы (len(keys), dim)
+        """
+        if not keys:
+            return
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Размерность векторов {vectors.shape[1]} не совпадает с кэшем ({self.dim})")
+
+        entries = {}
+        for key, vector in zip(keys, vectors):
+            entries[key] = vector
+        if self.max_entries is not None and len(entries) > self.max_entries:
+            # Батч больше всего кэша: сохраняем только часть, остальное не поместится
+            entries = dict(list(entries.items())[:self.max_entries])
+
+        new_count = sum(1 for key in entries if key not in self.rows)
+        if self.max_entries is not None:
+            self._evict(len(self.rows) + new_count - self.max_entries, keep=entries)
+        self._ensure_capacity(len(self.rows) + new_count)
+
+        self.clock += 1
+        for key, vector in entries.items():
+            # Ключ - хэш текста и модели, поэтому вектор уже сохраненной записи
+            # тот же; ее строку не перезаписываем
+            if key not in self.rows:
+                row = self.free_rows.pop()
+                self.vectors[row] = vector
+                self.rows[key] = row
+            self.last_used[key] = self.clock
+
+    def _evict(self, count: int, keep: Dict[str, np.ndarray]) -> None:
+        """Удаляет count давно не использованных записей, не трогая ключи из keep."""
+        if count <= 0:
+            return
+        candidates = [key for key in sorted(self.last_used, key=self.last_used.get) if key not in keep]
+        for key in candidates[:count]:
+            self.released_rows.append(self.rows.pop(key))
+            del self.last_used[key]
+            self.evicted += 1
+
+    def _ensure_capacity(self, size: int) -> None:
+        """Увеличивает файл векторов так, чтобы в нем было size - len(rows) свободных строк."""
+        missing = size - len(self.rows) - len(self.free_rows)
+        if missing <= 0:
+            return
+        growth = max(missing, self.capacity, 256)
+        if self.max_entries:
+            # Сверх лимита файл растет только на строки, ждущие сохранения таблицы ключей
+            growth = max(missing, min(growth, self.max_entries - self.capacity))
+        new_capacity = self.capacity + growth
+
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(new_capacity, self.dim))
+
+        # Новые строки кладем в конец списка свободных так, чтобы заполнялись по порядку
+        self.free_rows = list(range(new_capacity - 1, self.capacity - 1, -1)) + self.free_rows
+        self.capacity = new_capacity
+
+    def _compact(self) -> None:
+        """
+        Переписывает векторы в новый файл ровно под max_entries записей, если
+        прежний вырос сверх лимита. Прежний файл не меняется: на него ссылается
+        сохраненная таблица ключей, пока save не запишет новую.
+        """
+        if self.vectors is None or not self.max_entries or self.capacity <= self.max_entries:
+            return
+        keys = list(self.rows)
+        self.generation += 1
+        vectors_path = os.path.join(self.cache_dir, VECTORS_FILE_PATTERN.format(self.generation))
+        with open(vectors_path, "wb") as f:
+            f.truncate(self.max_entries * self.dim * 4)
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(self.max_entries, self.dim))
+        if keys:
+            vectors[:len(keys)] = self.vectors[[self.rows[key] for key in keys]]
+        del self.vectors
+
+        self.vectors = vectors
+        self.vectors_path = vectors_path
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.free_rows = list(range(self.max_entries - 1, len(keys) - 1, -1))
+        self.released_rows = []
+        self.capacity = self.max_entries
+
+    def _remove_stale_files(self) -> None:
+        """Удаляет файлы векторов, на которые не ссылается таблица ключей (остатки сжатия)."""
+        for path in glob.glob(os.path.join(self.cache_dir, "vectors*.f32")):
+            if os.path.abspath(path) != os.path.abspath(self.vectors_path):
+                os.remove(path)
+
+    def save(self) -> None:
+        """
+        Сбрасывает векторы на диск и атомарно записывает таблицу ключей; только
+        после этого строки вытесненных записей можно занимать новыми векторами.
+        """
+        # Ограничение размера применяется и к кэшу, созданному с большим лимитом
+        if self.max_entries is not None:
+            self._evict(len(self.rows) - self.max_entries, keep={})
+            self._compact()
+        if self.vectors is not None:
+            self.vectors.flush()
+        table = {
+            "model_name": self.model_name,
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "clock": self.clock,
+            "generation": self.generation,
+            "vectors_file": os.path.basename(self.vectors_path),
+            "rows": self.rows,
+            "last_used": self.last_used,
+            "free_rows": self.free_rows + self.released_rows,
+        }
+        tmp_path = self.keys_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(table, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.keys_path)
+
+        self.free_rows.extend(self.released_rows)
+        self.released_rows = []
+        self._remove_stale_files()
+
+    def stats(self) -> str:
+        """Строка со статистикой обращений для вывода в консоль."""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        return (f"Кэш эмбеддингов: попаданий {self.hits}, промахов {self.misses} "
+                f"({hit_rate:.1f}% попаданий), вытеснено {self.evicted}, записей {len(self.rows)}")
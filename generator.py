@@ -7,59 +7,333 @@
 
 import os
 import json
+import multiprocessing
 import numpy as np
 import faiss
 from tqdm import tqdm
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from sentence_transformers import SentenceTransformer
+from embedding_cache import EmbeddingCache
+from chunking import chunk_id
+
+# Оценка памяти одного процесса-кодировщика с копией модели MiniLM-L12 (МБ)
+WORKER_MEMORY_MB = 1024
+
+# Модель внутри процесса пула (у каждого процесса своя копия)
+_worker_model = None
+
+def _encode_texts(
+    model: SentenceTransformer,
+    texts: List[str],
+    batch_size: int,
+    show_progress: bool
+) -> np.ndarray:
+    """
+    Кодирует тексты моделью фиксированными батчами в порядке следования.
+    
+    Args:
+        model (SentenceTransformer): Загруженная модель
+        texts (List[str]): Тексты для кодирования
+        batch_size (int): Размер батча
+        show_progress (bool): Показывать прогресс-бар
+        
+    Returns:
+        np.ndarray: Массив эмбеддингов
+    """
+    if show_progress:
+        embeddings = []
+        for i in tqdm(range(0, len(texts), batch_size), desc="Создание эмбеддингов"):
+            batch_texts = texts[i:i + batch_size]
+            batch_embeddings = model.encode(batch_texts, convert_to_numpy=True, show_progress_bar=False)
+            embeddings.append(batch_embeddings)
+        return np.vstack(embeddings)
+    return model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+
+def _token_lengths(model: SentenceTransformer, texts: List[str]) -> List[int]:
+    """
+    Считает длины текстов в токенах модели (с учетом обрезки до max_seq_length).
+    
+    Args:
+        model (SentenceTransformer): Загруженная модель
+        texts (List[str]): Тексты
+        
+    Returns:
+        List[int]: Длина каждого текста в токенах
+    """
+    encoded = model.tokenizer(
+        texts,
+        truncation=True,
+        max_length=model.max_seq_length,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def _encode_texts_bucketed(
+    model: SentenceTransformer,
+    texts: List[str],
+    token_budget: int,
+    show_progress: bool
+) -> np.ndarray:
+    """
+    Кодирует тексты батчами из текстов близкой длины.
+    
+    Тексты сортируются по длине в токенах, и батч набирается до тех пор, пока
+    (число текстов) x (длина самого длинного) не превысит token_budget. Так
+    короткие статьи не дополняются паддингом до длины длинных, а размер батча
+    подстраивается под длину. Результат возвращается в исходном порядке текстов.
+    
+    Args:
+        model (SentenceTransformer): Загруженная модель
+        texts (List[str]): Тексты для кодирования
+        token_budget (int): Максимум токенов (с паддингом) в одном батче
+        show_progress (bool): Показывать прогресс-бар
+        
+    Returns:
+        np.ndarray: Массив эмбеддингов в порядке texts
+    """
+    lengths = _token_lengths(model, texts)
+    order = sorted(range(len(texts)), key=lambda i: lengths[i])
+    
+    # Порядок возрастания длины: последний текст батча - самый длинный
+    batches = []
+    current = []
+    for i in order:
+        if current and (len(current) + 1) * lengths[i] > token_budget:
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    
+    embeddings = None
+    for batch in tqdm(batches, desc="Создание эмбеддингов", disable=not show_progress):
+        batch_embeddings = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype)
+        embeddings[batch] = batch_embeddings
+    return embeddings
+
+def _init_encode_worker(model_name: str, torch_threads: int) -> None:
+    """
+    Инициализирует процесс пула: ограничивает потоки torch и загружает модель.
+    """
+    import torch
+    
+    global _worker_model
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _encode_shard(args: Tuple[List[str], int, Optional[int]]) -> np.ndarray:
+    """
+    Кодирует один шард текстов моделью текущего процесса пула.
+    """
+    texts, batch_size, token_budget = args
+    if token_budget:
+        return _encode_texts_bucketed(_worker_model, texts, token_budget, show_progress=False)
+    return _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+def resolve_worker_count(num_workers: int, max_memory_mb: Optional[int] = None) -> int:
+    """
+    Определяет число процессов-кодировщиков с учетом ядер и ограничения памяти.
+    
+    Args:
+        num_workers (int): Желаемое число процессов (0 - по числу ядер)
+        max_memory_mb (Optional[int]): Ограничение суммарной памяти процессов в МБ
+        
+    Returns:
+        int: Число процессов (не меньше 1)
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = min(num_workers or cpu_count, cpu_count)
+    if max_memory_mb:
+        workers = min(workers, max_memory_mb // WORKER_MEMORY_MB)
+    return max(1, workers)
+
+def _encode_texts_parallel(
+    model_name: str,
+    texts: List[str],
+    num_workers: int,
+    torch_threads: int,
+    batch_size: int,
+    token_budget: Optional[int],
+    show_progress: bool,
+    shard_size: int = 64
+) -> np.ndarray:
+    """
+    Кодирует тексты пулом процессов, у каждого из которых своя копия модели.
+    
+    Тексты режутся на шарды по shard_size; при token_budget они предварительно
+    сортируются по длине, чтобы батчи внутри шардов были однородными. Результаты
+    шардов приходят по порядку (imap) и сразу записываются в итоговую матрицу.
+    
+    Args:
+        model_name (str): Название модели
+        texts (List[str]): Тексты для кодирования
+        num_workers (int): Число процессов
+        torch_threads (int): Число потоков torch в каждом процессе
+        batch_size (int): Размер батча (если token_budget не задан)
+        token_budget (Optional[int]): Бюджет токенов на батч (см. _encode_texts_bucketed)
+        show_progress (bool): Показывать прогресс-бар
+        shard_size (int): Число текстов в одном задании для процесса
+        
+    Returns:
+        np.ndarray: Массив эмбеддингов в порядке texts
+    """
+    order = list(range(len(texts)))
+    if token_budget:
+        order.sort(key=lambda i: len(texts[i]))
+    shards = [order[i:i + shard_size] for i in range(0, len(order), shard_size)]
+    tasks = [([texts[i] for i in shard], batch_size, token_budget) for shard in shards]
+    
+    # spawn: процессы не наследуют состояние torch родителя
+    context = multiprocessing.get_context("spawn")
+    embeddings = None
+    with context.Pool(num_workers, initializer=_init_encode_worker, initargs=(model_name, torch_threads)) as pool:
+        results = pool.imap(_encode_shard, tasks)
+        for shard, shard_embeddings in tqdm(
+            zip(shards, results), total=len(shards), desc="Создание эмбеддингов", disable=not show_progress
+        ):
+            if embeddings is None:
+                embeddings = np.empty((len(texts), shard_embeddings.shape[1]), dtype=shard_embeddings.dtype)
+            embeddings[shard] = shard_embeddings
+        pool.close()
+        pool.join()
+    return embeddings
 
 def create_embeddings(
     chunks: List[Dict],
     model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
     batch_size: int = 16,
-    show_progress: bool = True
+    show_progress: bool = True,
+    cache_dir: Optional[str] = None,
+    cache_max_entries: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    num_workers: int = 1,
+    torch_threads: int = 1,
+    max_memory_mb: Optional[int] = None
 ) -> np.ndarray:
     """
     Создает эмбеддинги для чанков текста с использованием модели SentenceTransformers.
     
+    Если указан cache_dir, векторы берутся из контентно-адресуемого кэша
+    (embedding_cache.py), а модель кодирует только отсутствующие в нем тексты.
+    
     Args:
         chunks (List[Dict]): Список чанков текста
         model_name (str): Название модели для создания эмбеддингов
         batch_size (int): Размер батча для создания эмбеддингов
         show_progress (bool): Показывать прогресс-бар
+        cache_dir (Optional[str]): Каталог кэша эмбеддингов (None - без кэша)
+        cache_max_entries (Optional[int]): Ограничение размера кэша в записях
+        token_budget (Optional[int]): Если задан, тексты группируются в батчи по длине
+            в токенах, а batch_size игнорируется (см. _encode_texts_bucketed)
+        num_workers (int): Число процессов-кодировщиков (1 - в текущем процессе,
+            0 - по числу ядер)
+        torch_threads (int): Число потоков torch в каждом процессе-кодировщике
+        max_memory_mb (Optional[int]): Ограничение памяти всех процессов-кодировщиков
+            (по WORKER_MEMORY_MB на процесс)
         
     Returns:
         np.ndarray: Массив эмбеддингов
     """
-    # Загружаем модель для создания эмбеддингов
-    print(f"Загрузка модели эмбеддингов: {model_name}")
-    model = SentenceTransformer(model_name)
-    
     # Извлекаем тексты из чанков
     texts = [chunk["text"] for chunk in chunks]
+    if not texts:
+        # Кодировать нечего, но размерность пустой матрицы нужна индексу
+        dimension = SentenceTransformer(model_name).get_sentence_embedding_dimension()
+        return np.empty((0, dimension), dtype=np.float32)
     
-    # Создаем эмбеддинги
-    print("Создание эмбеддингов...")
-    if show_progress:
-        embeddings = []
-        for i in tqdm(range(0, len(texts), batch_size), desc="Создание эмбеддингов"):
-            batch_texts = texts[i:i + batch_size]
-            batch_embeddings = model.encode(batch_texts, convert_to_numpy=True, show_progress_bar=False)
-            embeddings.append(batch_embeddings)
-        embeddings = np.vstack(embeddings)
+    cache = None
+    cached = {}
+    missing = list(range(len(texts)))
+    if cache_dir:
+        cache = EmbeddingCache(cache_dir, model_name, max_entries=cache_max_entries)
+        keys = [cache.key(text) for text in texts]
+        cached, missing = cache.get_many(keys)
+    
+    new_embeddings = None
+    workers = resolve_worker_count(num_workers, max_memory_mb) if num_workers != 1 else 1
+    if missing and workers > 1:
+        print(f"Создание эмбеддингов для {len(missing)} чанков в {workers} процессах...")
+        new_embeddings = _encode_texts_parallel(
+            model_name, [texts[i] for i in missing], workers, torch_threads,
+            batch_size, token_budget, show_progress
+        )
+    elif missing:
+        # Загружаем модель только если есть что кодировать
+        print(f"Загрузка модели эмбеддингов: {model_name}")
+        model = SentenceTransformer(model_name)
+        
+        print(f"Создание эмбеддингов для {len(missing)} чанков...")
+        missing_texts = [texts[i] for i in missing]
+        if token_budget:
+            new_embeddings = _encode_texts_bucketed(model, missing_texts, token_budget, show_progress)
+        else:
+            new_embeddings = _encode_texts(model, missing_texts, batch_size, show_progress)
+    
+    if cache is None:
+        embeddings = new_embeddings
     else:
-        embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+        if new_embeddings is not None:
+            cache.put_many([keys[i] for i in missing], new_embeddings)
+        cache.save()
+        print(cache.stats())
+        
+        # Собираем итоговую матрицу в исходном порядке чанков
+        dim = new_embeddings.shape[1] if new_embeddings is not None else cache.dim
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        for position, vector in cached.items():
+            embeddings[position] = vector
+        if new_embeddings is not None:
+            embeddings[missing] = new_embeddings
     
     print(f"Создано {len(embeddings)} эмбеддингов размерности {embeddings.shape[1]}")
     return embeddings
 
-def create_faiss_index(embeddings: np.ndarray, output_path: str = "output/penal_code.index") -> None:
+def _new_base_index(dimension: int, n_vectors: int):
+    """
+    Создает пустой FAISS индекс, подходящий для указанного числа векторов.
+    
+    Args:
+        dimension (int): Размерность эмбеддингов
+        n_vectors (int): Ожидаемое количество векторов
+        
+    Returns:
+        faiss.Index: Пустой индекс со скалярным произведением в качестве метрики
+    """
+    if n_vectors < 1000:
+        # Для маленьких наборов данных используем простой индекс
+        return faiss.IndexFlatIP(dimension)
+    
+    # Для больших наборов данных используем более сложный индекс HNSW
+    # HNSW обеспечивает быстрый поиск с небольшой потерей качества
+    index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)  # 32 - количество соседей
+    index.hnsw.efConstruction = 100  # Качество построения (выше = лучше, но медленнее)
+    index.hnsw.efSearch = 128  # Качество поиска
+    return index
+
+def create_faiss_index(
+    embeddings: np.ndarray,
+    output_path: str = "output/penal_code.index",
+    ids: Optional[np.ndarray] = None
+) -> None:
     """
     Создает FAISS индекс для быстрого поиска по векторным представлениям.
     
+    Если переданы ids (см. chunking.chunk_id), индекс оборачивается в IndexIDMap2:
+    результаты поиска возвращают идентификаторы чанков, а не их позиции в списке,
+    и отдельные чанки можно обновлять через update_faiss_index.
+    
     Args:
         embeddings (np.ndarray): Массив эмбеддингов
         output_path (str): Путь для сохранения индекса
+        ids (Optional[np.ndarray]): Стабильные идентификаторы чанков (int64)
     """
     # Определяем размерность эмбеддингов
     dimension = embeddings.shape[1]
@@ -71,19 +345,18 @@ def create_faiss_index(embeddings: np.ndarray, output_path: str = "output/penal_
     faiss.normalize_L2(embeddings)
     
     # Выбираем лучший тип индекса в зависимости от размера данных
-    if n_vectors < 1000:
-        # Для маленьких наборов данных используем простой индекс
-        index = faiss.IndexFlatIP(dimension)
-    else:
-        # Для больших наборов данных используем более сложный индекс HNSW
-        # HNSW обеспечивает быстрый поиск с небольшой потерей качества
-        index = faiss.IndexHNSWFlat(dimension, 32)  # 32 - количество соседей
-        index.hnsw.efConstruction = 100  # Качество построения (выше = лучше, но медленнее)
-        index.hnsw.efSearch = 128  # Качество поиска
+    index = _new_base_index(dimension, n_vectors)
     
     # Добавляем векторы в индекс
     print(f"Добавление {n_vectors} векторов в индекс...")
-    index.add(embeddings)
+    if ids is None:
+        index.add(embeddings)
+    else:
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("Идентификаторы чанков не уникальны")
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, ids)
     
     # Сохраняем индекс
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -92,7 +365,68 @@ def create_faiss_index(embeddings: np.ndarray, output_path: str = "output/penal_
     
     print("Индекс FAISS успешно создан и сохранен.")
 
+def update_faiss_index(
+    index_path: str,
+    remove_ids: List[int],
+    embeddings: Optional[np.ndarray] = None,
+    ids: Optional[List[int]] = None
+) -> None:
+    """
+    Обновляет ID-индекс без полной пересборки: удаляет чанки и добавляет новые версии.
+    
+    Чанки из ids, уже присутствующие в индексе, заменяются. Плоский индекс
+    обновляется на месте; HNSW удаление не поддерживает, поэтому для него граф
+    перестраивается из уже сохраненных в индексе векторов (без перекодирования
+    текстов моделью).
+    
+    Args:
+        index_path (str): Путь к индексу, созданному create_faiss_index с ids
+        remove_ids (List[int]): Идентификаторы удаляемых чанков
+        embeddings (Optional[np.ndarray]): Эмбеддинги добавляемых или измененных чанков
+        ids (Optional[List[int]]): Идентификаторы для embeddings
+    """
+    index = faiss.read_index(index_path)
+    if not isinstance(index, faiss.IndexIDMap2):
+        raise ValueError(f"Индекс {index_path} создан без идентификаторов чанков, нужна полная пересборка")
+    
+    add_ids = np.asarray(ids if ids is not None else [], dtype=np.int64)
+    drop = set(int(i) for i in remove_ids) | set(int(i) for i in add_ids)
+    if embeddings is not None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(embeddings)
+    
+    base = faiss.downcast_index(index.index)
+    if isinstance(base, faiss.IndexHNSW):
+        existing_ids = faiss.vector_to_array(index.id_map)
+        kept_ids = np.array([i for i in existing_ids if int(i) not in drop], dtype=np.int64)
+        kept_vectors = np.vstack([index.reconstruct(int(i)) for i in kept_ids]) if len(kept_ids) else None
+        
+        all_ids = np.concatenate([kept_ids, add_ids])
+        parts = [v for v in (kept_vectors, embeddings) if v is not None and len(v)]
+        all_vectors = np.vstack(parts) if parts else np.empty((0, index.d), dtype=np.float32)
+        
+        index = faiss.IndexIDMap2(_new_base_index(index.d, len(all_ids)))
+        index.add_with_ids(all_vectors, all_ids)
+    else:
+        index.remove_ids(np.array(sorted(drop), dtype=np.int64))
+        if embeddings is not None and len(add_ids):
+            index.add_with_ids(embeddings, add_ids)
+    
+    print(f"Индекс обновлен: удалено {len(remove_ids)}, добавлено {len(add_ids)}, всего {index.ntotal} векторов")
+    faiss.write_index(index, index_path)
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Создание эмбеддингов и FAISS индекса")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Число процессов-кодировщиков (0 - по числу ядер)")
+    parser.add_argument("--torch-threads", type=int, default=1,
+                        help="Потоков torch в каждом процессе-кодировщике")
+    parser.add_argument("--max-memory-mb", type=int, default=None,
+                        help="Ограничение памяти всех процессов-кодировщиков")
+    args = parser.parse_args()
+    
     # Загружаем чанки
     chunks_file = "output/penal_code_chunks.json"
     if not os.path.exists(chunks_file):
@@ -114,11 +448,17 @@ if __name__ == "__main__":
         chunks,
         model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
         batch_size=16,
-        show_progress=True
+        show_progress=True,
+        cache_dir="output/embedding_cache",
+        token_budget=16 * 128,  # столько же токенов, сколько батч из 16 текстов максимальной длины
+        num_workers=args.workers,
+        torch_threads=args.torch_threads,
+        max_memory_mb=args.max_memory_mb
     )
     
-    # Создаем FAISS индекс
-    create_faiss_index(embeddings, output_path="output/penal_code.index")
+    # Создаем FAISS индекс со стабильными идентификаторами чанков
+    ids = np.array([chunk_id(chunk) for chunk in chunks], dtype=np.int64)
+    create_faiss_index(embeddings, output_path="output/penal_code.index", ids=ids)
     
     print("Готово! Теперь вы можете использовать search.py для поиска по Уголовному кодексу.")
     print("Или legal_bot.py для использования юридического ассистента с контекстным поиском.")
\ No newline at end of file
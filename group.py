@@ -1,68 +1,127 @@
 """
 Группировка статей по иерархической структуре книги
 
-Этот скрипт загружает статьи из плоского списка articles_for_embeddings.json и группирует их 
+Этот скрипт загружает статьи из канонической таблицы articles_table.json и группирует их 
 по структуре "libro -> titulo -> capitulo" для дальнейшей обработки.
 """
 
-from collections import defaultdict
 import json
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO
 
-def group_articles_by_capitulo(articles: list) -> dict:
+from article_table import ArticleTable
+
+# Хук прогресса: вызывается после каждой готовой группы с числом обработанных статей
+ProgressHook = Callable[[int, Dict], None]
+
+def _new_group(item: Dict) -> Dict:
+    return {
+        "libro": item["libro"],
+        "titulo": item["titulo"],
+        "capitulo": item["capitulo"],
+        "articles": [],              # Список текстов статей
+        "article_numbers": [],       # Список номеров статей
+        "full_text": ""              # Полный текст всех статей в группе
+    }
+
+def iter_article_groups(articles: Iterable[Dict], progress: Optional[ProgressHook] = None) -> Iterator[Dict]:
+    """
+    Потоково группирует статьи, идущие в порядке документа.
+
+    Статьи одной группы (libro -> titulo -> capitulo) в таблице статей идут
+    подряд, поэтому группа выдается, как только начинается следующая; в памяти
+    одновременно находится только одна группа.
+
+    Args:
+        articles (Iterable[Dict]): Статьи в порядке документа (таблица статей или плоский список)
+        progress (Optional[ProgressHook]): Вызывается после каждой группы с числом
+            обработанных статей и самой группой (для прогресса и метрик)
+
+    Yields:
+        Dict: Группа с полями libro, titulo, capitulo, articles, article_numbers, full_text
+    """
+    group = None
+    key = None
+    processed = 0
+    for item in articles:
+        item_key = (item["libro"], item["titulo"], item["capitulo"])
+        if item_key != key:
+            if group is not None:
+                group["full_text"] = "\n\n".join(group["articles"])
+                if progress is not None:
+                    progress(processed, group)
+                yield group
+            group = _new_group(item)
+            key = item_key
+        group["articles"].append(item["text"])
+        group["article_numbers"].append(item["article_number"])
+        processed += 1
+
+    if group is not None:
+        group["full_text"] = "\n\n".join(group["articles"])
+        if progress is not None:
+            progress(processed, group)
+        yield group
+
+def group_key(group: Dict) -> str:
+    """Ключ группы в словаре группировки: "libro | titulo | capitulo"."""
+    return f"{group['libro']} | {group['titulo']} | {group['capitulo']}"
+
+def write_groups(groups: Iterable[Dict], f: TextIO) -> Iterator[Dict]:
+    """
+    Пропускает поток групп дальше, попутно записывая их в открытый файл.
+
+    Файл получается таким же, как json.dump словаря групп с indent=2, но
+    каждая группа пишется сразу, без сбора словаря.
+
+    Args:
+        groups (Iterable[Dict]): Поток групп (iter_article_groups)
+        f (TextIO): Файл, открытый на запись
+
+    Yields:
+        Dict: Те же группы
+    """
+    separator = "{\n"
+    for group in groups:
+        entry = json.dumps({group_key(group): group}, ensure_ascii=False, indent=2)
+        # Без внешних скобок словаря из одной записи остается строка '  "ключ": {...}'
+        f.write(separator + entry[2:-2])
+        separator = ",\n"
+        yield group
+    f.write("{}" if separator == "{\n" else "\n}")
+
+def group_articles_by_capitulo(articles: Iterable[Dict], progress: Optional[ProgressHook] = None) -> dict:
     """
     Группирует статьи по их структурному расположению в документе.
 
     Алгоритм:
-    1. Создает словарь с вложенной структурой libro -> titulo -> capitulo
-    2. Для каждой статьи определяет её место в структуре и добавляет в соответствующую группу
-    3. Формирует полный текст каждой группы, объединяя тексты всех её статей
+    1. Потоково собирает подряд идущие статьи одной группы (iter_article_groups)
+    2. Складывает группы в словарь по ключу "libro | titulo | capitulo"
+    3. Если группа встречается повторно (статьи не по порядку), объединяет их
 
     Args:
-        articles (list): Список статей из articles_for_embeddings.json
+        articles (Iterable[Dict]): Статьи из таблицы статей (article_table.py)
+        progress (Optional[ProgressHook]): Хук прогресса, см. iter_article_groups
 
     Returns:
         dict: Словарь группировок статей по структурным элементам
     """
-
-    # Создаем структуру для хранения сгруппированных статей
-    grouped = defaultdict(lambda: {
-        "libro": "",
-        "titulo": "",
-        "capitulo": "",
-        "articles": [],              # Список текстов статей
-        "article_numbers": [],        # Список номеров статей
-        "full_text": ""              # Полный текст всех статей в группе
-    })
-
-    # Обрабатываем каждую статью
-    for i, item in enumerate(articles):
-        print(f"Обработка статьи {i+1} из {len(articles)}")
-        
-        # Создаем уникальный ключ для группировки
-        key = f"{item['libro']} | {item['titulo']} | {item['capitulo']}"
-        
-        # Заполняем информацию о группе
-        grouped[key]["libro"] = item["libro"]
-        grouped[key]["titulo"] = item["titulo"]
-        grouped[key]["capitulo"] = item["capitulo"]
-        
-        # Добавляем текст и номер статьи
-        grouped[key]["articles"].append(item["text"])
-        grouped[key]["article_numbers"].append(item["article_number"])  # Обратите внимание на изменение ключа
-
-    # Собираем полный текст для каждой группы
-    for group in grouped.values():
-        group["full_text"] = "\n\n".join(group["articles"])
-
-    # Преобразуем defaultdict в обычный словарь для JSON сериализации
-    return dict(grouped)
+    grouped = {}
+    for group in iter_article_groups(articles, progress):
+        key = group_key(group)
+        if key in grouped:
+            existing = grouped[key]
+            existing["articles"].extend(group["articles"])
+            existing["article_numbers"].extend(group["article_numbers"])
+            existing["full_text"] = "\n\n".join(existing["articles"])
+        else:
+            grouped[key] = group
+    return grouped
 
 
 if __name__ == "__main__":
     # Загружаем статьи из файла
-    print("Загрузка статей из articles_for_embeddings.json...")
-    with open('articles_for_embeddings.json', 'r', encoding='utf-8') as f:
-        articles = json.load(f)
+    print("Загрузка статей из articles_table.json...")
+    articles = list(ArticleTable.load())
     
     # Группируем статьи
     print(f"Начинаю группировку {len(articles)} статей...")
@@ -5,20 +5,60 @@
 который отвечает на вопросы по Уголовному кодексу, используя индексы FAISS.
 """
 
-import json
-import os
 import re
-from typing import List, Dict, Any, Optional, Tuple
-from sentence_transformers import SentenceTransformer
-import faiss
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from query_cache import QueryCache
+from semantic_cache import SemanticAnswerCache
 from search import (
-    search_similar_chunks, 
-    search_by_article_number, 
-    expand_chunks_with_neighbors,
+    SearchEngine,
     extract_intent,
     calculate_relevance_score
 )
 
+# Основы названий составов преступлений -> состав; по ним семантический кэш не
+# отвечает на вопрос о краже ответом о грабеже, даже если эмбеддинги близки
+OFFENCE_STEMS = {
+    "homicid": "homicidio", "убийств": "homicidio",
+    "asesinat": "asesinato",
+    "robo": "robo", "грабеж": "robo", "разбо": "robo",
+    "hurto": "hurto", "краж": "hurto",
+    "estafa": "estafa", "мошенничеств": "estafa",
+    "lesion": "lesiones", "телесн": "lesiones",
+    "violaci": "violacion", "изнасилован": "violacion",
+    "secuestr": "secuestro", "похищени": "secuestro",
+    "amenaza": "amenazas", "угроз": "amenazas",
+}
+
+
+def extract_offences(question: str) -> FrozenSet[str]:
+    """
+    Находит составы преступлений, названные в вопросе (на испанском или русском).
+
+    Args:
+        question (str): Вопрос пользователя
+
+    Returns:
+        FrozenSet[str]: Названия составов, например {"homicidio"}
+    """
+    question_lower = question.lower()
+    return frozenset(offence for stem, offence in OFFENCE_STEMS.items() if stem in question_lower)
+
+
+class AnswerPlan(NamedTuple):
+    """Промежуточное состояние ответа между plan_answer и complete_answer."""
+    question: str
+    intent: str
+    param: Optional[str]
+    scope: str                      # область семантического кэша: намерение и параметр
+    offences: FrozenSet[str]        # составы преступлений из вопроса (см. extract_offences)
+    queries: List[str]              # запросы для кодирования и поиска по индексу
+    results: Optional[List[Dict]]   # чанки, найденные без векторного поиска (по номеру статьи)
+    answer: Optional[str]           # готовый ответ из кэша запросов
+    engine: Any = None              # снимок движка (SearchEngine.snapshot) на момент plan_answer
+
 class LegalAssistant:
     """
     Юридический ассистент для ответов на вопросы по Уголовному кодексу
@@ -28,7 +68,14 @@ class LegalAssistant:
         self, 
         chunks_file: str = "output/penal_code_chunks.json",
         index_path: str = "output/penal_code.index",
-        model_name: str = "all-MiniLM-L6-v2"
+        model_name: str = "all-MiniLM-L6-v2",
+        engine: Optional[SearchEngine] = None,
+        context_window: int = 1,
+        context_max_chars: Optional[int] = None,
+        cache_size: int = 1024,
+        cache_ttl: Optional[float] = 24 * 3600,
+        cache_path: Optional[str] = None,
+        semantic_threshold: Optional[float] = 0.92
     ):
         """
         Инициализирует юридического ассистента.
@@ -37,27 +84,36 @@ class LegalAssistant:
             chunks_file (str): Путь к файлу с чанками текста
             index_path (str): Путь к FAISS индексу
             model_name (str): Название модели для эмбеддингов
+            engine (Optional[SearchEngine]): Уже загруженный поисковый движок;
+                если не передан, создается новый по путям выше
+            context_window (int): Сколько соседних чанков capítulo добавлять с каждой стороны
+            context_max_chars (Optional[int]): Бюджет символов на найденные чанки с контекстом
+            cache_size (int): Максимальное число ответов в кэше запросов
+            cache_ttl (Optional[float]): Время жизни ответа в кэше в секундах (None - без ограничения)
+            cache_path (Optional[str]): Файл SQLite, в котором кэш запросов переживает перезапуск
+            semantic_threshold (Optional[float]): Косинусная близость, с которой вопрос считается
+                перефразировкой уже отвеченного (None - без семантического кэша)
         """
-        # Загрузка чанков
-        if not os.path.exists(chunks_file):
-            alternative_path = "penal_code_chunks.json"
-            if os.path.exists(alternative_path):
-                chunks_file = alternative_path
-            else:
-                raise FileNotFoundError(f"Файл с чанками не найден: {chunks_file}")
-        
-        with open(chunks_file, "r", encoding="utf-8") as f:
-            self.chunks = json.load(f)
-            
-        # Проверка индекса
-        if not os.path.exists(index_path):
-            raise FileNotFoundError(f"Индекс не найден: {index_path}")
-            
-        self.index_path = index_path
-        self.model_name = model_name
+        # Чанки, индекс и модель загружаются один раз и живут вместе с ассистентом
+        if engine is None:
+            engine = SearchEngine(chunks_file, index_path, model_name)
+        engine.warm_up()
+        
+        self.engine = engine
+        self.chunks = engine.chunks
+        self.index_path = engine.index_path
+        self.model_name = engine.model_name
+        # Сколько чанков брать из векторного поиска для ответа
+        self.top_k = 3
+        self.context_window = context_window
+        self.context_max_chars = context_max_chars
         
-        # Словарь для хранения кэша запросов
-        self.query_cache = {}
+        # Кэш ответов по нормализованному вопросу, привязанный к версии чанков и индекса
+        self.query_cache = QueryCache(cache_size, cache_ttl, version=engine.version, path=cache_path)
+        # Второй уровень: ответы на близкие по смыслу вопросы с тем же намерением
+        self.semantic_cache = None
+        if semantic_threshold is not None:
+            self.semantic_cache = SemanticAnswerCache(threshold=semantic_threshold, version=engine.version)
         
         # Словарь типичных юридических вопросов и их перефразировок для лучшего поиска
         self.legal_questions = {
@@ -80,6 +136,24 @@ class LegalAssistant:
         
         print(f"Юридический ассистент инициализирован. Загружено {len(self.chunks)} чанков текста.")
     
+    def reload(self) -> bool:
+        """
+        Перечитывает чанки и индексы движка с диска; если данные изменились,
+        ответы прежней версии удаляются из обоих кэшей.
+
+        Returns:
+            bool: True, если версия данных изменилась
+        """
+        changed = self.engine.reload()
+        engine = self.engine.snapshot()
+        self.chunks = engine.chunks
+        self.index_path = engine.index_path
+        # Ответы, которые строятся по прежнему снимку, после этого в кэши не попадут
+        self.query_cache.set_version(engine.version)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set_version(engine.version)
+        return changed
+    
     def answer_question(self, question: str) -> str:
         """
         Отвечает на юридический вопрос, используя данные Уголовного кодекса.
@@ -90,71 +164,107 @@ class LegalAssistant:
         Returns:
             str: Ответ на вопрос с цитатами из Уголовного кодекса
         """
+        plan = self.plan_answer(question)
+        if plan.answer is not None:
+            return plan.answer
+        
+        embeddings = plan.engine.encode(plan.queries) if plan.queries else None
+        return self.complete_answer(plan, embeddings)
+    
+    def plan_answer(self, question: str) -> AnswerPlan:
+        """
+        Первая часть ответа: кэш запросов, намерение и запросы для векторного поиска.
+        
+        Args:
+            question (str): Вопрос пользователя
+            
+        Returns:
+            AnswerPlan: План; если answer задан, ответ уже найден в кэше
+        """
         # Проверяем кэш запросов
-        if question in self.query_cache:
-            return self.query_cache[question]
+        cached_answer = self.query_cache.get(question)
+        if cached_answer is not None:
+            return AnswerPlan(question, "", None, "", frozenset(), [], None, cached_answer)
+        
+        # Все обращения к движку в этом запросе идут к одной версии данных
+        engine = self.engine.snapshot()
         
         # Определяем тип запроса
         intent, param = extract_intent(question)
+        scope = f"{intent}|{param or ''}"
+        offences = extract_offences(question)
         
         # Поиск по статье
         if intent == "article_search" and param:
-            results = search_by_article_number(param, self.chunks)
-            if not results:
-                # Если статья не найдена, пробуем семантический поиск
-                results = search_similar_chunks(
-                    f"Artículo {param}", 
-                    self.chunks, 
-                    self.index_path, 
-                    self.model_name,
-                    top_k=3
-                )
-        else:
+            results = engine.search_by_article(param)
+            # Если статья не найдена, пробуем семантический поиск
+            queries = [] if results else [f"Artículo {param}"]
+            return AnswerPlan(question, intent, param, scope, offences, queries, results, None, engine)
+        
+        if intent == "prescription_search":
             # Для запросов о сроках давности используем специальные перефразировки
-            if intent == "prescription_search":
-                expanded_queries = self._expand_legal_query(question, "срок давности")
-                # Объединяем результаты из всех запросов
-                all_results = []
-                for query in expanded_queries:
-                    query_results = search_similar_chunks(
-                        query, 
-                        self.chunks, 
-                        self.index_path,
-                        self.model_name,
-                        top_k=2
-                    )
-                    all_results.extend(query_results)
-                
-                # Удаляем дубликаты и сортируем по релевантности
-                seen_indices = set()
-                results = []
-                for res in sorted(all_results, key=lambda x: x.get("distance", float('inf'))):
-                    idx = (res["libro"], res["titulo"], res["capitulo"], res["chunk_index"])
-                    if idx not in seen_indices:
-                        seen_indices.add(idx)
-                        results.append(res)
-                
-                results = results[:3]  # Ограничиваем тремя самыми релевантными результатами
-            else:
-                # Обычный семантический поиск
-                results = search_similar_chunks(
-                    question, 
-                    self.chunks, 
-                    self.index_path,
-                    self.model_name,
-                    top_k=3
-                )
+            queries = self._expand_legal_query(question, "срок давности")
+        else:
+            queries = [question]
+        return AnswerPlan(question, intent, param, scope, offences, queries, None, None, engine)
+    
+    def complete_answer(self, plan: AnswerPlan, embeddings: Optional[np.ndarray] = None,
+                        hits: Optional[tuple] = None) -> str:
+        """
+        Вторая часть ответа: семантический кэш, поиск, контекст и форматирование.
+        
+        Эмбеддинги и результаты поиска по индексу можно посчитать заранее, в том
+        числе общим батчем для нескольких вопросов (см. server.py).
+        
+        Args:
+            plan (AnswerPlan): План из plan_answer
+            embeddings (Optional[np.ndarray]): Эмбеддинги plan.queries
+            hits (Optional[tuple]): Результаты index.search по embeddings (distances, indices)
+            
+        Returns:
+            str: Ответ на вопрос
+        """
+        if plan.answer is not None:
+            return plan.answer
+        # Поиск, соседи и кэши - по той же версии данных, что и plan_answer, даже
+        # если движок перезагружен между вызовами
+        engine = plan.engine
+        question, intent, param = plan.question, plan.intent, plan.param
+        article_lookup = intent == "article_search" and param
+        
+        # Эмбеддинг вопроса считается один раз: для семантического кэша и для поиска
+        if self.semantic_cache is not None and not article_lookup:
+            cached_answer = self.semantic_cache.get(embeddings[0], plan.scope, plan.offences)
+            if cached_answer is not None:
+                self.query_cache.put(question, cached_answer, version=engine.version)
+                return cached_answer
+        
+        if plan.results is not None and not plan.queries:
+            results = plan.results
+        elif intent == "prescription_search":
+            # Все варианты запроса ищутся одним батчем, результаты объединяются по RRF
+            results = engine.search_many(plan.queries, top_k=self.top_k, embeddings=embeddings, hits=hits)
+        else:
+            # Обычный семантический поиск
+            row_hits = (hits[0][0], hits[1][0]) if hits is not None else None
+            results = engine.search(plan.queries[0], top_k=self.top_k, embedding=embeddings[0], hits=row_hits)
         
         # Если нашли результаты, расширяем их контекстом
         if results:
-            expanded_results = expand_chunks_with_neighbors(results, self.chunks, window=1)
-            answer = self._format_answer(question, expanded_results)
+            expanded_results = engine.expand_with_neighbors(
+                results, window=self.context_window, max_chars=self.context_max_chars
+            )
+            # Статья не найдена по номеру, а найденное - результат семантического поиска
+            article_missing = bool(article_lookup and plan.queries)
+            answer = self._format_answer(question, expanded_results, article_missing)
         else:
             answer = "К сожалению, я не нашёл информации по вашему запросу в Уголовном кодексе. " + \
                      "Попробуйте сформулировать вопрос иначе или уточните, что именно вас интересует."
         
-        # Сохраняем в кэш
-        self.query_cache[question] = answer
+        # Сохраняем в кэш, если за время ответа кэши не переключены на новую версию
+        self.query_cache.put(question, answer, version=engine.version)
+        if self.semantic_cache is not None and not article_lookup:
+            self.semantic_cache.put(embeddings[0], plan.scope, answer, plan.offences, version=engine.version)
         
         return answer
     
@@ -177,13 +287,15 @@ class LegalAssistant:
         
         return expanded_queries
     
-    def _format_answer(self, question: str, results: List[Dict]) -> str:
+    def _format_answer(self, question: str, results: List[Dict], article_missing: bool = False) -> str:
         """
         Форматирует ответ на основе найденных фрагментов Уголовного кодекса.
         
         Args:
             question (str): Вопрос пользователя
             results (List[Dict]): Найденные фрагменты
+            article_missing (bool): Запрошенной статьи нет в индексе, results найдены
+                семантическим поиском
             
         Returns:
             str: Отформатированный ответ с цитатами
@@ -193,7 +305,10 @@ class LegalAssistant:
         # Определяем общий заголовок ответа в зависимости от типа вопроса
         intent, param = extract_intent(question)
         
-        if intent == "article_search":
+        if intent == "article_search" and article_missing:
+            answer_parts.append(f"📚 **Статья {param} в Уголовном кодексе не найдена. "
+                                f"Близкие по смыслу фрагменты:**\n")
+        elif intent == "article_search":
             answer_parts.append(f"📚 **По вашему запросу о статье {param} Уголовного кодекса:**\n")
         elif intent == "prescription_search":
             answer_parts.append("📚 **По вашему вопросу о сроках давности:**\n")
@@ -216,8 +331,8 @@ class LegalAssistant:
             if relevance == 0 and "distance" in chunk:
                 relevance = calculate_relevance_score(chunk["distance"])
                 
-            if relevance < relevance_threshold and i > 1:
-                continue  # Пропускаем нерелевантные результаты (кроме первого)
+            if relevance < relevance_threshold and i > 1 and not chunk.get("is_context"):
+                continue  # Пропускаем нерелевантные результаты (кроме первого и контекста)
                 
             seen_texts.add(text)
             
@@ -267,7 +382,11 @@ class LegalAssistant:
 
 if __name__ == "__main__":
     print("Инициализация юридического ассистента...")
-    assistant = LegalAssistant()
+    try:
+        assistant = LegalAssistant()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        exit(1)
     
     print("\n🤖 Юридический ассистент по Уголовному кодексу")
     print("Задайте вопрос о законе, статье или юридической ситуации.")
@@ -276,6 +395,9 @@ if __name__ == "__main__":
         question = input("\nВаш вопрос (или 'q' для выхода): ")
         
         if question.lower() in ['q', 'quit', 'exit']:
+            print(assistant.query_cache.stats())
+            if assistant.semantic_cache is not None:
+                print(assistant.semantic_cache.stats())
             break
             
         answer = assistant.answer_question(question)
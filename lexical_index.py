@@ -0,0 +1,200 @@
+"""
+Инвертированный индекс для лексического (текстового) поиска по чанкам
+
+Индекс строится один раз при загрузке чанков: для каждого токена хранится
+список постингов (номер чанка, частота токена в чанке). Запрос затрагивает
+только постинги своих терминов, а ранжирование выполняется по BM25.
+
+Постинги хранятся в плоских массивах numpy (формат CSR), поэтому индекс можно
+сохранить на диск и открывать через memory-mapping без повторного построения.
+"""
+
+import json
+import math
+import os
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Массивы индекса, которые сохраняются в отдельные .npy файлы
+_ARRAYS = ["term_offsets", "doc_ids", "term_freqs", "idf", "doc_norms"]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Разбивает текст на токены в нижнем регистре.
+
+    Args:
+        text (str): Исходный текст
+
+    Returns:
+        List[str]: Список токенов
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """
+    Инвертированный индекс с ранжированием BM25.
+
+    Буквенные термины запроса сопоставляются как префиксы токенов
+    ("pena" находит "pena", "penas", "penal"), что повторяет поведение прежнего
+    поиска подстрокой; числовые термины сопоставляются точно.
+
+    Постинги термина с номером t лежат в doc_ids/term_freqs в диапазоне
+    term_offsets[t]:term_offsets[t + 1].
+    """
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Строит индекс по текстам чанков.
+
+        Args:
+            texts (List[str]): Тексты чанков в порядке их номеров
+            k1 (float): Параметр насыщения частоты термина BM25
+            b (float): Параметр нормализации по длине документа BM25
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths: List[int] = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        n_docs = len(doc_lengths)
+        avg_doc_length = sum(doc_lengths) / n_docs if n_docs else 0.0
+
+        # Отсортированный словарь нужен для префиксного поиска через bisect
+        vocabulary = sorted(postings)
+        offsets = [0]
+        doc_ids: List[int] = []
+        term_freqs: List[int] = []
+        idf: List[float] = []
+        for token in vocabulary:
+            plist = postings[token]
+            doc_ids.extend(doc_id for doc_id, _ in plist)
+            term_freqs.extend(tf for _, tf in plist)
+            offsets.append(len(doc_ids))
+            idf.append(math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5)))
+
+        # Знаменатель BM25 зависит только от длины документа, считаем его заранее
+        doc_norms = [
+            k1 * (1 - b + b * length / avg_doc_length) if avg_doc_length else k1
+            for length in doc_lengths
+        ]
+
+        self._set_state(
+            k1, b, vocabulary,
+            term_offsets=np.array(offsets, dtype=np.int64),
+            doc_ids=np.array(doc_ids, dtype=np.int32),
+            term_freqs=np.array(term_freqs, dtype=np.float32),
+            idf=np.array(idf, dtype=np.float64),
+            doc_norms=np.array(doc_norms, dtype=np.float64),
+        )
+
+    def _set_state(self, k1: float, b: float, vocabulary: List[str], **arrays: np.ndarray) -> None:
+        """Заполняет поля индекса из словаря и массивов постингов."""
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = vocabulary
+        self.term_ids = {token: term_id for term_id, token in enumerate(vocabulary)}
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_docs = len(self.doc_norms)
+
+    def save(self, directory: str) -> None:
+        """
+        Сохраняет индекс в каталог: словарь в JSON и массивы постингов в .npy.
+
+        Args:
+            directory (str): Каталог для файлов индекса
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "vocabulary": self.vocabulary}, f, ensure_ascii=False)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "LexicalIndex":
+        """
+        Открывает индекс, сохраненный методом save.
+
+        Args:
+            directory (str): Каталог с файлами индекса
+            mmap (bool): Отображать массивы постингов в память вместо чтения
+
+        Returns:
+            LexicalIndex: Загруженный индекс
+        """
+        with open(os.path.join(directory, "vocabulary.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in _ARRAYS
+        }
+        index = cls.__new__(cls)
+        index._set_state(meta["k1"], meta["b"], meta["vocabulary"], **arrays)
+        return index
+
+    def expand_term(self, term: str) -> List[int]:
+        """
+        Находит термины словаря, соответствующие термину запроса.
+
+        Args:
+            term (str): Термин запроса (один токен)
+
+        Returns:
+            List[int]: Номера совпавших терминов словаря
+        """
+        if term.isdigit():
+            return [self.term_ids[term]] if term in self.term_ids else []
+
+        matched = []
+        pos = bisect_left(self.vocabulary, term)
+        while pos < len(self.vocabulary) and self.vocabulary[pos].startswith(term):
+            matched.append(pos)
+            pos += 1
+        return matched
+
+    def search(self, terms: List[str], top_k: int = 0) -> List[Tuple[int, float]]:
+        """
+        Ранжирует чанки по BM25 для набора терминов.
+
+        Args:
+            terms (List[str]): Термины запроса (фразы разбиваются на токены)
+            top_k (int): Сколько результатов вернуть (0 - все найденные)
+
+        Returns:
+            List[Tuple[int, float]]: Пары (номер чанка, оценка) по убыванию оценки
+        """
+        query_tokens = []
+        for term in terms:
+            query_tokens.extend(tokenize(term))
+
+        term_ids = []
+        for term in dict.fromkeys(query_tokens):
+            term_ids.extend(self.expand_term(term))
+        if not term_ids:
+            return []
+
+        scores = np.zeros(self.n_docs, dtype=np.float64)
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            # Внутри одного термина документы не повторяются, поэтому достаточно +=
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.doc_norms[docs])
+
+        matched = np.flatnonzero(scores)
+        # Сортировка по убыванию оценки, при равенстве - по номеру чанка
+        ranked = matched[np.lexsort((matched, -scores[matched]))]
+        if top_k:
+            ranked = ranked[:top_k]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
@@ -2,52 +2,72 @@
 Основной скрипт обработки данных для Уголовного кодекса (Código Penal)
 
 Этот скрипт объединяет все этапы обработки:
-1. Загрузка структурированных статей
-2. Группировка статей по разделам
-3. Разбиение на чанки для эмбеддингов
-4. Сохранение результатов
+1. Загрузка канонической таблицы статей (articles_table.json)
+2. Группировка статей по разделам и разбиение на чанки для эмбеддингов
+   (одним потоком, без словаря всех групп)
+3. Сохранение результатов
 """
 
+import argparse
 import json
 import os
-from group import group_articles_by_capitulo
-from chunking import create_final_chunks
+from typing import Optional
+from group import iter_article_groups, write_groups
+from chunking import create_final_chunks, load_token_budget, token_coverage
+from article_index import ArticleIndex, article_index_path
+from article_table import ARTICLE_TABLE_FILE, ArticleTable
 
-def main():
+def main(token_model: Optional[str] = None):
+    """
+    Запускает обработку.
+    
+    Args:
+        token_model (Optional[str]): Модель эмбеддингов, по токенизатору которой
+            измеряется размер чанков; если не задана, чанки режутся по 2000 символов
+    """
     # Создаем каталог для результатов, если он не существует
     os.makedirs('output', exist_ok=True)
     
     print("Запуск основной обработки документа...")
     
-    # 1. Загружаем статьи из файла
-    print("Загрузка структурированных статей...")
-    with open("articles_for_embeddings.json", "r", encoding="utf-8") as f:
-        articles = json.load(f)
+    # 1. Загружаем статьи из канонической таблицы (каждая статья ровно один раз)
+    print("Загрузка таблицы статей...")
+    articles = ArticleTable.load(ARTICLE_TABLE_FILE)
     print(f"Загружено {len(articles)} статей")
     
-    # 2. Группировка статей по разделам
-    print("Группировка статей по структуре libro -> titulo -> capitulo...")
-    grouped_articles = group_articles_by_capitulo(articles)
-    print(f"Создано {len(grouped_articles)} групп")
+    tokenizer, max_tokens = None, None
+    if token_model:
+        tokenizer, max_tokens = load_token_budget(token_model)
+        print(f"Размер чанков ограничен {max_tokens} токенами модели {token_model}")
+    
+    # 2. Группировка статей и разбиение на чанки одним потоком: группа
+    # записывается в промежуточный файл и режется на чанки, как только собрана
+    print("Группировка статей по структуре libro -> titulo -> capitulo и создание чанков...")
+    group_count = 0
+    
+    def count_group(processed: int, group: dict) -> None:
+        nonlocal group_count
+        group_count += 1
     
-    # Сохраняем промежуточный результат
     grouped_path = 'output/grouped_articles.json'
-    print(f"Сохранение групп в {grouped_path}...")
     with open(grouped_path, 'w', encoding='utf-8') as f:
-        json.dump(grouped_articles, f, ensure_ascii=False, indent=2)
-    
-    # 3. Разбиение на чанки для эмбеддингов
-    print("Создание чанков оптимального размера для эмбеддингов...")
-    final_chunks = create_final_chunks(grouped_articles)
+        groups = write_groups(iter_article_groups(articles, count_group), f)
+        final_chunks = create_final_chunks(groups, tokenizer, max_tokens)
+    print(f"Создано {group_count} групп (сохранены в {grouped_path})")
     print(f"Создано {len(final_chunks)} чанков")
     
-    # 4. Сохранение финальных чанков
+    # 3. Сохранение финальных чанков
     final_path = 'output/penal_code_chunks.json'
     print(f"Сохранение финальных чанков в {final_path}...")
     with open(final_path, 'w', encoding='utf-8') as f:
         json.dump(final_chunks, f, ensure_ascii=False, indent=2)
     
-    # 5. Анализ результатов
+    # Индекс "номер статьи -> чанки" сохраняем рядом с чанками
+    article_index = ArticleIndex.from_chunks(final_chunks)
+    article_index.save(article_index_path(final_path))
+    print(f"Индекс статей: {len(article_index.mapping)} статей")
+    
+    # 4. Анализ результатов
     avg_chunk_size = sum(len(chunk['text']) for chunk in final_chunks) / len(final_chunks)
     max_chunk_size = max(len(chunk['text']) for chunk in final_chunks)
     min_chunk_size = min(len(chunk['text']) for chunk in final_chunks)
@@ -57,9 +77,19 @@ def main():
     print(f"- Средний размер: {avg_chunk_size:.2f} символов")
     print(f"- Максимальный размер: {max_chunk_size} символов")
     print(f"- Минимальный размер: {min_chunk_size} символов")
+    if tokenizer is not None:
+        coverage = token_coverage([chunk['text'] for chunk in final_chunks], tokenizer, max_tokens)
+        print(f"- Покрытие токенов эмбеддингами: {coverage * 100:.1f}%")
     
     print("\n✅ Обработка успешно завершена!")
     print(f"Теперь вы можете использовать файл {final_path} для создания эмбеддингов.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Подготовка чанков Уголовного кодекса")
+    parser.add_argument(
+        "--token-model",
+        help="Резать чанки по бюджету токенов этой модели (например, "
+             "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2)"
+    )
+    args = parser.parse_args()
+    main(token_model=args.token_model)
\ No newline at end of file
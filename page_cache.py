@@ -0,0 +1,128 @@
+"""
+Кэш извлеченного текста страниц PDF на диске
+
+Ключ страницы - хэш ее потока содержимого, шрифтов и геометрии, поэтому при
+выходе новой консолидированной редакции кодекса заново извлекаются только
+изменившиеся страницы. Очистка текста (clean_text.py) выполняется потоком по
+всем страницам: она зависит от соседних страниц и стоит миллисекунды, поэтому
+в кэш не попадает.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+import fitz
+
+PAGES_FILE = "pages.json"
+PAGE_CACHE_DIR = "output/page_cache"
+
+# Меняется при изменении способа извлечения текста, делая старые записи недействительными
+EXTRACTION_VERSION = f"get_text/{fitz.VersionBind}"
+
+
+def page_key(page) -> str:
+    """
+    Ключ страницы: sha256 от потока содержимого, потоков Form XObject (в том
+    числе вложенных), шрифтов, размеров и поворота.
+
+    Args:
+        page (fitz.Page): Страница PDF
+
+    Returns:
+        str: Шестнадцатеричный хэш
+    """
+    digest = hashlib.sha256(EXTRACTION_VERSION.encode("utf-8"))
+    digest.update(page.read_contents())
+    # Текст может лежать в Form XObject: поток страницы тогда только вызывает его ("/Fm0 Do")
+    forms = sorted(
+        (name, tuple(bbox), hashlib.sha256(page.parent.xref_stream(xref) or b"").hexdigest())
+        for xref, name, invoker, bbox in page.get_xobjects()
+    )
+    # Номера объектов шрифтов различаются между файлами, в ключ идут только их описания
+    fonts = sorted((font[3], font[2], font[5]) for font in page.get_fonts())
+    digest.update(repr((forms, fonts, tuple(page.rect), page.rotation)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """
+    Кэш текстов страниц с ограничением по числу записей (вытеснение LRU).
+    """
+
+    def __init__(self, cache_dir: str, max_entries: Optional[int] = None):
+        """
+        Открывает (или создает) кэш в указанном каталоге.
+
+        Args:
+            cache_dir (str): Каталог кэша
+            max_entries (Optional[int]): Максимальное число страниц (None - без ограничения)
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.reused = 0
+        self.recomputed = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.pages_path = os.path.join(cache_dir, PAGES_FILE)
+
+        self.pages: Dict[str, str] = {}
+        self.last_used: Dict[str, int] = {}
+        self.clock = 0
+        if os.path.exists(self.pages_path):
+            with open(self.pages_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.pages = table["pages"]
+            self.last_used = table["last_used"]
+            self.clock = table["clock"]
+        # Все обращения одного запуска получают одно "время"
+        self.clock += 1
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.pages
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Возвращает текст страницы из кэша.
+
+        Args:
+            key (str): Ключ страницы (page_key)
+
+        Returns:
+            Optional[str]: Текст или None, если страницы нет в кэше
+        """
+        text = self.pages.get(key)
+        if text is not None:
+            self.last_used[key] = self.clock
+            self.reused += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """
+        Сохраняет заново извлеченный текст страницы.
+
+        Args:
+            key (str): Ключ страницы (page_key)
+            text (str): Извлеченный текст
+        """
+        self.pages[key] = text
+        self.last_used[key] = self.clock
+        self.recomputed += 1
+
+    def save(self) -> None:
+        """Вытесняет лишние записи и атомарно записывает кэш на диск."""
+        if self.max_entries is not None and len(self.pages) > self.max_entries:
+            for key in sorted(self.last_used, key=self.last_used.get)[:len(self.pages) - self.max_entries]:
+                del self.pages[key]
+                del self.last_used[key]
+        table = {"clock": self.clock, "pages": self.pages, "last_used": self.last_used}
+        tmp_path = self.pages_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.replace(tmp_path, self.pages_path)
+
+    def stats(self) -> str:
+        """Строка со статистикой для вывода в консоль."""
+        return (f"Кэш страниц: использовано повторно {self.reused}, "
+                f"извлечено заново {self.recomputed}, записей {len(self.pages)}")
@@ -1,24 +1,105 @@
+import multiprocessing
+from typing import Iterator, List, Optional
+
 import fitz
 
-def extract_and_save_text(pdf_path, output_path):
+from page_cache import PAGE_CACHE_DIR, PageTextCache, page_key
+
+# Документ, открытый в процессе пула (у каждого процесса свой дескриптор)
+_worker_doc = None
+
+def _open_worker_doc(pdf_path: str) -> None:
+    """Открывает PDF один раз при запуске процесса пула."""
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+def _extract_pages(page_numbers: List[int]) -> List[str]:
+    """Извлекает текст указанных страниц документом текущего процесса."""
+    return [_worker_doc[page_num].get_text() for page_num in page_numbers]
+
+def _iter_extracted(pdf_path, page_numbers: List[int], workers, pages_per_task) -> Iterator[str]:
+    """Извлекает тексты указанных страниц по порядку (при workers > 1 - в пуле процессов)."""
+    if workers <= 1:
+        pdf_doc = fitz.open(pdf_path)
+        try:
+            for page_num in page_numbers:
+                yield pdf_doc[page_num].get_text()
+        finally:
+            pdf_doc.close()
+        return
+
+    tasks = [page_numbers[i:i + pages_per_task] for i in range(0, len(page_numbers), pages_per_task)]
+    if not tasks:
+        return
+    with multiprocessing.Pool(min(workers, len(tasks)), initializer=_open_worker_doc,
+                              initargs=(pdf_path,)) as pool:
+        for page_texts in pool.imap(_extract_pages, tasks):
+            yield from page_texts
+
+def iter_page_texts(pdf_path, workers=1, pages_per_task=16, cache: Optional[PageTextCache] = None) -> Iterator[str]:
+    """
+    Возвращает тексты страниц PDF по порядку.
+
+    При workers > 1 страницы делятся на задания по pages_per_task страниц и
+    распределяются по пулу процессов; результаты выдаются в порядке страниц по
+    мере готовности. Если передан cache, извлекаются только страницы, которых
+    в нем нет (сохранять кэш после чтения должен вызывающий код).
+    """
+    with fitz.open(pdf_path) as pdf_doc:
+        page_count = pdf_doc.page_count
+        keys = [page_key(page) for page in pdf_doc] if cache is not None else None
+
+    if cache is None:
+        yield from _iter_extracted(pdf_path, list(range(page_count)), workers, pages_per_task)
+        return
+
+    # Одинаковые страницы (например, пустые) извлекаются один раз
+    missing = []
+    pending_keys = set()
+    for page_num, key in enumerate(keys):
+        if key not in cache and key not in pending_keys:
+            missing.append(page_num)
+            pending_keys.add(key)
+
+    extracted = _iter_extracted(pdf_path, missing, workers, pages_per_task)
+    missing_pages = set(missing)
+    for page_num, key in enumerate(keys):
+        if page_num in missing_pages:
+            text = next(extracted)
+            cache.put(key, text)
+        else:
+            text = cache.get(key)
+        yield text
+
+def extract_and_save_text(pdf_path, output_path, workers=1, cache: Optional[PageTextCache] = None):
     """
     Извлекает текст из PDF и сохраняет его в текстовый файл.
     Каждая страница отделяется маркером.
+    При workers > 1 страницы извлекаются параллельно в нескольких процессах.
+    С cache неизменившиеся страницы берутся из кэша страниц.
     """
-    pdf_doc = fitz.open(pdf_path)
-    
     with open(output_path, 'w', encoding='utf-8') as f:
-        for page_num, page in enumerate(pdf_doc, 1):
-            text = page.get_text()
+        for page_num, text in enumerate(iter_page_texts(pdf_path, workers, cache=cache), 1):
             # Записываем номер страницы и её содержимое
             f.write(f"\n=== Страница {page_num} ===\n")
             f.write(text)
             f.write("\n")
-    
-    pdf_doc.close()
+
+    if cache is not None:
+        cache.save()
+        print(cache.stats())
     print(f"Текст сохранен в файл: {output_path}")
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Извлечение текста из PDF")
+    parser.add_argument("--workers", type=int, default=1, help="Число процессов для извлечения страниц")
+    parser.add_argument("--page-cache", default=PAGE_CACHE_DIR,
+                        help="Каталог кэша страниц (пустая строка - без кэша)")
+    args = parser.parse_args()
+
     pdf_path = "codigo_penal.pdf"
     output_path = "extracted_text.txt"
-    extract_and_save_text(pdf_path, output_path) 
\ No newline at end of file
+    cache = PageTextCache(args.page_cache) if args.page_cache else None
+    extract_and_save_text(pdf_path, output_path, workers=args.workers, cache=cache)
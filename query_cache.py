@@ -0,0 +1,214 @@
+"""
+Кэш ответов ассистента по нормализованному вопросу
+
+Ключ записи - вопрос без различий в регистре, пробелах, диакритике и
+обрамляющих знаках препинания, поэтому "¿Qué es el HOMICIDIO?" и
+"que es el homicidio" дают одну запись. Кэш ограничен по числу записей
+(вытеснение LRU) и по времени жизни записи. Каждая запись привязана к версии
+чанков и индекса: при смене версии кэш очищается. По желанию записи
+дублируются в SQLite, чтобы после перезапуска процесса кэш оставался теплым.
+"""
+
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+# Знаки, которые не меняют смысла вопроса в начале и в конце строки
+_EDGE_PUNCTUATION = "¿?¡!.,;: "
+
+
+def normalize_question(question: str) -> str:
+    """
+    Нормализует вопрос для ключа кэша: без диакритики, регистра и лишних пробелов.
+
+    Args:
+        question (str): Вопрос пользователя
+
+    Returns:
+        str: Нормализованный вопрос
+    """
+    decomposed = unicodedata.normalize("NFKD", question)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.casefold().split()).strip(_EDGE_PUNCTUATION)
+
+
+class QueryCache:
+    """
+    Кэш ответов с ограничением по числу записей (LRU) и времени жизни (TTL).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = 24 * 3600,
+        version: str = "",
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Открывает кэш; если указан path, загружает сохраненные записи той же версии.
+
+        Args:
+            max_entries (int): Максимальное число записей
+            ttl (Optional[float]): Время жизни записи в секундах (None - без ограничения)
+            version (str): Версия чанков и индекса, для которой сохраняются ответы
+            path (Optional[str]): Файл SQLite для сохранения записей между запусками
+            clock (Callable[[], float]): Источник текущего времени в секундах
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version
+        self.path = path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        # Ключ -> (ответ, время записи); порядок - от давно использованных к недавним
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # Ассистент может вызываться из пула потоков (сервер), а соединение SQLite одно
+        self.lock = threading.Lock()
+
+        self.db = None
+        if path:
+            self.db = self._connect()
+            self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Файл может быть общим для нескольких процессов-обработчиков (server.py --workers)
+        db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT, stored_at REAL)")
+        return db
+
+    def reopen(self) -> None:
+        """
+        Открывает файл SQLite заново; вызывается в дочернем процессе после fork,
+        так как соединение SQLite нельзя использовать в двух процессах.
+        """
+        if self.path:
+            self.lock = threading.Lock()
+            self.db = self._connect()
+
+    def _load(self) -> None:
+        """Загружает записи текущей версии; записи другой версии удаляются."""
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != self.version:
+            self._reset_db()
+            return
+
+        rows = self.db.execute(
+            "SELECT key, answer, stored_at FROM answers ORDER BY stored_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        now = self.clock()
+        for key, answer, stored_at in reversed(rows):
+            if not self._is_expired(stored_at, now):
+                self.entries[key] = (answer, stored_at)
+        # Лишние и устаревшие записи в файле больше не нужны
+        self.db.execute("DELETE FROM answers WHERE stored_at < ?",
+                        (min((stored_at for _, stored_at in self.entries.values()), default=now),))
+        self.db.commit()
+
+    def _reset_db(self) -> None:
+        self.db.execute("DELETE FROM answers")
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (self.version,))
+        self.db.commit()
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def key(self, question: str) -> str:
+        """Ключ вопроса в кэше (см. normalize_question)."""
+        return normalize_question(question)
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        Возвращает сохраненный ответ на вопрос.
+
+        Args:
+            question (str): Вопрос пользователя
+
+        Returns:
+            Optional[str]: Ответ или None, если его нет в кэше или он устарел
+        """
+        key = self.key(question)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._is_expired(entry[1], self.clock()):
+                self._delete(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, question: str, answer: str, version: Optional[str] = None) -> None:
+        """
+        Сохраняет ответ на вопрос, вытесняя давно не использованные записи.
+
+        Args:
+            question (str): Вопрос пользователя
+            answer (str): Ответ ассистента
+            version (Optional[str]): Версия данных, по которым построен ответ; если кэш
+                уже переключен на другую, ответ не сохраняется
+        """
+        key = self.key(question)
+        stored_at = self.clock()
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            self.entries[key] = (answer, stored_at)
+            self.entries.move_to_end(key)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO answers (key, answer, stored_at) VALUES (?, ?, ?)",
+                                (key, answer, stored_at))
+            while len(self.entries) > self.max_entries:
+                self._delete(next(iter(self.entries)))
+                self.evicted += 1
+            if self.db is not None:
+                self.db.commit()
+
+    def _delete(self, key: str) -> None:
+        del self.entries[key]
+        if self.db is not None:
+            self.db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self.db.commit()
+
+    def set_version(self, version: str) -> None:
+        """
+        Переключает кэш на новую версию чанков и индекса; ответы старой версии удаляются.
+
+        Args:
+            version (str): Новая версия
+        """
+        with self.lock:
+            if version == self.version:
+                return
+            self.version = version
+            self.entries.clear()
+            if self.db is not None:
+                self._reset_db()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> str:
+        """Строка со статистикой для вывода в консоль."""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        return (f"Кэш запросов: попаданий {self.hits}, промахов {self.misses} ({hit_rate:.1f}% попаданий), "
+                f"устарело {self.expired}, вытеснено {self.evicted}, записей {len(self.entries)}")
+
+    def close(self) -> None:
+        """Закрывает файл SQLite (записи уже сохранены)."""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -3,34 +3,135 @@
 
 Этот скрипт позволяет выполнять семантический поиск по тексту Уголовного кодекса
 с использованием FAISS индекса и предварительно созданных эмбеддингов.
+
+Для долгоживущих процессов (бот, API) используйте класс SearchEngine: он загружает
+чанки, индекс и модель один раз и переиспользует их для всех запросов.
 """
 
+import copy
 import faiss
+import hashlib
 import numpy as np
 import json
 import os
 import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
 from sentence_transformers import SentenceTransformer
+from lexical_index import LexicalIndex
+from chunking import chunk_id
+from article_index import ARTICLE_SUFFIX_GROUP, ArticleIndex, load_or_build_article_index
+from serving_artifacts import MappedChunks, ServingArtifacts
 
-def search_similar_chunks(
-    question: str,
-    chunks: list,
-    index_path: str = "output/penal_code.index",
-    model_name: str = "all-MiniLM-L6-v2",
-    top_k: int = 5
-) -> list:
+
+# Константа сглаживания для reciprocal rank fusion (значение из оригинальной статьи RRF)
+RRF_K = 60
+
+
+@lru_cache(maxsize=None)
+def _load_index(index_path: str):
     """
-    Ищет наиболее похожие чанки текста на основе семантической близости.
+    Загружает FAISS индекс один раз на процесс для функции search_similar_chunks.
+    """
+    return faiss.read_index(index_path)
+
+
+@lru_cache(maxsize=None)
+def _load_model(model_name: str) -> SentenceTransformer:
+    """
+    Загружает модель эмбеддингов один раз на процесс.
+    """
+    return SentenceTransformer(model_name)
+
+
+def resolve_chunks_file(chunks_file: str = "output/penal_code_chunks.json") -> str:
+    """
+    Возвращает путь к файлу с чанками, проверяя запасной вариант в корне проекта.
+    
+    Args:
+        chunks_file (str): Предпочтительный путь к файлу с чанками
+        
+    Returns:
+        str: Существующий путь к файлу с чанками
+    """
+    if os.path.exists(chunks_file):
+        return chunks_file
+    
+    alternative_path = "penal_code_chunks.json"
+    if os.path.exists(alternative_path):
+        return alternative_path
+    
+    raise FileNotFoundError(
+        f"Файл с чанками не найден ни в {chunks_file}, ни в {alternative_path}"
+    )
+
+
+def load_chunks(chunks_file: str = "output/penal_code_chunks.json") -> list:
+    """
+    Загружает чанки текста из JSON файла.
+    
+    Args:
+        chunks_file (str): Путь к файлу с чанками
+        
+    Returns:
+        list: Список чанков
+    """
+    with open(resolve_chunks_file(chunks_file), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def files_version(*paths: str) -> str:
+    """
+    Версия данных поиска - хэш содержимого файлов (как версия в serving_artifacts).
+    
+    Args:
+        *paths (str): Файлы чанков и индекса
+        
+    Returns:
+        str: Шестнадцатеричный хэш (16 символов)
+    """
+    version = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                version.update(block)
+    return version.hexdigest()[:16]
+
+
+def _id_to_position(index, chunks: list):
+    """
+    Строит отображение chunk_id -> позиция для индексов с идентификаторами.
+    
+    Args:
+        index: Загруженный FAISS индекс
+        chunks (list): Список чанков в порядке файла
+        
+    Returns:
+        dict: Отображение или None, если метки индекса - это позиции в списке
+    """
+    if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return None
+    if isinstance(chunks, MappedChunks):
+        # Идентификаторы уже лежат в метаданных, тексты декодировать не нужно
+        return {int(cid): position for position, cid in enumerate(chunks.chunk_ids())}
+    return {chunk_id(chunk): position for position, chunk in enumerate(chunks)}
+
+
+def _chunk_key(chunk: dict) -> tuple:
+    """Уникальный ключ чанка для удаления дубликатов."""
+    return (chunk["libro"], chunk["titulo"], chunk["capitulo"], chunk["chunk_index"])
+
+
+def _text_match_results(question: str, chunks: list) -> list:
+    """
+    Находит чанки с прямыми текстовыми совпадениями ключевых терминов запроса.
     
     Args:
         question (str): Текст запроса
         chunks (list): Список чанков для поиска
-        index_path (str): Путь к файлу индекса
-        model_name (str): Название модели для создания эмбеддингов
-        top_k (int): Количество результатов для возврата
         
     Returns:
-        list: Список наиболее похожих чанков с указанием расстояния
+        list: До трех чанков с наибольшим числом совпадений
     """
     # Предварительная фильтрация по ключевым словам в запросе
     key_terms = extract_key_terms(question.lower())
@@ -59,34 +160,68 @@ def search_similar_chunks(
     if len(text_matches) >= 2:
         direct_results = [match["chunk"] for match in text_matches[:3]]
     
-    # Загружаем FAISS index для векторного поиска
-    index = faiss.read_index(index_path)
-    
-    # Загружаем модель эмбеддингов
-    model = SentenceTransformer(model_name)
-    
-    # Считаем эмбеддинги запроса
-    question_embedding = model.encode([question], convert_to_numpy=True)
-    
-    # Ищем ближайшие K
-    distances, indices = index.search(question_embedding, top_k)
+    return direct_results
+
+
+def _vector_results(
+    distances: np.ndarray,
+    indices: np.ndarray,
+    chunks: list,
+    id_to_position: dict = None
+) -> list:
+    """
+    Превращает одну строку результата index.search в список чанков.
     
-    # Собираем результаты из векторного поиска
+    Args:
+        distances (np.ndarray): Расстояния для одного запроса
+        indices (np.ndarray): Метки векторов для одного запроса
+        chunks (list): Список всех чанков
+        id_to_position (dict): Идентификатор чанка -> позиция в chunks для индексов
+            с идентификаторами (IndexIDMap2); None - метки совпадают с позициями
+        
+    Returns:
+        list: Чанки с указанием расстояния
+    """
     vector_results = []
-    for idx, dist in zip(indices[0], distances[0]):
-        if idx < len(chunks):
+    for label, dist in zip(indices, distances):
+        idx = _label_to_position(label, chunks, id_to_position)
+        if idx is not None:
             result = chunks[idx].copy()
             result["distance"] = float(dist)
             vector_results.append(result)
+    return vector_results
+
+
+def _label_to_position(label, chunks: list, id_to_position: dict = None):
+    """
+    Переводит метку из FAISS в позицию чанка в списке (или None, если чанка нет).
+    """
+    if id_to_position is not None:
+        return id_to_position.get(int(label))
+    if 0 <= label < len(chunks):
+        return int(label)
+    return None
+
+
+def _combine_results(direct_results: list, vector_results: list, top_k: int) -> list:
+    """
+    Комбинирует результаты текстового и векторного поиска.
     
-    # Комбинируем результаты текстового и векторного поиска
+    Args:
+        direct_results (list): Текстовые совпадения
+        vector_results (list): Векторные совпадения
+        top_k (int): Количество результатов для возврата
+        
+    Returns:
+        list: Объединенный список без дубликатов
+    """
     # Отдаем приоритет текстовым совпадениям
     combined_results = []
     seen_indices = set()
     
     # Добавляем сначала текстовые совпадения
     for result in direct_results:
-        key = (result["libro"], result["titulo"], result["capitulo"], result["chunk_index"])
+        key = _chunk_key(result)
         if key not in seen_indices:
             seen_indices.add(key)
             result["match_type"] = "text_match"
@@ -94,7 +229,7 @@ def search_similar_chunks(
     
     # Добавляем векторные совпадения, если их еще нет в результатах
     for result in vector_results:
-        key = (result["libro"], result["titulo"], result["capitulo"], result["chunk_index"])
+        key = _chunk_key(result)
         if key not in seen_indices:
             seen_indices.add(key)
             result["match_type"] = "vector_match"
@@ -103,6 +238,474 @@ def search_similar_chunks(
     # Ограничиваем общее количество результатов
     return combined_results[:top_k]
 
+
+def search_similar_chunks(
+    question: str,
+    chunks: list,
+    index_path: str = "output/penal_code.index",
+    model_name: str = "all-MiniLM-L6-v2",
+    top_k: int = 5
+) -> list:
+    """
+    Ищет наиболее похожие чанки текста на основе семантической близости.
+    
+    Индекс и модель кэшируются на уровне процесса, поэтому повторные вызовы
+    не перечитывают их с диска. Для сервисов предпочтительнее SearchEngine.
+    
+    Args:
+        question (str): Текст запроса
+        chunks (list): Список чанков для поиска
+        index_path (str): Путь к файлу индекса
+        model_name (str): Название модели для создания эмбеддингов
+        top_k (int): Количество результатов для возврата
+        
+    Returns:
+        list: Список наиболее похожих чанков с указанием расстояния
+    """
+    direct_results = _text_match_results(question, chunks)
+    
+    # Индекс и модель загружаются только при первом обращении
+    index = _load_index(index_path)
+    model = _load_model(model_name)
+    
+    # Считаем эмбеддинги запроса и ищем ближайшие K
+    question_embedding = model.encode([question], convert_to_numpy=True)
+    distances, indices = index.search(question_embedding, top_k)
+    
+    id_to_position = _id_to_position(index, chunks)
+    vector_results = _vector_results(distances[0], indices[0], chunks, id_to_position)
+    return _combine_results(direct_results, vector_results, top_k)
+
+
+class ChunkNeighbors:
+    """
+    Соседи чанков внутри capítulo, вычисленные один раз при загрузке.
+    
+    Для каждой позиции чанка хранятся позиции предыдущего и следующего чанка
+    той же группы (libro, titulo, capitulo) по chunk_index (-1, если соседа нет),
+    поэтому расширение контекстом стоит O(результатов × окно).
+    """
+    
+    def __init__(self, group_ids: np.ndarray, chunk_indexes: np.ndarray, groups: list):
+        """
+        Args:
+            group_ids (np.ndarray): Номер группы каждого чанка (по позициям)
+            chunk_indexes (np.ndarray): chunk_index каждого чанка
+            groups (list): Тройки (libro, titulo, capitulo) по номерам групп
+        """
+        group_ids = np.asarray(group_ids, dtype=np.int64)
+        chunk_indexes = np.asarray(chunk_indexes, dtype=np.int64)
+        
+        # Соседи по порядку - соседние элементы после сортировки по (группа, chunk_index)
+        order = np.lexsort((chunk_indexes, group_ids))
+        same_group = group_ids[order[1:]] == group_ids[order[:-1]]
+        left, right = order[:-1][same_group], order[1:][same_group]
+        self.prev = np.full(len(group_ids), -1, dtype=np.int64)
+        self.next = np.full(len(group_ids), -1, dtype=np.int64)
+        self.next[left] = right
+        self.prev[right] = left
+        
+        self.group_numbers = {tuple(group): number for number, group in enumerate(groups)}
+        self.positions = {key: position for position, key in enumerate(zip(group_ids.tolist(), chunk_indexes.tolist()))}
+    
+    @classmethod
+    def from_chunks(cls, chunks) -> "ChunkNeighbors":
+        """
+        Строит смежность по списку чанков.
+        
+        Args:
+            chunks: Список чанков или MappedChunks (тексты не декодируются)
+            
+        Returns:
+            ChunkNeighbors: Смежность чанков
+        """
+        if isinstance(chunks, MappedChunks):
+            return cls(chunks.meta["group"], chunks.meta["chunk_index"], chunks.groups)
+        
+        groups = {}
+        group_ids = [groups.setdefault((chunk["libro"], chunk["titulo"], chunk["capitulo"]), len(groups))
+                     for chunk in chunks]
+        return cls(group_ids, [chunk["chunk_index"] for chunk in chunks], list(groups))
+    
+    def position(self, chunk: dict) -> Optional[int]:
+        """Позиция чанка в списке по его группе и chunk_index (None, если чанка нет)."""
+        group = self.group_numbers.get((chunk["libro"], chunk["titulo"], chunk["capitulo"]))
+        if group is None:
+            return None
+        return self.positions.get((group, chunk["chunk_index"]))
+    
+    def _side(self, links: np.ndarray, position: int, window: int) -> list:
+        """До window соседей в одну сторону, от ближнего к дальнему."""
+        found = []
+        position = int(links[position])
+        while position != -1 and len(found) < window:
+            found.append(position)
+            position = int(links[position])
+        return found
+    
+    def expand(self, results: list, chunks, window: int = 1, max_chars: Optional[int] = None) -> list:
+        """
+        Добавляет к результатам поиска до window соседей с каждой стороны.
+        
+        Найденные чанки остаются как есть (с оценками), соседи добавляются копиями
+        с полем "is_context". Бюджет символов сначала резервируется под найденные
+        чанки, затем соседи добавляются от ближних к дальним, пока помещаются.
+        
+        Args:
+            results (list): Результаты поиска
+            chunks: Список чанков, по которому построена смежность
+            window (int): Сколько соседей с каждой стороны брать
+            max_chars (Optional[int]): Бюджет символов на все чанки (None - без ограничения)
+            
+        Returns:
+            list: Результаты с соседями в порядке документа внутри каждой группы, без повторов
+        """
+        hits = []
+        seen = set()
+        for result in results:
+            position = self.position(result)
+            if position is None or position not in seen:
+                hits.append((result, position))
+                seen.add(position)
+        
+        budget = None
+        if max_chars is not None:
+            budget = max_chars - sum(len(result["text"]) for result, _ in hits)
+        
+        expanded = []
+        for result, position in hits:
+            if position is None:
+                expanded.append(result)
+                continue
+            
+            before, after = [], []
+            left = self._side(self.prev, position, window)
+            right = self._side(self.next, position, window)
+            for distance in range(window):
+                for side, neighbors in ((before, left), (after, right)):
+                    if distance >= len(neighbors) or neighbors[distance] in seen:
+                        continue
+                    neighbor = neighbors[distance]
+                    context = dict(chunks[neighbor])
+                    if budget is not None:
+                        if len(context["text"]) > budget:
+                            # Дальние соседи без ближнего не добавляются
+                            del neighbors[distance:]
+                            continue
+                        budget -= len(context["text"])
+                    context["is_context"] = True
+                    seen.add(neighbor)
+                    side.append(context)
+            
+            expanded.extend(reversed(before))
+            expanded.append(result)
+            expanded.extend(after)
+        
+        return expanded
+
+
+class SearchData(NamedTuple):
+    """
+    Данные поиска одной версии: чанки и построенные по ним индексы.
+    
+    SearchEngine заменяет набор целиком одним присваиванием, поэтому метки
+    FAISS, позиции текстового индекса и список чанков всегда одной версии.
+    """
+    chunks_file: str
+    chunks: list
+    index_path: str
+    index: faiss.Index
+    lexical_index: LexicalIndex
+    article_index: ArticleIndex
+    id_to_position: Optional[dict]     # chunk_id -> позиция (None - метки индекса и есть позиции)
+    neighbors: ChunkNeighbors
+    version: str                       # хэш файлов; по нему кэши ответов узнают о пересборке
+
+
+class SearchEngine:
+    """
+    Долгоживущий поисковый движок по Уголовному кодексу.
+    
+    Загружает чанки, FAISS индекс и модель эмбеддингов один раз при создании,
+    после чего каждый запрос стоит одного кодирования и одного поиска по индексу.
+    """
+    
+    def __init__(
+        self,
+        chunks_file: str = "output/penal_code_chunks.json",
+        index_path: str = "output/penal_code.index",
+        model_name: str = "all-MiniLM-L6-v2",
+        artifacts_dir: Optional[str] = None
+    ):
+        """
+        Загружает данные для поиска.
+        
+        Args:
+            chunks_file (str): Путь к файлу с чанками текста
+            index_path (str): Путь к FAISS индексу
+            model_name (str): Название модели для эмбеддингов
+            artifacts_dir (Optional[str]): Каталог артефактов serving_artifacts.py;
+                если задан, чанки и индексы отображаются в память оттуда, а
+                chunks_file и index_path не используются
+        """
+        self.model_name = model_name
+        self.artifacts_dir = artifacts_dir
+        self._load_data(chunks_file, index_path)
+        self.model = _load_model(model_name)
+        self.is_warm = False
+    
+    def _load_data(self, chunks_file: str, index_path: str) -> None:
+        """
+        Загружает чанки, индексы и соседей чанков (все, кроме модели) в self.data.
+
+        Новый SearchData присваивается одной операцией и только после успешной
+        загрузки, поэтому ошибка при перезагрузке (reload) оставляет прежние данные,
+        а параллельный запрос видит либо старую, либо новую версию целиком.
+        """
+        if self.artifacts_dir:
+            # Быстрый старт: ничего не разбираем и не строим, только mmap
+            artifacts = ServingArtifacts(self.artifacts_dir)
+            chunks_file = self.artifacts_dir
+            chunks = artifacts.chunks
+            index_path = artifacts.index_path
+            index = artifacts.index
+            lexical_index = artifacts.lexical_index
+            article_index = artifacts.article_index
+            version = artifacts.version
+        else:
+            chunks_file = resolve_chunks_file(chunks_file)
+            chunks = load_chunks(chunks_file)
+            
+            if not os.path.exists(index_path):
+                raise FileNotFoundError(f"Индекс не найден: {index_path}")
+            index = faiss.read_index(index_path)
+            
+            # Инвертированный индекс для текстовой части гибридного поиска
+            lexical_index = LexicalIndex([chunk["text"] for chunk in chunks])
+            
+            # Хэш-индекс "номер статьи -> чанки" (сохраняется рядом с файлом чанков)
+            article_index = load_or_build_article_index(chunks, chunks_file)
+            
+            # Версия данных: по ней кэши ответов узнают о пересборке чанков и индекса
+            version = files_version(chunks_file, index_path)
+        
+        # Индекс со стабильными идентификаторами возвращает chunk_id, а не позиции
+        id_to_position = _id_to_position(index, chunks)
+        if id_to_position is None and index.ntotal != len(chunks):
+            # Метки - позиции в списке чанков: при другом числе чанков они указывают не туда
+            raise ValueError(
+                f"Индекс {index_path} построен по {index.ntotal} чанкам, "
+                f"а в {chunks_file} их {len(chunks)}; пересоберите индекс (generator.py)"
+            )
+        # Соседи чанков внутри capítulo для расширения контекста
+        neighbors = ChunkNeighbors.from_chunks(chunks)
+        
+        self.data = SearchData(chunks_file, chunks, index_path, index, lexical_index, article_index,
+                               id_to_position, neighbors, version)
+    
+    @property
+    def chunks(self) -> list:
+        return self.data.chunks
+    
+    @property
+    def index(self) -> faiss.Index:
+        return self.data.index
+    
+    @property
+    def index_path(self) -> str:
+        return self.data.index_path
+    
+    @property
+    def version(self) -> str:
+        return self.data.version
+    
+    def reload(self) -> bool:
+        """
+        Перечитывает чанки и индексы с диска (модель остается загруженной).
+
+        Returns:
+            bool: True, если версия данных изменилась
+        """
+        previous = self.data
+        self._load_data(previous.chunks_file, previous.index_path)
+        return self.data.version != previous.version
+    
+    def snapshot(self) -> "SearchEngine":
+        """
+        Движок с той же моделью и текущими данными, которые не меняет reload.
+        
+        Запрос, который обращается к движку несколько раз (поиск, затем соседи
+        найденных чанков), берет снимок один раз и работает с одной версией.
+        
+        Returns:
+            SearchEngine: Снимок движка
+        """
+        return copy.copy(self)
+    
+    def warm_up(self) -> None:
+        """
+        Прогревает модель и индекс пробным запросом.
+        
+        Первый вызов encode инициализирует токенизатор и вычислительные ядра torch,
+        поэтому его лучше выполнить при старте, а не на первом запросе пользователя.
+        """
+        if self.is_warm:
+            return
+        
+        embedding = self.encode(["Artículo 1"])
+        self.index.search(embedding, 1)
+        self.is_warm = True
+    
+    def encode(self, texts: list) -> np.ndarray:
+        """
+        Считает эмбеддинги запросов.
+        
+        Args:
+            texts (list): Тексты запросов
+            
+        Returns:
+            np.ndarray: Матрица эмбеддингов формы (len(texts), dim)
+        """
+        return self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    
+    def search(self, question: str, top_k: int = 5, embedding: Optional[np.ndarray] = None,
+               hits: Optional[tuple] = None) -> list:
+        """
+        Гибридный (текстовый + векторный) поиск по загруженным чанкам.
+        
+        Args:
+            question (str): Текст запроса
+            top_k (int): Количество результатов для возврата
+            embedding (Optional[np.ndarray]): Уже посчитанный эмбеддинг запроса
+            hits (Optional[tuple]): Уже найденные в индексе (distances, indices) для
+                этого запроса, например из общего батча нескольких запросов
+            
+        Returns:
+            list: Список наиболее похожих чанков
+        """
+        data = self.data
+        direct_results = self._text_search(data, question)
+        
+        if hits is None:
+            if embedding is None:
+                embedding = self.encode([question])
+            distances, indices = data.index.search(np.asarray(embedding, dtype=np.float32).reshape(1, -1), top_k)
+            hits = (distances[0], indices[0])
+        vector_results = _vector_results(hits[0][:top_k], hits[1][:top_k], data.chunks, data.id_to_position)
+        
+        return _combine_results(direct_results, vector_results, top_k)
+    
+    def search_many(self, queries: list, top_k: int = 5, fusion: str = "rrf",
+                    embeddings: Optional[np.ndarray] = None, hits: Optional[tuple] = None) -> list:
+        """
+        Гибридный поиск сразу по нескольким вариантам запроса.
+        
+        Все варианты кодируются одним батчем модели и ищутся одним вызовом
+        index.search по матрице запросов; текстовый поиск выполняется один раз
+        по объединению ключевых терминов. Векторные результаты разных вариантов
+        объединяются по reciprocal rank fusion ("rrf") или по максимальной
+        оценке ("max").
+        
+        Args:
+            queries (list): Варианты запроса (например, из _expand_legal_query)
+            top_k (int): Количество результатов для возврата
+            fusion (str): Способ объединения результатов: "rrf" или "max"
+            embeddings (Optional[np.ndarray]): Уже посчитанные эмбеддинги вариантов
+            hits (Optional[tuple]): Уже найденные в индексе матрицы (distances, indices)
+            
+        Returns:
+            list: Список наиболее похожих чанков с полем "fusion_score"
+        """
+        if fusion not in ("rrf", "max"):
+            raise ValueError(f"Неизвестный способ объединения результатов: {fusion}")
+        
+        data = self.data
+        direct_results = self._text_search(data, " ".join(queries))
+        
+        if hits is None:
+            if embeddings is None:
+                embeddings = self.encode(queries)
+            hits = data.index.search(embeddings, top_k)
+        distances, indices = hits[0][:, :top_k], hits[1][:, :top_k]
+        
+        fused = {}
+        for row_distances, row_indices in zip(distances, indices):
+            for rank, (label, dist) in enumerate(zip(row_indices, row_distances)):
+                idx = _label_to_position(label, data.chunks, data.id_to_position)
+                if idx is None:
+                    continue
+                entry = fused.setdefault(idx, {"distance": float(dist), "fusion_score": 0.0})
+                entry["distance"] = max(entry["distance"], float(dist))
+                if fusion == "rrf":
+                    entry["fusion_score"] += 1.0 / (RRF_K + rank + 1)
+                else:
+                    entry["fusion_score"] = entry["distance"]
+        
+        vector_results = []
+        for idx, entry in sorted(fused.items(), key=lambda x: -x[1]["fusion_score"]):
+            result = data.chunks[idx].copy()
+            result.update(entry)
+            vector_results.append(result)
+        
+        return _combine_results(direct_results, vector_results, top_k)
+    
+    def text_search(self, question: str, top_k: int = 3) -> list:
+        """
+        Текстовый поиск ключевых терминов запроса по инвертированному индексу (BM25).
+        
+        Args:
+            question (str): Текст запроса
+            top_k (int): Максимальное количество текстовых совпадений
+            
+        Returns:
+            list: Чанки с оценкой "text_score"; пустой список, если совпадений меньше двух
+        """
+        return self._text_search(self.data, question, top_k)
+    
+    @staticmethod
+    def _text_search(data: SearchData, question: str, top_k: int = 3) -> list:
+        key_terms = extract_key_terms(question.lower())
+        matches = data.lexical_index.search(key_terms, top_k=top_k)
+        
+        # Как и раньше, текстовым совпадениям доверяем только если их несколько
+        if len(matches) < 2:
+            return []
+        
+        results = []
+        for idx, score in matches:
+            result = data.chunks[idx].copy()
+            result["text_score"] = score
+            results.append(result)
+        return results
+    
+    def search_by_article(self, article_number: str) -> list:
+        """
+        Ищет чанки, содержащие статью или диапазон статей, через хэш-индекс.
+        
+        Args:
+            article_number (str): Номер статьи ("138", "57 bis") или диапазон ("138-140")
+            
+        Returns:
+            list: Список чанков содержащих указанные статьи
+        """
+        data = self.data
+        return [data.chunks[idx] for idx in data.article_index.lookup(article_number)]
+    
+    def expand_with_neighbors(self, results: list, window: int = 1, max_chars: Optional[int] = None) -> list:
+        """
+        Расширяет результаты поиска соседними чанками того же capítulo.
+        
+        Args:
+            results (list): Результаты поиска
+            window (int): Сколько соседей с каждой стороны брать
+            max_chars (Optional[int]): Бюджет символов на все чанки (None - без ограничения)
+            
+        Returns:
+            list: Результаты с соседями (поле "is_context"), без повторов
+        """
+        data = self.data
+        return data.neighbors.expand(results, data.chunks, window, max_chars)
+
 def extract_key_terms(question):
     """
     Извлекает ключевые термины для текстового поиска.
@@ -191,38 +794,87 @@ def extract_article_number(question: str):
         question (str): Вопрос пользователя
         
     Returns:
-        str: Номер статьи или None
+        str: Номер статьи ("138", "57 bis"), диапазон ("138 a 140") или None
     """
-    # Ищем запросы о конкретных статьях
-    article_match = re.search(r'(artículo|articulo|статья|статьи|art\.?)\s*(\d+)', question, re.IGNORECASE)
+    # Ищем запросы о конкретных статьях, включая суффиксы ("57 bis") и диапазоны ("138 a 140")
+    article_match = re.search(
+        rf'(artículos?|articulos?|статья|статьи|статей|arts?\.?)\s*'
+        rf'(\d+(?:\s*(?:{ARTICLE_SUFFIX_GROUP})\b)?(?:\s*(?:-|–|a|al|по)\s*\d+)?)',
+        question,
+        re.IGNORECASE
+    )
     if article_match:
-        return article_match.group(2)
+        return re.sub(r'\s+', ' ', article_match.group(2).strip()).lower()
     return None
 
+def extract_intent(question: str) -> tuple:
+    """
+    Определяет тип запроса пользователя.
+    
+    Args:
+        question (str): Вопрос пользователя
+        
+    Returns:
+        tuple: (тип запроса, параметр) где тип - "article_search",
+               "prescription_search" или "general_search"
+    """
+    article_number = extract_article_number(question)
+    if article_number:
+        return "article_search", article_number
+    
+    question_lower = question.lower()
+    prescription_markers = ["давност", "prescrip", "prescrib"]
+    if any(marker in question_lower for marker in prescription_markers):
+        return "prescription_search", None
+    
+    return "general_search", None
+
+def calculate_relevance_score(distance: float) -> float:
+    """
+    Переводит скалярное произведение из FAISS (IndexFlatIP) в релевантность от 0 до 100.
+    
+    Args:
+        distance (float): Значение "distance" из результатов векторного поиска
+        
+    Returns:
+        float: Релевантность в процентах
+    """
+    return max(0.0, min(100.0, float(distance) * 100.0))
+
+def expand_chunks_with_neighbors(results: list, all_chunks: list, window: int = 1,
+                                 max_chars: Optional[int] = None) -> list:
+    """
+    Расширяет найденные чанки соседями внутри того же capítulo.
+    
+    Смежность строится заново при каждом вызове; долгоживущим процессам лучше
+    использовать SearchEngine.expand_with_neighbors, где она готова с момента загрузки.
+    
+    Args:
+        results (list): Список чанков из поиска (с chunk_index, capitulo, etc.)
+        all_chunks (list): Полный список чанков
+        window (int): Сколько соседей с каждой стороны брать
+        max_chars (Optional[int]): Бюджет символов на весь контекст (см. ChunkNeighbors.expand)
+        
+    Returns:
+        list: Список расширенных чанков без повторов
+    """
+    return ChunkNeighbors.from_chunks(all_chunks).expand(results, all_chunks, window, max_chars)
+
 if __name__ == "__main__":
-    # Пути к файлам
-    chunks_file = "output/penal_code_chunks.json"
-    index_path = "output/penal_code.index"
-    
-    # Проверка наличия файлов
-    if not os.path.exists(chunks_file):
-        alternative_path = "penal_code_chunks.json"
-        if os.path.exists(alternative_path):
-            chunks_file = alternative_path
-        else:
-            print(f"Ошибка: Файл с чанками не найден ни в {chunks_file}, ни в {alternative_path}")
-            exit(1)
-            
-    if not os.path.exists(index_path):
-        print(f"Ошибка: Индексный файл не найден: {index_path}")
+    # Загружаем чанки, индекс и модель один раз на всю сессию
+    try:
+        engine = SearchEngine(
+            chunks_file="output/penal_code_chunks.json",
+            index_path="output/penal_code.index"
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Ошибка: {e}")
         exit(1)
     
-    # Загружаем чанки
-    with open(chunks_file, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
+    engine.warm_up()
     
     print("🔎 Поиск в Уголовном кодексе")
-    print(f"Загружено {len(chunks)} чанков текста")
+    print(f"Загружено {len(engine.chunks)} чанков текста")
     
     # Интерактивный режим поиска
     while True:
@@ -235,14 +887,14 @@ if __name__ == "__main__":
         
         if article_number:
             print(f"Поиск статьи {article_number}...")
-            results = search_by_article_number(article_number, chunks)
+            results = engine.search_by_article(article_number)
             if not results:
                 print(f"Статья {article_number} не найдена в кодексе.")
                 # Пробуем семантический поиск
-                results = search_similar_chunks(question, chunks, index_path)
+                results = engine.search(question)
         else:
             # Обычный семантический поиск
-            results = search_similar_chunks(question, chunks, index_path)
+            results = engine.search(question)
         
         if results:
             print(format_search_results(results))
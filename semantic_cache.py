@@ -0,0 +1,161 @@
+"""
+Семантический кэш ответов ассистента
+
+Второй уровень после кэша по нормализованному вопросу (query_cache.py): хранит
+эмбеддинги недавних вопросов в небольшой матрице NumPy и возвращает готовый
+ответ, если новый вопрос с тем же намерением достаточно близок к одному из
+сохраненных по косинусной близости ("срок давности убийства" и "plazo de
+prescripción del homicidio"). Поиск - одно умножение матрицы на вектор, без
+кодирования чанков, поиска по индексу и форматирования ответа.
+
+Близкие эмбеддинги бывают и у вопросов о разных составах ("pena por robo" и
+"pena por hurto"), поэтому вместе с вопросом сохраняются названные в нем
+составы преступлений: ответ возвращается, только если у вопросов есть общий
+состав или ни один из них состава не называет.
+"""
+
+import threading
+from typing import AbstractSet, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Ответы, найденные по близости эмбеддингов вопросов, в пределах одной области (намерения).
+    """
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.92, version: str = ""):
+        """
+        Args:
+            max_entries (int): Максимальное число вопросов (вытесняется давно не использованный)
+            threshold (float): Минимальная косинусная близость для попадания
+            version (str): Версия чанков и индекса, для которой сохраняются ответы
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+        self.vectors: Optional[np.ndarray] = None       # (max_entries, dim), строки нормированы
+        self.scopes = np.full(max_entries, -1, dtype=np.int64)
+        self.last_used = np.zeros(max_entries, dtype=np.int64)
+        self.answers: List[Optional[str]] = [None] * max_entries
+        self.offences: List[FrozenSet[str]] = [frozenset()] * max_entries
+        # Не больше max_entries областей: неиспользуемые удаляются при добавлении новой
+        self.scope_ids: Dict[str, int] = {}
+        self.next_scope_id = 0
+        self.size = 0
+        self.clock = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding: np.ndarray, scope: str, offences: AbstractSet[str] = frozenset()) -> Optional[str]:
+        """
+        Ищет ответ на самый близкий сохраненный вопрос той же области.
+
+        Args:
+            embedding (np.ndarray): Эмбеддинг вопроса
+            scope (str): Область (намерение запроса); вопросы разных областей не сравниваются
+            offences (AbstractSet[str]): Составы преступлений, названные в вопросе
+
+        Returns:
+            Optional[str]: Ответ или None, если близкого вопроса нет
+        """
+        with self.lock:
+            scope_id = self.scope_ids.get(scope)
+            if scope_id is None or self.size == 0:
+                self.misses += 1
+                return None
+
+            similarity = self.vectors[:self.size] @ self._normalize(embedding)
+            similarity[self.scopes[:self.size] != scope_id] = -np.inf
+            candidates = np.flatnonzero(similarity >= self.threshold)
+            for row in candidates[np.argsort(-similarity[candidates], kind="stable")]:
+                if self._same_offences(self.offences[row], offences):
+                    self.clock += 1
+                    self.last_used[row] = self.clock
+                    self.hits += 1
+                    return self.answers[row]
+
+            self.misses += 1
+            return None
+
+    @staticmethod
+    def _same_offences(stored: AbstractSet[str], asked: AbstractSet[str]) -> bool:
+        # Вопрос без состава не получает ответ о конкретном составе и наоборот
+        return bool(stored & asked) if stored or asked else True
+
+    def put(self, embedding: np.ndarray, scope: str, answer: str,
+            offences: AbstractSet[str] = frozenset(), version: Optional[str] = None) -> None:
+        """
+        Сохраняет ответ на вопрос.
+
+        Args:
+            embedding (np.ndarray): Эмбеддинг вопроса
+            scope (str): Область (намерение запроса)
+            answer (str): Ответ ассистента
+            offences (AbstractSet[str]): Составы преступлений, названные в вопросе
+            version (Optional[str]): Версия данных, по которым построен ответ; если кэш
+                уже переключен на другую, ответ не сохраняется
+        """
+        vector = self._normalize(embedding)
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if self.size < self.max_entries:
+                row = self.size
+                self.size += 1
+            else:
+                row = int(np.argmin(self.last_used))
+                self.scopes[row] = -1
+
+            self.clock += 1
+            self.vectors[row] = vector
+            self.scopes[row] = self._scope_id(scope)
+            self.last_used[row] = self.clock
+            self.answers[row] = answer
+            self.offences[row] = frozenset(offences)
+
+    def _scope_id(self, scope: str) -> int:
+        scope_id = self.scope_ids.get(scope)
+        if scope_id is None:
+            if len(self.scope_ids) >= self.max_entries:
+                live = set(self.scopes[:self.size].tolist())
+                self.scope_ids = {key: value for key, value in self.scope_ids.items() if value in live}
+            scope_id = self.scope_ids[scope] = self.next_scope_id
+            self.next_scope_id += 1
+        return scope_id
+
+    def set_version(self, version: str) -> None:
+        """
+        Переключает кэш на новую версию чанков и индекса; сохраненные ответы удаляются.
+
+        Args:
+            version (str): Новая версия
+        """
+        with self.lock:
+            if version == self.version:
+                return
+            self.version = version
+            self.size = 0
+            self.answers = [None] * self.max_entries
+            self.offences = [frozenset()] * self.max_entries
+            self.scopes[:] = -1
+            self.last_used[:] = 0
+            self.scope_ids = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def stats(self) -> str:
+        """Строка со статистикой для вывода в консоль."""
+        return f"Семантический кэш: попаданий {self.hits}, промахов {self.misses}, вопросов {self.size}"
@@ -0,0 +1,514 @@
+"""
+Асинхронный HTTP сервис юридического ассистента
+
+Сервис на asyncio без сторонних зависимостей. Эндпоинты:
+- POST /legal_question  {"question": "..."} -> {"question": "...", "answer": "..."}
+- GET  /health          -> {"status": "ok"}
+- GET  /stats           -> счетчики батчей и кэшей
+
+Запросы, пришедшие почти одновременно, объединяются (микробатчинг): их тексты
+кодируются одним вызовом model.encode и ищутся одним вызовом index.search в
+отдельном потоке, поэтому цикл событий не блокируется. Батч собирается, пока
+не наберется max_batch_size запросов или не пройдет max_wait_ms с момента
+прихода первого; пока модель считает один батч, копится следующий.
+
+В режиме --workers N главный процесс один раз загружает модель и открывает
+артефакты (чанки и индекс отображаются в память), затем создает слушающий
+сокет и порождает N процессов через fork. Процессы-обработчики наследуют
+модель и индексы копированием при записи, поэтому каждый следующий процесс
+почти не добавляет памяти, а соединения распределяет ядро через общий сокет.
+
+После пересборки чанков и индекса данные перечитываются без перезапуска по
+сигналу SIGHUP (kill -HUP <pid>; в режиме --workers - pid главного процесса):
+модель остается загруженной, кэши ответов переключаются на новую версию.
+
+Запуск:
+    python server.py --artifacts output/serving --port 8000
+    python server.py --artifacts output/serving --port 8000 --workers 4
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from legal_bot import LegalAssistant
+from search import SearchEngine
+
+MAX_BODY_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Объединяет запросы к модели и FAISS индексу из параллельных обработчиков в батчи.
+    """
+
+    def __init__(self, engine: SearchEngine, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            engine (SearchEngine): Поисковый движок (модель и индекс)
+            max_batch_size (int): Максимальное число текстов в батче
+            max_wait_ms (float): Сколько ждать дополнительные запросы после первого, мс
+        """
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # Модель и индекс вызываются из одного потока, по батчу за раз
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.texts = 0
+
+    def start(self) -> None:
+        """Запускает сборку батчей в текущем цикле событий."""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает сборку батчей."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def search(self, queries: List[str], top_k: int, index=None) -> Tuple[np.ndarray, tuple]:
+        """
+        Кодирует запросы и ищет их в индексе в составе общего батча.
+
+        Args:
+            queries (List[str]): Тексты запросов одного вопроса
+            top_k (int): Сколько результатов нужно на каждый запрос
+            index: FAISS индекс снимка движка, по которому строится ответ
+                (None - текущий индекс движка)
+
+        Returns:
+            Tuple[np.ndarray, tuple]: Эмбеддинги запросов и (distances, indices) для них
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((queries, top_k, index if index is not None else self.engine.index, future))
+        return await future
+
+    async def _collect(self) -> list:
+        """Ждет первый запрос, затем добирает батч до max_batch_size или max_wait."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _encode_and_search(self, batch: list) -> List[Tuple[np.ndarray, tuple]]:
+        texts = [text for queries, _, _, _ in batch for text in queries]
+        embeddings = np.asarray(self.engine.encode(texts), dtype=np.float32)
+
+        # Строки батча по индексам: во время перезагрузки запросы могут относиться
+        # к снимкам разных версий, и каждый ищется в индексе своего снимка
+        rows_by_index: Dict[int, list] = {}
+        offset = 0
+        for item_number, (queries, _, index, _) in enumerate(batch):
+            rows_by_index.setdefault(id(index), []).append((item_number, offset, offset + len(queries)))
+            offset += len(queries)
+
+        results = [None] * len(batch)
+        for items in rows_by_index.values():
+            index = batch[items[0][0]][2]
+            rows = np.concatenate([np.arange(start, end) for _, start, end in items])
+            top_k = max(batch[item_number][1] for item_number, _, _ in items)
+            distances, indices = index.search(embeddings[rows], top_k)
+            position = 0
+            for item_number, start, end in items:
+                k = batch[item_number][1]
+                found = slice(position, position + end - start)
+                position += end - start
+                results[item_number] = (embeddings[start:end], (distances[found, :k], indices[found, :k]))
+        return results
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            try:
+                results = await loop.run_in_executor(self.executor, self._encode_and_search, batch)
+            except Exception as error:
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.batches += 1
+            self.texts += sum(len(queries) for queries, _, _, _ in batch)
+            for (_, _, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Счетчики батчей."""
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+        }
+
+
+class LegalQuestionService:
+    """
+    HTTP сервис поверх LegalAssistant с микробатчингом кодирования и поиска.
+    """
+
+    def __init__(self, assistant: LegalAssistant, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            assistant (LegalAssistant): Загруженный ассистент
+            max_batch_size (int): Максимальное число текстов в батче модели
+            max_wait_ms (float): Максимальное ожидание батча после первого запроса, мс
+        """
+        self.assistant = assistant
+        self.batcher = MicroBatcher(assistant.engine, max_batch_size, max_wait_ms)
+        self.requests = 0
+
+    async def answer(self, question: str) -> str:
+        """
+        Отвечает на вопрос; кодирование и поиск по индексу идут общим батчем.
+
+        Args:
+            question (str): Вопрос пользователя
+
+        Returns:
+            str: Ответ ассистента
+        """
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        # План держит снимок движка: поиск в индексе, текстовый поиск и соседи
+        # чанков идут по одной версии данных, даже если между ними пришел SIGHUP
+        plan = self.assistant.plan_answer(question)
+        if plan.answer is not None:
+            return plan.answer
+
+        embeddings = hits = None
+        if plan.queries:
+            embeddings, hits = await self.batcher.search(plan.queries, self.assistant.top_k, plan.engine.index)
+        # Текстовый поиск и форматирование - тоже в потоке, чтобы не задерживать цикл событий;
+        # с готовыми эмбеддингами complete_answer модель не вызывает
+        return await loop.run_in_executor(None, self.assistant.complete_answer, plan, embeddings, hits)
+
+    async def reload(self) -> None:
+        """
+        Перечитывает чанки и индексы (по SIGHUP) в потоке модели, чтобы загрузка
+        не задерживала цикл событий. Запросы, начатые до перезагрузки, дочитывают
+        свой снимок данных (см. LegalAssistant.plan_answer).
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            changed = await loop.run_in_executor(self.batcher.executor, self.assistant.reload)
+        except Exception:
+            logger.exception("Не удалось перезагрузить данные, остаются прежние")
+            return
+        status = "новая версия" if changed else "версия не изменилась"
+        print(f"Данные перезагружены (pid {os.getpid()}): {status} {self.assistant.engine.version}")
+
+    def stats(self) -> Dict:
+        """Счетчики запросов, батчей и кэшей."""
+        stats = {"requests": self.requests, **self.batcher.stats(),
+                 "query_cache": self.assistant.query_cache.stats()}
+        if self.assistant.semantic_cache is not None:
+            stats["semantic_cache"] = self.assistant.semantic_cache.stats()
+        return stats
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """
+        Обрабатывает запрос к эндпоинту.
+
+        Args:
+            method (str): HTTP метод
+            path (str): Путь запроса
+            body (bytes): Тело запроса
+
+        Returns:
+            Tuple[int, Dict]: HTTP статус и JSON ответ
+        """
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, self.stats()
+        if path != "/legal_question":
+            return 404, {"error": "Неизвестный путь"}
+        if method != "POST":
+            return 405, {"error": "Используйте POST"}
+
+        try:
+            question = json.loads(body.decode("utf-8")).get("question")
+        except (UnicodeDecodeError, ValueError, AttributeError):
+            question = None
+        if not isinstance(question, str) or not question.strip():
+            return 400, {"error": "Ожидается JSON с полем question"}
+        return 200, {"question": question, "answer": await self.answer(question)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обслуживает одно соединение (HTTP/1.1 с keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Неверный запрос"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "Неверный Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "Слишком большой запрос"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self.route(method, path.split("?", 1)[0], body)
+                except Exception:
+                    # Подробности ошибки - только в журнал сервера, не клиенту
+                    logger.exception("Ошибка обработки запроса %s %s", method, path)
+                    status, payload = 500, {"error": "Внутренняя ошибка сервера"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000, sock=None) -> None:
+        """
+        Запускает сервис и обслуживает запросы до отмены.
+
+        Args:
+            host (str): Адрес
+            port (int): Порт
+            sock: Уже открытый слушающий сокет (вместо host и port)
+        """
+        self.batcher.start()
+        loop = asyncio.get_running_loop()
+        reloads = set()
+
+        def schedule_reload() -> None:
+            task = loop.create_task(self.reload())
+            reloads.add(task)
+            task.add_done_callback(reloads.discard)
+
+        loop.add_signal_handler(signal.SIGHUP, schedule_reload)
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def _run_worker(service: LegalQuestionService, sock: socket.socket) -> None:
+    """Тело процесса-обработчика после fork."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Обработчик SIGHUP главного процесса не нужен; свой ставит serve
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # Соединение SQLite главного процесса нельзя использовать после fork
+    service.assistant.query_cache.reopen()
+    try:
+        asyncio.run(service.serve(sock=sock))
+    finally:
+        os._exit(0)
+
+
+def serve_workers(service: LegalQuestionService, host: str, port: int, workers: int) -> None:
+    """
+    Запускает несколько процессов-обработчиков на одном слушающем сокете (pre-fork).
+
+    Сервис (модель, чанки, индексы) должен быть загружен до вызова: процессы
+    получают его через fork и делят страницы памяти с главным процессом.
+    Упавший обработчик перезапускается; SIGINT/SIGTERM останавливают все процессы.
+    SIGHUP перечитывает данные в главном процессе (для перезапускаемых
+    обработчиков) и пересылается обработчикам.
+
+    Args:
+        service (LegalQuestionService): Загруженный сервис
+        host (str): Адрес
+        port (int): Порт
+        workers (int): Число процессов-обработчиков
+    """
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.setblocking(False)
+
+    # Объекты, созданные при загрузке, больше не просматриваются сборщиком мусора,
+    # иначе он трогает их заголовки и страницы копируются в каждый процесс
+    gc.collect()
+    gc.freeze()
+
+    children = set()
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(service, sock)
+        children.add(pid)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload(signum, frame) -> None:
+        try:
+            service.assistant.reload()
+        except Exception:
+            logger.exception("Не удалось перезагрузить данные в главном процессе")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, reload)
+    for _ in range(workers):
+        spawn()
+    print(f"Запущено обработчиков: {workers} (pid {', '.join(str(pid) for pid in sorted(children))})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"Обработчик {pid} завершился (статус {status}), запускаю новый")
+            spawn()
+    sock.close()
+
+
+def limit_threads(threads: int) -> None:
+    """
+    Ограничивает потоки torch и FAISS в процессе.
+
+    Нужно до загрузки модели в режиме нескольких процессов: процессы и так
+    занимают все ядра, а пул потоков OpenMP, созданный до fork, в дочернем
+    процессе не работает.
+    """
+    import faiss
+    import torch
+
+    torch.set_num_threads(threads)
+    faiss.omp_set_num_threads(threads)
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Аргументы командной строки для загрузки ассистента и настройки батчей."""
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--chunks", default="output/penal_code_chunks.json", help="Файл чанков (режим JSON)")
+    parser.add_argument("--index", default="output/penal_code.index", help="FAISS индекс (режим JSON)")
+    parser.add_argument("--artifacts", help="Каталог артефактов serving_artifacts.py (быстрый старт через mmap)")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Максимум текстов в батче модели")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Ожидание батча после первого запроса, мс")
+    parser.add_argument("--cache-path", help="Файл SQLite для кэша ответов")
+    parser.add_argument("--semantic-threshold", type=float, default=0.92,
+                        help="Косинусная близость для семантического кэша ответов")
+    parser.add_argument("--no-semantic-cache", action="store_true", help="Не использовать семантический кэш")
+    parser.add_argument("--workers", type=int, default=1, help="Число процессов-обработчиков (pre-fork)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Потоков torch/FAISS на процесс в режиме нескольких обработчиков")
+
+
+def load_assistant(args: argparse.Namespace) -> LegalAssistant:
+    """Загружает поисковый движок и ассистента по аргументам командной строки."""
+    engine = SearchEngine(args.chunks, args.index, args.model, artifacts_dir=args.artifacts)
+    return LegalAssistant(engine=engine, cache_path=args.cache_path,
+                          semantic_threshold=None if args.no_semantic_cache else args.semantic_threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP сервис юридического ассистента")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        limit_threads(args.threads)
+    try:
+        assistant = load_assistant(args)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        exit(1)
+    service = LegalQuestionService(assistant, args.max_batch_size, args.max_wait_ms)
+    print(f"Сервис слушает http://{args.host}:{args.port}/legal_question "
+          f"(батч до {args.max_batch_size}, ожидание {args.max_wait_ms} мс)")
+    if args.workers > 1:
+        serve_workers(service, args.host, args.port, args.workers)
+    else:
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,207 @@
+"""
+Артефакты для быстрого запуска поиска: memory-mapped чанки, индексы и векторы
+
+Вместо разбора большого penal_code_chunks.json и чтения FAISS индекса в
+собственную память процесса поисковый движок открывает каталог артефактов:
+- text.bin       - тексты всех чанков подряд в UTF-8
+- articles.bin   - номера статей чанков через запятую, тоже подряд
+- meta.npy       - по строке на чанк: группа, chunk_index, chunk_id и смещения в .bin
+- groups.json    - уникальные тройки (libro, titulo, capitulo)
+- index.faiss    - FAISS индекс, открывается с флагами mmap
+- lexical/       - массивы инвертированного индекса (lexical_index.py)
+- articles.json  - индекс "номер статьи -> чанки" (article_index.py)
+- manifest.json  - версия артефактов и число чанков
+
+Все большие файлы отображаются в память только для чтения, поэтому несколько
+процессов-обработчиков делят одни и те же страницы через page cache.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from typing import Dict, Iterator, List, Sequence
+
+import faiss
+import numpy as np
+
+from article_index import ArticleIndex
+from chunking import chunk_id
+from lexical_index import LexicalIndex
+
+META_DTYPE = np.dtype([
+    ("group", np.int32),
+    ("chunk_index", np.int32),
+    ("chunk_id", np.int64),
+    ("text_start", np.int64),
+    ("text_end", np.int64),
+    ("articles_start", np.int64),
+    ("articles_end", np.int64),
+])
+
+# Флаг mmap для плоских индексов появился в новых версиях FAISS, в старых есть только общий
+FAISS_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def export_serving_artifacts(chunks: List[Dict], index_path: str, output_dir: str = "output/serving") -> str:
+    """
+    Записывает чанки и индексы в формат для memory-mapped загрузки.
+
+    Args:
+        chunks (List[Dict]): Чанки (как в penal_code_chunks.json)
+        index_path (str): Путь к FAISS индексу, построенному по этим чанкам
+        output_dir (str): Каталог артефактов
+
+    Returns:
+        str: Версия артефактов (хэш содержимого)
+
+    Raises:
+        ValueError: Если индекс построен не по этим чанкам (другое число векторов)
+    """
+    index_size = faiss.read_index(index_path, FAISS_MMAP_FLAGS).ntotal
+    if index_size != len(chunks):
+        raise ValueError(
+            f"Индекс {index_path} построен по {index_size} чанкам, а передано {len(chunks)}; "
+            f"пересоберите индекс (generator.py)"
+        )
+    os.makedirs(output_dir, exist_ok=True)
+
+    groups: Dict[tuple, int] = {}
+    meta = np.zeros(len(chunks), dtype=META_DTYPE)
+    version = hashlib.sha256()
+    text_offset = 0
+    articles_offset = 0
+
+    with open(os.path.join(output_dir, "text.bin"), "wb") as text_file, \
+            open(os.path.join(output_dir, "articles.bin"), "wb") as articles_file:
+        for position, chunk in enumerate(chunks):
+            group_key = (chunk["libro"], chunk["titulo"], chunk["capitulo"])
+            text = chunk["text"].encode("utf-8")
+            articles = ",".join(chunk.get("article_numbers", [])).encode("utf-8")
+
+            meta[position] = (
+                groups.setdefault(group_key, len(groups)),
+                chunk["chunk_index"],
+                chunk_id(chunk),
+                text_offset, text_offset + len(text),
+                articles_offset, articles_offset + len(articles),
+            )
+            text_file.write(text)
+            articles_file.write(articles)
+            text_offset += len(text)
+            articles_offset += len(articles)
+
+            version.update("|".join(group_key).encode("utf-8"))
+            version.update(articles)
+            version.update(text)
+
+    np.save(os.path.join(output_dir, "meta.npy"), meta)
+    with open(os.path.join(output_dir, "groups.json"), "w", encoding="utf-8") as f:
+        json.dump([list(key) for key in groups], f, ensure_ascii=False)
+
+    shutil.copyfile(index_path, os.path.join(output_dir, "index.faiss"))
+    with open(index_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            version.update(block)
+
+    LexicalIndex([chunk["text"] for chunk in chunks]).save(os.path.join(output_dir, "lexical"))
+    ArticleIndex.from_chunks(chunks).save(os.path.join(output_dir, "articles.json"))
+
+    manifest = {"version": version.hexdigest()[:16], "chunk_count": len(chunks)}
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest["version"]
+
+
+class MappedChunks(Sequence):
+    """
+    Список чанков поверх memory-mapped файлов.
+
+    Элементы - обычные словари того же вида, что в penal_code_chunks.json;
+    текст чанка декодируется только при обращении к нему.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Каталог артефактов
+        """
+        self.meta = np.load(os.path.join(directory, "meta.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "groups.json"), "r", encoding="utf-8") as f:
+            self.groups = [tuple(group) for group in json.load(f)]
+        self.text = _map_file(os.path.join(directory, "text.bin"))
+        self.articles = _map_file(os.path.join(directory, "articles.bin"))
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        row = self.meta[position]
+        libro, titulo, capitulo = self.groups[row["group"]]
+        articles = self.articles[row["articles_start"]:row["articles_end"]].decode("utf-8")
+        return {
+            "libro": libro,
+            "titulo": titulo,
+            "capitulo": capitulo,
+            "article_numbers": articles.split(",") if articles else [],
+            "chunk_index": int(row["chunk_index"]),
+            "chunk_id": int(row["chunk_id"]),
+            "text": self.text[row["text_start"]:row["text_end"]].decode("utf-8"),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def chunk_ids(self) -> np.ndarray:
+        """Идентификаторы чанков в порядке позиций, без декодирования текстов."""
+        return self.meta["chunk_id"]
+
+
+def _map_file(path: str):
+    """Отображает файл в память только для чтения (пустой файл - пустые байты)."""
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ServingArtifacts:
+    """
+    Открытый каталог артефактов: чанки, FAISS индекс, лексический и статейный индексы.
+    """
+
+    def __init__(self, directory: str = "output/serving"):
+        """
+        Args:
+            directory (str): Каталог, созданный export_serving_artifacts
+        """
+        manifest_path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Артефакты для поиска не найдены: {directory}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.directory = directory
+        self.version = manifest["version"]
+        self.index_path = os.path.join(directory, "index.faiss")
+        self.chunks = MappedChunks(directory)
+        self.index = faiss.read_index(self.index_path, FAISS_MMAP_FLAGS)
+        self.lexical_index = LexicalIndex.load(os.path.join(directory, "lexical"))
+        self.article_index = ArticleIndex.load(os.path.join(directory, "articles.json"))
+
+
+if __name__ == "__main__":
+    from search import load_chunks
+
+    chunks_file = "output/penal_code_chunks.json"
+    index_path = "output/penal_code.index"
+    output_dir = "output/serving"
+
+    print(f"Загрузка чанков из {chunks_file}...")
+    chunks = load_chunks(chunks_file)
+    version = export_serving_artifacts(chunks, index_path, output_dir)
+    print(f"Артефакты для поиска сохранены в {output_dir} (версия {version}, {len(chunks)} чанков)")
@@ -0,0 +1,304 @@
+"""
+Однопроходный разбор структуры очищенного текста кодекса
+
+Токенизатор одним проходом регулярного выражения по тексту находит все
+структурные заголовки (TÍTULO PRELIMINAR, LIBRO, TÍTULO, CAPÍTULO, Sección,
+Artículo) и выдает их как события со смещениями. Иерархия строится по этим
+событиям: границы разделов и тексты статей вычисляются по смещениям через
+bisect, без повторного поиска регулярными выражениями в срезах текста.
+
+Результат parse_structure совпадает со структурой, которую строят
+find_subsections и extract_articles из best_attempt.py.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from document_model import CAPITULO as CAPITULO_NODE
+from document_model import PRELIMINAR_SECTION, SECTION, SpanDocument
+from document_model import TITULO as TITULO_NODE
+
+# Номер статьи с латинским суффиксом вставленной статьи ("31 bis", "172 quáter"):
+# суффикс входит в номер, иначе вставленная статья заменяет основную с тем же числом
+ARTICLE_NUMBER = r'\d+(?:[ \t]+(?:bis|ter|qu[aá]ter|quinquies|sexies|septies|octies|nonies|decies)\b)?'
+
+# Суффикс вставленного título/capítulo ("TÍTULO VII BIS"): без него вставленный
+# раздел получает название основного и заменяет его текст
+SECTION_SUFFIX = r'(?:[ \t]+(?:BIS|TER|QU[AÁ]TER)\b)?'
+
+# Одно выражение для всех заголовков; виды заголовков не пересекаются по тексту
+STRUCTURE_PATTERN = re.compile(
+    r'(?P<preliminar>TÍTULO PRELIMINAR)'
+    r'|(?P<libro>LIBRO (?:III|II|I)\b)'
+    rf'|(?P<titulo>TÍTULO\s+(?:PRIMERO|[IVX]+){SECTION_SUFFIX})'
+    rf'|(?P<capitulo>CAPÍTULO\s+(?:PRIMERO|[IVX]+){SECTION_SUFFIX})'
+    r'|(?P<seccion>^Sección\s+\d+\.ª)'
+    rf'|(?P<articulo>Artículo\s+(?P<number>{ARTICLE_NUMBER}))',
+    re.MULTILINE,
+)
+
+# Каждый заголовок начинается с одного из ключевых слов; поиск литералов намного
+# быстрее перебора альтернатив STRUCTURE_PATTERN в каждой позиции текста
+KEYWORD_PATTERN = re.compile(r'TÍTULO|LIBRO|CAPÍTULO|Sección|Artículo')
+
+ARTICLE_HEADER_PATTERN = re.compile(rf'Artículo\s+({ARTICLE_NUMBER})')
+
+PRELIMINAR = "preliminar"
+LIBRO = "libro"
+TITULO = "titulo"
+CAPITULO = "capitulo"
+SECCION = "seccion"
+ARTICULO = "articulo"
+
+
+class StructureEvent(NamedTuple):
+    """Найденный структурный заголовок."""
+    kind: str    # один из PRELIMINAR, LIBRO, TITULO, CAPITULO, SECCION, ARTICULO
+    label: str   # текст заголовка ("TÍTULO I") или номер статьи ("138", "31 bis")
+    start: int   # смещение начала заголовка в тексте
+    end: int     # смещение конца заголовка
+
+
+def tokenize_structure(text: str) -> List[StructureEvent]:
+    """
+    Находит все структурные заголовки за один проход по тексту.
+
+    Args:
+        text (str): Очищенный текст кодекса
+
+    Returns:
+        List[StructureEvent]: События в порядке появления в тексте
+    """
+    events = []
+    last_end = 0
+    for keyword in KEYWORD_PATTERN.finditer(text):
+        if keyword.start() < last_end:
+            continue
+        match = STRUCTURE_PATTERN.match(text, keyword.start())
+        if match is None:
+            continue
+        last_end = match.end()
+        kind = match.lastgroup
+        label = match.group("number") if kind == ARTICULO else match.group()
+        events.append(StructureEvent(kind, label, match.start(), match.end()))
+    return events
+
+
+def article_spans(text: str, headers: List[StructureEvent], header_starts: List[int],
+                  start: int, end: int) -> List[Tuple[str, int, int]]:
+    """
+    Делит диапазон текста на статьи по заранее найденным заголовкам "Artículo N".
+
+    Тело статьи начинается со строки после заголовка и продолжается до
+    следующего заголовка или до конца диапазона; заголовок без перевода строки
+    до конца диапазона пропускается. Результат совпадает с прежним выражением
+    Artículo\\s+(\\d+)[^\\n]*\\n((?:(?!Artículo\\s+\\d+)[^\\n]|\\n)*), но каждый
+    символ тела просматривается не более одного раза.
+
+    Args:
+        text (str): Текст документа
+        headers (List[StructureEvent]): Заголовки статей по порядку
+        header_starts (List[int]): Смещения начала заголовков (для bisect)
+        start (int): Начало диапазона
+        end (int): Конец диапазона
+
+    Returns:
+        List[Tuple[str, int, int]]: (номер статьи, начало тела, конец тела)
+    """
+    spans = []
+    position = start
+    i = bisect_left(header_starts, start)
+    while i < len(headers):
+        header = headers[i]
+        if header.end > end:
+            break
+        if header.start < position:
+            i += 1
+            continue
+        newline = text.find("\n", header.end, end)
+        if newline == -1:
+            i += 1
+            continue
+        body_start = newline + 1
+        # Следующий заголовок статьи, начинающийся не раньше тела
+        j = bisect_left(header_starts, body_start, i + 1)
+        if j < len(headers) and headers[j].end <= end:
+            body_end = headers[j].start
+        else:
+            body_end = end
+        spans.append((header.label, body_start, body_end))
+        position = body_end
+        i = j
+    return spans
+
+
+def split_articles(text: str) -> Dict[str, str]:
+    """
+    Делит текст на статьи: заголовки находятся один раз, тела - срезы между ними.
+
+    Args:
+        text (str): Текст раздела
+
+    Returns:
+        Dict[str, str]: Статьи (номер: текст); при повторе номера побеждает последняя
+    """
+    headers = [StructureEvent(ARTICULO, match.group(1), match.start(), match.end())
+               for match in ARTICLE_HEADER_PATTERN.finditer(text)]
+    spans = article_spans(text, headers, [header.start for header in headers], 0, len(text))
+    return {number: text[body_start:body_end].strip() for number, body_start, body_end in spans}
+
+
+class StructureParser:
+    """
+    Строит иерархию документа по событиям токенизатора.
+    """
+
+    def __init__(self, text: str, events: Optional[List[StructureEvent]] = None):
+        """
+        Args:
+            text (str): Очищенный текст кодекса
+            events (Optional[List[StructureEvent]]): Готовые события (иначе токенизируется text)
+        """
+        self.text = text
+        self.events = events if events is not None else tokenize_structure(text)
+        self.by_kind: Dict[str, List[StructureEvent]] = {}
+        for event in self.events:
+            self.by_kind.setdefault(event.kind, []).append(event)
+        self.starts = {kind: [event.start for event in events] for kind, events in self.by_kind.items()}
+        self.articles = self.by_kind.get(ARTICULO, [])
+        self.article_starts = self.starts.get(ARTICULO, [])
+
+    def _events_in(self, kind: str, start: int, end: int) -> List[StructureEvent]:
+        """События вида kind, целиком лежащие в диапазоне [start, end)."""
+        events = self.by_kind.get(kind, [])
+        found = []
+        for i in range(bisect_left(self.starts.get(kind, []), start), len(events)):
+            if events[i].end > end:
+                break
+            found.append(events[i])
+        return found
+
+    def main_sections(self) -> Dict[str, int]:
+        """
+        Позиции основных секций: первое вхождение TÍTULO PRELIMINAR и каждой LIBRO.
+
+        Returns:
+            Dict[str, int]: Название секции -> смещение
+        """
+        sections: Dict[str, int] = {}
+        for event in self.events:
+            if event.kind in (PRELIMINAR, LIBRO) and event.label not in sections:
+                sections[event.label] = event.start
+        return dict(sorted(sections.items(), key=lambda item: item[1]))
+
+    def article_spans(self, start: int, end: int) -> List[Tuple[str, int, int]]:
+        """
+        Статьи внутри диапазона текста (см. article_spans).
+
+        Args:
+            start (int): Начало диапазона
+            end (int): Конец диапазона
+
+        Returns:
+            List[Tuple[str, int, int]]: (номер статьи, начало тела, конец тела)
+        """
+        return article_spans(self.text, self.articles, self.article_starts, start, end)
+
+    def articles_in(self, start: int, end: int) -> Dict[str, str]:
+        """
+        Словарь статей диапазона (номер: текст); при повторе номера побеждает последняя.
+
+        Args:
+            start (int): Начало диапазона
+            end (int): Конец диапазона
+
+        Returns:
+            Dict[str, str]: Статьи диапазона
+        """
+        return {number: self.text[body_start:body_end].strip()
+                for number, body_start, body_end in self.article_spans(start, end)}
+
+    def _add_articles(self, document: SpanDocument, start: int, end: int, parent: int) -> None:
+        """Добавляет статьи диапазона; при повторе номера остается место первой и тело последней."""
+        bodies: Dict[str, Tuple[int, int]] = {}
+        for number, body_start, body_end in self.article_spans(start, end):
+            bodies[number] = (body_start, body_end)
+        for number, (body_start, body_end) in bodies.items():
+            document.add_article(number, body_start, body_end, parent)
+
+    def build_document(self) -> SpanDocument:
+        """
+        Строит документ на смещениях: секции, títulos, capítulos и статьи.
+
+        Статьи добавляются и к título (из всего его текста), и к каждому capítulo,
+        как в прежнем разборе; тексты при этом не копируются.
+
+        Returns:
+            SpanDocument: Документ
+        """
+        text = self.text
+        document = SpanDocument(text)
+        sections = list(self.main_sections().items())
+        for i, (section_name, section_start) in enumerate(sections):
+            section_end = sections[i + 1][1] if i < len(sections) - 1 else len(text)
+            section = document.add(SECTION, section_name, section_start, section_end)
+            if section_name == PRELIMINAR_SECTION:
+                self._add_articles(document, section_start, section_end, section)
+                continue
+
+            # Повторяющееся название título заменяет содержимое первого (место в словаре сохраняется),
+            # поэтому диапазоны собираются заранее и разбираются только оставшиеся
+            titulo_ranges = _label_ranges(self._events_in(TITULO, section_start, section_end), section_end)
+            for titulo_label, (titulo_start, titulo_end) in titulo_ranges.items():
+                titulo = document.add(TITULO_NODE, titulo_label, titulo_start, titulo_end, section)
+                capitulo_ranges = _label_ranges(self._events_in(CAPITULO, titulo_start, titulo_end), titulo_end)
+                for capitulo_label, (capitulo_start, capitulo_end) in capitulo_ranges.items():
+                    capitulo = document.add(CAPITULO_NODE, capitulo_label, capitulo_start, capitulo_end, titulo)
+                    self._add_articles(document, capitulo_start, capitulo_end, capitulo)
+                self._add_articles(document, titulo_start, titulo_end, titulo)
+        return document
+
+    def parse(self) -> dict:
+        """
+        Строит иерархическую структуру документа со статьями.
+
+        Returns:
+            dict: Структура вида {секция: {título: {"text", "capitulos", "articles"}}},
+            для TÍTULO PRELIMINAR - {"text", "articles"}
+        """
+        return self.build_document().to_structure()
+
+
+def _label_ranges(events: List[StructureEvent], end: int) -> Dict[str, Tuple[int, int]]:
+    """Диапазоны [начало заголовка, начало следующего) по названиям; повтор названия заменяет диапазон."""
+    ranges: Dict[str, Tuple[int, int]] = {}
+    for i, event in enumerate(events):
+        ranges[event.label] = (event.start, events[i + 1].start if i < len(events) - 1 else end)
+    return ranges
+
+
+def build_document(text: str) -> SpanDocument:
+    """
+    Разбирает очищенный текст кодекса в документ на смещениях.
+
+    Args:
+        text (str): Очищенный текст кодекса
+
+    Returns:
+        SpanDocument: Документ
+    """
+    return StructureParser(text).build_document()
+
+
+def parse_structure(text: str) -> dict:
+    """
+    Разбирает очищенный текст кодекса в иерархическую структуру со статьями.
+
+    Args:
+        text (str): Очищенный текст кодекса
+
+    Returns:
+        dict: Структура документа (как у best_attempt.extract_articles)
+    """
+    return StructureParser(text).parse()
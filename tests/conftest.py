@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Модули проекта лежат в корне репозитория
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,65 @@
+from article_diff import ADDED, MODIFIED, MOVED, REMOVED, diff_article_tables, update_chunks
+from article_table import ArticleTable
+from chunking import chunk_id, create_final_chunks
+from group import group_articles_by_capitulo
+
+G1 = ("LIBRO I", "TÍTULO I", "CAPÍTULO I")
+G2 = ("LIBRO I", "TÍTULO I", "CAPÍTULO II")
+G3 = ("LIBRO II", "TÍTULO I", "CAPÍTULO I")
+
+
+def row(group, number, text):
+    libro, titulo, capitulo = group
+    return {"libro": libro, "titulo": titulo, "capitulo": capitulo, "article_number": number, "text": text}
+
+
+OLD = ArticleTable([
+    row(G1, "1", "El que matare a otro."),
+    row(G1, "2", "Pena de prisión de diez años."),
+    row(G2, "3", "El que causare lesiones."),
+    row(G2, "5", "Se castigará la tentativa."),
+    row(G3, "7", "El que robare."),
+])
+NEW = ArticleTable([
+    row(G1, "1", "El que  matare\na otro."),          # только пробелы
+    row(G1, "2", "Pena de prisión de quince años."),   # изменен текст
+    row(G2, "5", "Se castigará la tentativa."),        # 3 удалена
+    row(G3, "7", "El que robare."),
+    row(G3, "8", "El que hurtare."),                   # добавлена
+])
+
+
+def build_chunks(table):
+    return create_final_chunks(group_articles_by_capitulo(table))
+
+
+def test_diff_categories_and_groups():
+    change_set = diff_article_tables(OLD, NEW)
+    assert change_set.changes[MODIFIED] == ["2"]
+    assert change_set.changes[REMOVED] == ["3"]
+    assert change_set.changes[ADDED] == ["8"]
+    assert change_set.changes[MOVED] == []
+    assert change_set.affected_groups() == {G1, G2, G3}
+    assert diff_article_tables(OLD, OLD).is_empty()
+
+
+def test_moved_article_touches_both_groups():
+    moved = ArticleTable([row(G1, "1", "El que matare a otro."), row(G2, "2", "Pena de prisión de diez años.")])
+    original = ArticleTable([row(G1, "1", "El que matare a otro."), row(G1, "2", "Pena de prisión de diez años.")])
+    change_set = diff_article_tables(original, moved)
+    assert change_set.changes[MOVED] == ["2"]
+    assert change_set.affected_groups() == {G1, G2}
+
+
+def test_update_chunks_rebuilds_only_affected_groups():
+    old_chunks = build_chunks(OLD)
+    new_only = ArticleTable([row for row in NEW if row["article_number"] != "8"])
+    change_set = diff_article_tables(OLD, new_only)
+    assert change_set.affected_groups() == {G1, G2}
+
+    all_chunks, new_chunks, removed_ids = update_chunks(old_chunks, new_only, change_set)
+    assert [chunk["text"] for chunk in all_chunks] == [chunk["text"] for chunk in build_chunks(new_only)]
+    assert {(chunk["libro"], chunk["titulo"], chunk["capitulo"]) for chunk in new_chunks} == {G1, G2}
+    assert sorted(removed_ids) == sorted(chunk_id(chunk) for chunk in old_chunks if chunk["libro"] == "LIBRO I")
+    # Чанки незатронутой группы переиспользуются как есть
+    assert all_chunks[-1] is old_chunks[-1]
@@ -0,0 +1,105 @@
+import numpy as np
+
+from article_index import (
+    ArticleIndex, article_index_path, load_or_build_article_index, normalize_article_number,
+    parse_article_range,
+)
+from legal_bot import LegalAssistant
+from search import extract_article_number
+
+
+def make_index():
+    chunks = [
+        {"text": "Artículo 138. Artículo 139.", "article_numbers": ["138", "139"]},
+        {"text": "Artículo 140. Artículo 140 bis.", "article_numbers": ["140", "140 bis"]},
+        {"text": "Artículo 616 quáter.", "article_numbers": ["616 quáter"]},
+    ]
+    return ArticleIndex.from_chunks(chunks)
+
+
+def test_single_and_suffix_lookup():
+    index = make_index()
+    assert index.lookup("artículo 138") == [0]
+    assert index.lookup("140 BIS") == [1]
+    assert index.lookup("57 bis") == []
+    assert index.lookup("138 bis") == []
+    assert index.lookup("616 quater") == [2]
+    assert normalize_article_number("616 quáter") == "616 quater"
+
+
+def test_range_lookup_includes_suffixes():
+    index = make_index()
+    assert index.lookup("138-140") == [0, 1]
+    assert index.lookup("139 a 616") == [0, 1, 2]
+    assert parse_article_range("140-138") is None
+
+
+class CountingDict(dict):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.reads = 0
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return super().__getitem__(key)
+
+
+def test_huge_range_is_not_expanded():
+    index = make_index()
+    index.variants = CountingDict(index.variants)
+    assert index.lookup("artículo 1-20000000") == [0, 1, 2]
+    assert index.lookup("artículo 141-20000000") == [2]
+    # Читаются только номера из индекса, попавшие в диапазон
+    assert index.variants.reads == 4 + 1
+
+
+def test_question_keeps_quater_suffix():
+    assert extract_article_number("¿Qué dice el artículo 616 quáter?") == "616 quáter"
+    assert extract_article_number("artículo 57 BIS") == "57 bis"
+
+
+class ArticleEngine:
+    """Движок, где есть только статья 57, а семантический поиск всегда находит ее."""
+
+    chunks = []
+    index_path = "test.index"
+    model_name = "test"
+    version = "v1"
+
+    def warm_up(self):
+        pass
+
+    def snapshot(self):
+        return self
+
+    def encode(self, texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    def search_by_article(self, reference):
+        return []
+
+    def search(self, question, top_k=5, embedding=None, hits=None):
+        return [{"libro": "LIBRO I", "titulo": "TÍTULO III", "capitulo": "", "article_numbers": ["57"],
+                 "text": "Artículo 57. Los jueces o tribunales", "relevance_score": 90.0}]
+
+    def expand_with_neighbors(self, results, window=1, max_chars=None):
+        return results
+
+
+def test_missing_suffixed_article_is_labelled():
+    answer = LegalAssistant(engine=ArticleEngine()).answer_question("artículo 57 bis")
+    assert "Статья 57 bis в Уголовном кодексе не найдена" in answer
+    assert "о статье 57 bis" not in answer
+
+
+def test_saved_index_rebuilt_when_chunks_change(tmp_path):
+    chunks_file = str(tmp_path / "chunks.json")
+    chunks = [{"text": "Artículo 138", "article_numbers": ["138"]},
+              {"text": "Artículo 139", "article_numbers": ["139"]}]
+    ArticleIndex.from_chunks(chunks).save(article_index_path(chunks_file))
+    assert load_or_build_article_index(chunks, chunks_file).lookup("139") == [1]
+
+    # Столько же чанков, но другое содержимое
+    changed = [{"text": "Artículo 139", "article_numbers": ["139"]},
+               {"text": "Artículo 138", "article_numbers": ["138"]}]
+    assert load_or_build_article_index(changed, chunks_file).lookup("139") == [0]
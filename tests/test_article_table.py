@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from article_table import ArticleTable
+from conftest import ROOT
+from structure_parser import ARTICULO, STRUCTURE_PATTERN, StructureParser, split_articles
+
+
+@pytest.fixture(scope="module")
+def code_text():
+    with open(os.path.join(ROOT, "cleaned_text.txt"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def table(code_text):
+    return ArticleTable.from_document(StructureParser(code_text).build_document())
+
+
+def test_every_article_header_is_in_table(code_text, table):
+    headers = [event.label for event in StructureParser(code_text).events if event.kind == ARTICULO]
+    assert len(headers) == len(set(headers))
+    assert sorted(row["article_number"] for row in table) == sorted(headers)
+
+
+def test_inserted_articles_keep_suffix(table):
+    for number in ("471 bis", "570 quáter", "616 ter", "616 quáter", "174", "338"):
+        assert table.get(number) is not None, number
+    assert table.get("471")["text"] != table.get("471 bis")["text"]
+
+
+def test_no_article_text_lost(code_text, table):
+    # Текст статьи в таблице - тело статьи во всем тексте без заголовков
+    # título/capítulo, которые идут за последней статьей раздела
+    bodies = split_articles(code_text)
+    for row in table:
+        body = bodies[row["article_number"]]
+        assert body.startswith(row["text"]), row["article_number"]
+        rest = body[len(row["text"]):].strip()
+        assert not rest or STRUCTURE_PATTERN.match(rest), row["article_number"]
+
+
+def test_same_depth_duplicate_is_error():
+    row = {"libro": "LIBRO II", "titulo": "TÍTULO I", "capitulo": "CAPÍTULO I",
+           "article_number": "138", "text": "El que matare a otro"}
+    other = dict(row, capitulo="CAPÍTULO II", text="Otro texto")
+    with pytest.raises(ValueError):
+        ArticleTable.from_flat_list([row, other])
+
+
+def test_deepest_duplicate_wins():
+    titulo_row = {"libro": "LIBRO II", "titulo": "TÍTULO I", "capitulo": "",
+                  "article_number": "138", "text": "El que matare a otro"}
+    capitulo_row = dict(titulo_row, capitulo="CAPÍTULO I")
+    table = ArticleTable.from_flat_list([titulo_row, capitulo_row])
+    assert len(table) == 1
+    assert table.get("138")["capitulo"] == "CAPÍTULO I"
@@ -0,0 +1,66 @@
+"""
+Регрессия выделения статей на полном тексте кодекса.
+
+articles_baseline.json - отпечатки articles_for_embeddings.json, построенного
+исходной реализацией (регулярное выражение с lookahead, номера без суффиксов);
+articles_golden.json - отпечатки текущего результата. Оба файла не
+перезаписываются пайплайном, поэтому пересборка articles_for_embeddings.json
+не меняет эталон.
+"""
+
+import contextlib
+import io
+import json
+import os
+import re
+
+import pytest
+
+import best_attempt
+from conftest import ROOT
+
+DATA = os.path.join(ROOT, "tests", "data")
+SECTION_SUFFIX = re.compile(r" (?:BIS|TER|QU[AÁ]TER)$")
+
+
+@pytest.fixture(scope="module")
+def digests():
+    text_file = os.path.join(ROOT, "cleaned_text.txt")
+    with open(text_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sections = best_attempt.find_main_sections(text_file, text)
+        structure = best_attempt.find_subsections(best_attempt.extract_sections_text(text_file, sections, text))
+        flat_list = best_attempt.create_flat_structure(best_attempt.extract_articles(structure))
+    return best_attempt.article_digests(flat_list)
+
+
+def load(name):
+    with open(os.path.join(DATA, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_matches_golden(digests):
+    assert digests == load("articles_golden.json")
+
+
+def inserted_variant(row, number):
+    """Строка вставленной статьи ("31 bis") или статьи вставленного раздела ("TÍTULO VII BIS")."""
+    suffixed_number = row[3] != number and row[3].split()[0] == number
+    suffixed_section = row[3] == number and any(SECTION_SUFFIX.search(level) for level in row[1:3])
+    return suffixed_number or suffixed_section
+
+
+def test_baseline_articles_are_kept(digests):
+    current = {tuple(row[:4]): row[4] for row in digests}
+    by_text = {}
+    for row in digests:
+        by_text.setdefault(row[4], []).append(row)
+
+    for libro, titulo, capitulo, number, digest in load("articles_baseline.json"):
+        if current.get((libro, titulo, capitulo, number)) == digest:
+            continue
+        # Исходная реализация отдавала номеру текст вставленной статьи или раздела;
+        # этот текст теперь принадлежит им самим
+        assert any(inserted_variant(row, number) for row in by_text.get(digest, [])), \
+            (libro, titulo, capitulo, number)
@@ -0,0 +1,20 @@
+import io
+import json
+import os
+
+from article_table import ArticleTable
+from chunking import create_final_chunks
+from conftest import ROOT
+from group import group_articles_by_capitulo, iter_article_groups, write_groups
+
+
+def test_streamed_groups_give_same_chunks_and_file():
+    table = ArticleTable.load(os.path.join(ROOT, "articles_table.json"))
+    grouped = group_articles_by_capitulo(table)
+
+    f = io.StringIO()
+    streamed = create_final_chunks(write_groups(iter_article_groups(table), f))
+
+    assert streamed == create_final_chunks(grouped)
+    assert f.getvalue() == json.dumps(grouped, ensure_ascii=False, indent=2)
+    assert len({chunk["chunk_id"] for chunk in streamed}) == len(streamed)
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+def vectors_for(keys):
+    # Вектор однозначно определяется ключом, чтобы проверять строки после перезапуска
+    return np.array([[int(key) % 1000, int(key) // 1000] for key in keys], dtype=np.float32)
+
+
+def assert_consistent(cache_dir, max_entries=None):
+    cache = EmbeddingCache(cache_dir, "test", max_entries)
+    keys = list(cache.rows)
+    found, missing = cache.get_many(keys)
+    assert not missing
+    for position, key in enumerate(keys):
+        assert np.array_equal(found[position], vectors_for([key])[0]), key
+    return cache
+
+
+def test_eviction_without_save_keeps_saved_rows(tmp_path):
+    cache_dir = str(tmp_path)
+    cache = EmbeddingCache(cache_dir, "test", max_entries=4)
+    keys = [str(number) for number in range(4)]
+    cache.put_many(keys, vectors_for(keys))
+    cache.save()
+
+    # Новые записи вытесняют старые, но процесс падает до save
+    new_keys = [str(number) for number in range(100, 104)]
+    cache.put_many(new_keys, vectors_for(new_keys))
+    reopened = assert_consistent(cache_dir, 4)
+    assert sorted(reopened.rows) == sorted(keys)
+
+    # Save сжимает выросший файл обратно до max_entries строк
+    cache.save()
+    assert cache.capacity == 4
+    assert sorted(assert_consistent(cache_dir, 4).rows) == sorted(new_keys)
+    more = [str(number) for number in range(200, 204)]
+    cache.put_many(more, vectors_for(more))
+    cache.save()
+    assert cache.capacity == 4
+    assert sorted(assert_consistent(cache_dir, 4).rows) == sorted(more)
+
+
+def test_crash_during_compaction_keeps_old_file(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    cache = EmbeddingCache(cache_dir, "test")
+    keys = [str(number) for number in range(300)]
+    cache.put_many(keys, vectors_for(keys))
+    cache.save()
+
+    small = EmbeddingCache(cache_dir, "test", max_entries=10)
+    small.get_many(keys[-10:])
+
+    def crash(*args):
+        raise OSError("crash")
+    monkeypatch.setattr(embedding_cache.os, "replace", crash)
+    with pytest.raises(OSError):
+        small.save()
+    monkeypatch.undo()
+
+    assert len(assert_consistent(cache_dir).rows) == 300
+    assert os.listdir(cache_dir).count("vectors.1.f32") == 0
+
+    small = EmbeddingCache(cache_dir, "test", max_entries=10)
+    small.get_many(keys[-10:])
+    small.save()
+    compacted = assert_consistent(cache_dir, 10)
+    assert sorted(compacted.rows) == sorted(keys[-10:])
+    assert compacted.capacity == 10
+    assert sorted(name for name in os.listdir(cache_dir) if name.endswith(".f32")) == ["vectors.1.f32"]
+
+
+def test_empty_chunks_with_cache_give_empty_matrix(tmp_path, monkeypatch):
+    import generator
+
+    class DimensionModel:
+        def __init__(self, model_name):
+            pass
+
+        def get_sentence_embedding_dimension(self):
+            return 384
+    monkeypatch.setattr(generator, "SentenceTransformer", DimensionModel)
+    embeddings = generator.create_embeddings([], cache_dir=str(tmp_path))
+    assert embeddings.shape == (0, 384) and embeddings.dtype == np.float32
@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from lexical_index import LexicalIndex
+
+TEXTS = [
+    "La pena de prisión por homicidio",
+    "Las penas y el código penal",
+    "Artículo 138 homicidio homicidio",
+    "Artículo 13 robo",
+]
+
+
+def bm25(term, doc_id, texts=TEXTS, k1=1.5, b=0.75):
+    """BM25 одного точного термина, посчитанный напрямую по формуле."""
+    docs = [text.lower().split() for text in texts]
+    average = sum(len(doc) for doc in docs) / len(docs)
+    with_term = sum(1 for doc in docs if term in doc)
+    idf = math.log(1 + (len(docs) - with_term + 0.5) / (with_term + 0.5))
+    tf = docs[doc_id].count(term)
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(docs[doc_id]) / average))
+
+
+def test_bm25_scores_and_order():
+    results = LexicalIndex(TEXTS).search(["homicidio"])
+    assert [doc_id for doc_id, _ in results] == [2, 0]
+    for doc_id, score in results:
+        assert score == pytest.approx(bm25("homicidio", doc_id))
+
+
+def test_letter_terms_match_as_prefixes():
+    index = LexicalIndex(TEXTS)
+    assert sorted(doc_id for doc_id, _ in index.search(["pena"])) == [0, 1]
+    assert [index.vocabulary[term_id] for term_id in index.expand_term("pena")] == ["pena", "penal", "penas"]
+
+
+def test_number_terms_match_exactly():
+    index = LexicalIndex(TEXTS)
+    assert [doc_id for doc_id, _ in index.search(["13"])] == [3]
+    assert index.search(["1"]) == []
+
+
+def test_top_k_and_saved_index(tmp_path):
+    index = LexicalIndex(TEXTS)
+    assert len(index.search(["artículo", "pena"], top_k=2)) == 2
+    index.save(str(tmp_path))
+    assert LexicalIndex.load(str(tmp_path)).search(["pena", "13"]) == index.search(["pena", "13"])
@@ -0,0 +1,23 @@
+import fitz
+
+from page_cache import page_key
+
+
+def form_page_document(text: str) -> fitz.Document:
+    """Документ, страница которого показывает текст через Form XObject."""
+    source = fitz.open()
+    source.new_page().insert_text((72, 72), text)
+    document = fitz.open()
+    document.new_page().show_pdf_page(fitz.Rect(0, 0, 595, 842), source, 0)
+    return document
+
+
+def test_form_xobject_text_changes_key():
+    first = form_page_document("Artículo 1. uno")
+    second = form_page_document("Artículo 1. dos")
+    assert first[0].read_contents() == second[0].read_contents()
+    assert page_key(first[0]) != page_key(second[0])
+
+
+def test_same_page_in_other_file_keeps_key():
+    assert page_key(form_page_document("Artículo 1. uno")[0]) == page_key(form_page_document("Artículo 1. uno")[0])
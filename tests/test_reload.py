@@ -0,0 +1,118 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from legal_bot import LegalAssistant
+from search import SearchEngine
+
+
+def write_data(tmp_path, texts):
+    chunks = [{"libro": "LIBRO II", "titulo": "TÍTULO I", "capitulo": "CAPÍTULO I",
+               "article_numbers": [str(138 + i)], "chunk_index": i, "text": text}
+              for i, text in enumerate(texts)]
+    chunks_file = tmp_path / "chunks.json"
+    chunks_file.write_text(json.dumps(chunks, ensure_ascii=False), encoding="utf-8")
+    index = faiss.IndexFlatIP(4)
+    index.add(np.eye(4, dtype=np.float32)[:len(texts)])
+    faiss.write_index(index, str(tmp_path / "chunks.index"))
+    return str(chunks_file), str(tmp_path / "chunks.index")
+
+
+class FirstAxisModel:
+    """Модель, у которой эмбеддинг любого текста - первый базисный вектор."""
+
+    def encode(self, texts, **kwargs):
+        return np.tile(np.eye(4, dtype=np.float32)[0], (len(texts), 1))
+
+
+def data_engine(chunks_file, index_path):
+    # Без настоящей модели: проверяются загрузка данных и поиск
+    engine = SearchEngine.__new__(SearchEngine)
+    engine.artifacts_dir = None
+    engine.model_name = "test"
+    engine.model = FirstAxisModel()
+    engine.is_warm = False
+    engine._load_data(chunks_file, index_path)
+    return engine
+
+
+def test_engine_reload_switches_data_and_keeps_it_on_error(tmp_path):
+    chunks_file, index_path = write_data(tmp_path, ["El que matare a otro"])
+    engine = data_engine(chunks_file, index_path)
+    old_version = engine.version
+
+    write_data(tmp_path, ["El que matare a otro", "El que causare lesiones"])
+    assert engine.reload()
+    assert len(engine.chunks) == 2 and engine.version != old_version
+    assert engine.search_by_article("139")[0]["text"] == "El que causare lesiones"
+
+    # Чанки пересобраны, а индекс нет: перезагрузка не применяется
+    chunks_file_path = tmp_path / "chunks.json"
+    chunks = json.loads(chunks_file_path.read_text(encoding="utf-8"))
+    chunks_file_path.write_text(json.dumps(chunks * 2, ensure_ascii=False), encoding="utf-8")
+    version = engine.version
+    with pytest.raises(ValueError):
+        engine.reload()
+    assert len(engine.chunks) == 2 and engine.index.ntotal == 2 and engine.version == version
+
+
+def test_snapshot_keeps_its_version_after_reload(tmp_path):
+    chunks_file, index_path = write_data(tmp_path, ["El que matare a otro"])
+    engine = data_engine(chunks_file, index_path)
+    snapshot = engine.snapshot()
+
+    write_data(tmp_path, ["El que causare lesiones", "El que matare a otro"])
+    assert engine.reload()
+    assert len(snapshot.chunks) == 1 and snapshot.index.ntotal == 1
+    assert snapshot.search_by_article("138")[0]["text"] == "El que matare a otro"
+    assert engine.search_by_article("138")[0]["text"] == "El que causare lesiones"
+
+
+def test_answer_built_before_reload_is_not_cached(tmp_path):
+    chunks_file, index_path = write_data(tmp_path, ["El que matare a otro"])
+    assistant = LegalAssistant(engine=data_engine(chunks_file, index_path), semantic_threshold=0.92)
+    question = "¿Qué dice el código sobre matar?"
+    plan = assistant.plan_answer(question)
+
+    write_data(tmp_path, ["El que causare lesiones", "El que matare a otro"])
+    assert assistant.reload()
+    answer = assistant.complete_answer(plan, plan.engine.encode(plan.queries))
+    assert "matare" in answer and "lesiones" not in answer
+    assert assistant.query_cache.get(question) is None
+    assert len(assistant.semantic_cache) == 0
+
+    # Следующий запрос строится уже по новой версии и кэшируется
+    assert "lesiones" in assistant.answer_question(question)
+    assert assistant.query_cache.get(question) is not None
+
+
+class VersionedEngine:
+    chunks = []
+    index_path = "test.index"
+    model_name = "test"
+
+    def __init__(self):
+        self.version = "v1"
+
+    def warm_up(self):
+        pass
+
+    def snapshot(self):
+        return self
+
+    def reload(self):
+        self.version = "v2"
+        return True
+
+
+def test_assistant_reload_switches_cache_versions():
+    assistant = LegalAssistant(engine=VersionedEngine(), semantic_threshold=0.92)
+    assistant.query_cache.put("¿Qué es el homicidio?", "respuesta antigua")
+    assistant.semantic_cache.put(np.ones(4), "general_search|", "respuesta antigua")
+
+    assert assistant.reload()
+    assert assistant.query_cache.version == assistant.semantic_cache.version == "v2"
+    assert assistant.query_cache.get("¿Qué es el homicidio?") is None
+    assert assistant.semantic_cache.get(np.ones(4), "general_search|") is None
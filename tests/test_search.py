@@ -0,0 +1,91 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from search import RRF_K, ChunkNeighbors, SearchEngine
+
+
+def make_engine(tmp_path, count=4):
+    chunks = [{"libro": "LIBRO I", "titulo": "TÍTULO I", "capitulo": "CAPÍTULO I",
+               "article_numbers": [str(number + 1)], "chunk_index": number, "text": f"Texto {number}"}
+              for number in range(count)]
+    chunks_file = tmp_path / "chunks.json"
+    chunks_file.write_text(json.dumps(chunks, ensure_ascii=False), encoding="utf-8")
+    index = faiss.IndexFlatIP(count)
+    index.add(np.eye(count, dtype=np.float32))
+    faiss.write_index(index, str(tmp_path / "chunks.index"))
+
+    engine = SearchEngine.__new__(SearchEngine)
+    engine.artifacts_dir = None
+    engine._load_data(str(chunks_file), str(tmp_path / "chunks.index"))
+    return engine
+
+
+# Два варианта запроса: первый находит чанки 0, 1, 2, второй - 1, 3, 2
+HITS = (np.array([[0.9, 0.5, 0.4], [0.6, 0.55, 0.3]], dtype=np.float32),
+        np.array([[0, 1, 2], [1, 3, 2]], dtype=np.int64))
+
+
+def test_rrf_fusion_sums_reciprocal_ranks(tmp_path):
+    results = make_engine(tmp_path).search_many(["uno", "dos"], top_k=4, fusion="rrf", hits=HITS)
+    assert [result["chunk_index"] for result in results] == [1, 2, 0, 3]
+    assert results[0]["fusion_score"] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 2))
+    assert results[1]["fusion_score"] == pytest.approx(2 / (RRF_K + 3))
+    # Расстояние объединенного результата - лучшее из вариантов
+    assert results[0]["distance"] == pytest.approx(0.6)
+
+
+def test_max_fusion_keeps_best_score(tmp_path):
+    results = make_engine(tmp_path).search_many(["uno", "dos"], top_k=4, fusion="max", hits=HITS)
+    assert [result["chunk_index"] for result in results] == [0, 1, 3, 2]
+    assert [result["fusion_score"] for result in results] == pytest.approx([0.9, 0.6, 0.55, 0.4])
+
+
+def test_search_many_batches_index_search_and_cuts_top_k(tmp_path):
+    engine = make_engine(tmp_path)
+    embeddings = np.eye(4, dtype=np.float32)[[3, 0]]
+    results = engine.search_many(["uno", "dos"], top_k=1, embeddings=embeddings)
+    assert [result["chunk_index"] for result in results] == [3]
+    with pytest.raises(ValueError):
+        engine.search_many(["uno"], fusion="sum", hits=HITS)
+
+
+def neighbor_chunks():
+    # Порядок в файле не совпадает с chunk_index; вторая группа - другой capítulo
+    chunks = [{"libro": "LIBRO I", "titulo": "TÍTULO I", "capitulo": "CAPÍTULO I",
+               "chunk_index": index, "text": f"A{index}".ljust(10)} for index in (3, 0, 4, 1, 2)]
+    chunks += [{"libro": "LIBRO I", "titulo": "TÍTULO I", "capitulo": "CAPÍTULO II",
+                "chunk_index": index, "text": f"B{index}".ljust(10)} for index in (0, 1)]
+    return chunks
+
+
+def expand(chunks, hits, window=1, max_chars=None):
+    found = [chunk for name in hits for chunk in chunks if chunk["text"].strip() == name]
+    expanded = ChunkNeighbors.from_chunks(chunks).expand(found, chunks, window, max_chars)
+    return [(chunk["text"].strip(), chunk.get("is_context", False)) for chunk in expanded]
+
+
+def test_expand_adds_window_within_capitulo():
+    chunks = neighbor_chunks()
+    assert expand(chunks, ["A2"]) == [("A1", True), ("A2", False), ("A3", True)]
+    assert [name for name, _ in expand(chunks, ["A2"], window=2)] == ["A0", "A1", "A2", "A3", "A4"]
+    # Соседи не выходят за пределы capítulo
+    assert [name for name, _ in expand(chunks, ["A4", "B0"])] == ["A3", "A4", "B0", "B1"]
+
+
+def test_expand_does_not_repeat_chunks():
+    assert expand(neighbor_chunks(), ["A1", "A2"]) == [
+        ("A0", True), ("A1", False), ("A2", False), ("A3", True),
+    ]
+
+
+def test_expand_stops_at_char_budget():
+    chunks = neighbor_chunks()
+    # Найденный чанк и два соседа по 10 символов
+    assert [name for name, _ in expand(chunks, ["A2"], window=2, max_chars=30)] == ["A1", "A2", "A3"]
+
+    # Ближний сосед слева не помещается - дальний за ним тоже не берется
+    chunks[3]["text"] = "A1".ljust(50)
+    assert [name for name, _ in expand(chunks, ["A2"], window=2, max_chars=30)] == ["A2", "A3", "A4"]
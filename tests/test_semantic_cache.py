@@ -0,0 +1,74 @@
+import numpy as np
+
+from legal_bot import LegalAssistant
+from semantic_cache import SemanticAnswerCache
+
+
+class SameVectorEngine:
+    """Движок, у которого все вопросы имеют один эмбеддинг, а поиск находит чанк по последнему слову."""
+
+    chunks = []
+    index_path = "test.index"
+    model_name = "test"
+    version = "v1"
+
+    def warm_up(self):
+        pass
+
+    def snapshot(self):
+        return self
+
+    def encode(self, texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    def search(self, question, top_k=5, embedding=None, hits=None):
+        term = question.rstrip("?").split()[-1]
+        return [{"libro": "LIBRO II", "titulo": "TÍTULO XIII", "capitulo": "",
+                 "article_numbers": [term], "text": f"Texto sobre {term}", "relevance_score": 90.0}]
+
+    def search_many(self, queries, top_k=5, fusion="rrf", embeddings=None, hits=None):
+        return self.search(queries[0], top_k)
+
+    def expand_with_neighbors(self, results, window=1, max_chars=None):
+        return results
+
+
+def test_paraphrase_in_other_language_hits():
+    assistant = LegalAssistant(engine=SameVectorEngine())
+    first = assistant.answer_question("срок давности убийства")
+    assert assistant.answer_question("plazo de prescripción del homicidio") == first
+    assert assistant.semantic_cache.hits == 1
+
+
+def test_questions_about_different_offences_do_not_collide():
+    assistant = LegalAssistant(engine=SameVectorEngine())
+    robo = assistant.answer_question("¿Cuál es la pena por robo?")
+    hurto = assistant.answer_question("¿Cuál es la pena por hurto?")
+    assert "robo" in robo and "hurto" in hurto
+    assert assistant.semantic_cache.hits == 0
+
+
+def test_close_question_needs_same_scope_and_offence():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put(np.array([1.0, 0.0]), "general_search|", "respuesta", {"robo"})
+    assert cache.get(np.array([0.99, 0.05]), "general_search|", {"robo"}) == "respuesta"
+    assert cache.get(np.array([0.99, 0.05]), "general_search|", {"hurto"}) is None
+    assert cache.get(np.array([0.99, 0.05]), "general_search|") is None
+    assert cache.get(np.array([0.99, 0.05]), "prescription_search|", {"robo"}) is None
+
+
+def test_scopes_are_bounded_by_entries():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    for number in range(100):
+        cache.put(np.array([1.0, 0.0]), f"article_search|{number}", "respuesta")
+    assert len(cache.scope_ids) <= 4
+    assert cache.get(np.array([1.0, 0.0]), "article_search|99") == "respuesta"
+    assert cache.get(np.array([1.0, 0.0]), "article_search|0") is None
+
+
+def test_set_version_clears_entries():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put(np.array([1.0, 0.0]), "general_search|", "respuesta")
+    cache.set_version("v2")
+    assert len(cache) == 0
+    assert cache.get(np.array([1.0, 0.0]), "general_search|") is None
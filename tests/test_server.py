@@ -0,0 +1,116 @@
+import asyncio
+import json
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from server import LegalQuestionService, MicroBatcher
+
+
+class FailingService(LegalQuestionService):
+    async def answer(self, question: str) -> str:
+        raise RuntimeError("секретный путь /srv/output/penal_code.index")
+
+
+def exchange(request: bytes) -> tuple:
+    """Отправляет сырой HTTP запрос сервису и возвращает статус и JSON ответа."""
+    async def run():
+        service = FailingService(types.SimpleNamespace(engine=None))
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_bad_content_length_is_400(length):
+    status, payload = exchange(b"POST /legal_question HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert status == 400
+    assert "error" in payload
+
+
+def test_too_large_body_is_413():
+    status, _ = exchange(b"POST /legal_question HTTP/1.1\r\nContent-Length: 100000000\r\n\r\n")
+    assert status == 413
+
+
+def test_internal_error_is_not_exposed():
+    body = json.dumps({"question": "¿Qué es el homicidio?"}).encode("utf-8")
+    request = (b"POST /legal_question HTTP/1.1\r\nConnection: close\r\n"
+               b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+    status, payload = exchange(request)
+    assert status == 500
+    assert "секретный" not in payload["error"] and "/srv" not in payload["error"]
+
+
+class BasisEngine:
+    """Движок, у которого текст "e<i>" кодируется i-м базисным вектором."""
+
+    def __init__(self, fail=False):
+        self.index = faiss.IndexFlatIP(4)
+        self.index.add(np.eye(4, dtype=np.float32))
+        self.calls = []
+        self.fail = fail
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("encode failed")
+        return np.eye(4, dtype=np.float32)[[int(text[1:]) for text in texts]]
+
+
+def run_batcher(engine, requests, max_batch_size=32):
+    """Отправляет запросы (queries, top_k, index) в один MicroBatcher одновременно."""
+    async def run():
+        batcher = MicroBatcher(engine, max_batch_size=max_batch_size, max_wait_ms=50)
+        batcher.start()
+        try:
+            return batcher, await asyncio.gather(
+                *(batcher.search(queries, top_k, index) for queries, top_k, index in requests),
+                return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+    return asyncio.run(run())
+
+
+def test_batcher_coalesces_requests_and_splits_results():
+    engine = BasisEngine()
+    batcher, results = run_batcher(engine, [(["e2"], 1, None), (["e0", "e3"], 2, None), (["e1"], 1, None)])
+    assert engine.calls == [["e2", "e0", "e3", "e1"]]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["texts"] == 4
+
+    (embeddings, (distances, indices)) = results[1]
+    assert np.array_equal(embeddings, np.eye(4, dtype=np.float32)[[0, 3]])
+    assert indices.shape == (2, 2) and indices[:, 0].tolist() == [0, 3]
+    assert [result[1][1].tolist() for result in (results[0], results[2])] == [[[2]], [[1]]]
+
+
+def test_batcher_respects_max_batch_size():
+    engine = BasisEngine()
+    run_batcher(engine, [(["e0", "e1"], 1, None), (["e2", "e3"], 1, None)], max_batch_size=2)
+    assert engine.calls == [["e0", "e1"], ["e2", "e3"]]
+
+
+def test_batcher_searches_each_request_in_its_own_index():
+    engine = BasisEngine()
+    reordered = faiss.IndexFlatIP(4)
+    reordered.add(np.eye(4, dtype=np.float32)[::-1].copy())
+    _, results = run_batcher(engine, [(["e0"], 1, None), (["e0"], 1, reordered)])
+    assert len(engine.calls) == 1
+    assert results[0][1][1].tolist() == [[0]] and results[1][1][1].tolist() == [[3]]
+
+
+def test_batcher_error_reaches_every_caller():
+    engine = BasisEngine(fail=True)
+    _, results = run_batcher(engine, [(["e0"], 1, None), (["e1"], 1, None)])
+    assert all(isinstance(result, RuntimeError) for result in results)
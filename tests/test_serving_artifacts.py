@@ -0,0 +1,21 @@
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from serving_artifacts import export_serving_artifacts
+
+
+def test_index_for_other_chunks_is_rejected(tmp_path):
+    chunks = [{"libro": "LIBRO I", "titulo": "TÍTULO I", "capitulo": "", "article_numbers": ["1"],
+               "chunk_index": 0, "text": "Artículo 1."}]
+    index = faiss.IndexFlatIP(4)
+    index.add(np.eye(4, dtype=np.float32)[:2])
+    index_path = str(tmp_path / "chunks.index")
+    faiss.write_index(index, index_path)
+
+    output_dir = str(tmp_path / "serving")
+    with pytest.raises(ValueError):
+        export_serving_artifacts(chunks, index_path, output_dir)
+    assert not os.path.exists(output_dir)
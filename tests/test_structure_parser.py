@@ -0,0 +1,58 @@
+from structure_parser import (
+    ARTICULO, CAPITULO, LIBRO, PRELIMINAR, SECCION, TITULO, StructureParser, parse_structure,
+    tokenize_structure,
+)
+
+TEXT = (
+    "TÍTULO PRELIMINAR\n"
+    "Artículo 1.\nNo será castigada ninguna acción.\n"
+    "LIBRO I\n"
+    "TÍTULO I\n"
+    "CAPÍTULO I\n"
+    "Sección 1.ª De las penas\n"
+    "Artículo 2.\nSon delitos las acciones.\n"
+    "Artículo 2 bis.\nTexto insertado.\n"
+    "CAPÍTULO II\n"
+    "Artículo 3.\nSon penas graves.\n"
+    "TÍTULO I BIS\n"
+    "Artículo 4.\nDe los delitos insertados.\n"
+)
+
+
+def test_tokenizer_finds_every_heading_with_offsets():
+    events = tokenize_structure(TEXT)
+    assert [(event.kind, event.label) for event in events] == [
+        (PRELIMINAR, "TÍTULO PRELIMINAR"), (ARTICULO, "1"),
+        (LIBRO, "LIBRO I"), (TITULO, "TÍTULO I"), (CAPITULO, "CAPÍTULO I"),
+        (SECCION, "Sección 1.ª"), (ARTICULO, "2"), (ARTICULO, "2 bis"),
+        (CAPITULO, "CAPÍTULO II"), (ARTICULO, "3"),
+        (TITULO, "TÍTULO I BIS"), (ARTICULO, "4"),
+    ]
+    for event in events:
+        assert TEXT[event.start:event.end].endswith(event.label)
+
+
+def test_seccion_only_at_line_start():
+    assert [event.kind for event in tokenize_structure("Ver la Sección 1.ª\nSección 2.ª")] == [SECCION]
+
+
+def test_parse_builds_hierarchy_and_article_bodies():
+    structure = parse_structure(TEXT)
+    assert list(structure) == ["TÍTULO PRELIMINAR", "LIBRO I"]
+    assert structure["TÍTULO PRELIMINAR"]["articles"] == {"1": "No será castigada ninguna acción."}
+
+    libro = structure["LIBRO I"]
+    assert list(libro) == ["TÍTULO I", "TÍTULO I BIS"]
+    titulo = libro["TÍTULO I"]
+    assert list(titulo["capitulos"]) == ["CAPÍTULO I", "CAPÍTULO II"]
+    assert titulo["capitulos"]["CAPÍTULO I"]["articles"] == {
+        "2": "Son delitos las acciones.", "2 bis": "Texto insertado.",
+    }
+    # Статьи título собираются из всего его текста, как в прежнем разборе
+    assert list(titulo["articles"]) == ["2", "2 bis", "3"]
+    assert libro["TÍTULO I BIS"]["articles"] == {"4": "De los delitos insertados."}
+
+
+def test_header_without_body_is_skipped():
+    parser = StructureParser("Artículo 1.\nTexto.\nArtículo 2.")
+    assert parser.articles_in(0, len(parser.text)) == {"1": "Texto."}